@@ -0,0 +1,78 @@
+"""
+Bulk grading from the command line.
+
+    python -m app.bulk_grade enqueue lin-eq-001 photos/*.jpg
+    python -m app.bulk_grade run [--limit N] [--poll-interval SECONDS]
+    python -m app.bulk_grade requeue
+
+`enqueue` stores photos as deferred submission jobs, `run` grades every
+deferred job through the Message Batches API and writes the results back,
+and `requeue` returns jobs left "batching" by an interrupted run.
+"""
+import argparse
+import asyncio
+import mimetypes
+from pathlib import Path
+from typing import Optional
+from dotenv import load_dotenv
+
+# Load environment variables BEFORE importing services
+load_dotenv(Path(__file__).parent.parent / ".env")
+
+from .database import init_db, seed_db, close_db, DATABASE_PATH
+from .routers.submissions import run_bulk_grading
+from .services.ocr import ImageInput
+from .services.jobs import job_queue
+from .services.bulk_grader import bulk_grader
+from .services.catalog import catalog
+from .services.llm_client import close_client
+
+
+async def enqueue(problem_id: str, paths: list[str], fast_verdict: Optional[bool]):
+    if not catalog.problem(problem_id):
+        raise SystemExit(f"Problem not found: {problem_id}")
+
+    for path in paths:
+        media_type = mimetypes.guess_type(path)[0] or "image/jpeg"
+        image = ImageInput(media_type=media_type, data=Path(path).read_bytes())
+        job_id = await job_queue.enqueue(problem_id, image, fast_verdict, deferred=True)
+        print(f"{job_id}  {path}")
+
+
+async def main(args: argparse.Namespace):
+    if not DATABASE_PATH.exists():
+        init_db()
+        seed_db()
+    else:
+        init_db()
+
+    try:
+        if args.command == "enqueue":
+            await enqueue(args.problem_id, args.paths, args.fast_verdict)
+        elif args.command == "run":
+            if args.poll_interval is not None:
+                bulk_grader.poll_interval = args.poll_interval
+            print(await run_bulk_grading(args.limit))
+        elif args.command == "requeue":
+            print(f"Requeued {await job_queue.requeue_batching()} job(s)")
+    finally:
+        await close_client()
+        close_db()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(prog="python -m app.bulk_grade", description="Bulk grading via message batches")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    enqueue_parser = commands.add_parser("enqueue", help="store photos as deferred submission jobs")
+    enqueue_parser.add_argument("problem_id")
+    enqueue_parser.add_argument("paths", nargs="+")
+    enqueue_parser.add_argument("--fast-verdict", action=argparse.BooleanOptionalAction, default=None)
+
+    run_parser = commands.add_parser("run", help="grade all deferred jobs")
+    run_parser.add_argument("--limit", type=int, default=None)
+    run_parser.add_argument("--poll-interval", type=float, default=None)
+
+    commands.add_parser("requeue", help="return jobs left by an interrupted run to the deferred state")
+
+    asyncio.run(main(parser.parse_args()))
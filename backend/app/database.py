@@ -1,23 +1,104 @@
+import os
 import sqlite3
 import json
+import time
+import queue
+import asyncio
+import threading
+import functools
 from pathlib import Path
 from contextlib import contextmanager
+from concurrent.futures import ThreadPoolExecutor
 
-DATABASE_PATH = Path(__file__).parent.parent / "math_feedback.db"
+# DATABASE_PATH points the app at another file (e.g. a throwaway benchmark database)
+DATABASE_PATH = Path(os.getenv("DATABASE_PATH") or Path(__file__).parent.parent / "math_feedback.db")
 SEED_DATA_PATH = Path(__file__).parent.parent.parent / "seed_data.json"
 
+# Connection pool / pragma settings (overridable via environment)
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "8"))
+DB_BUSY_TIMEOUT_MS = int(os.getenv("DB_BUSY_TIMEOUT_MS", "5000"))
+DB_CACHE_SIZE_KB = int(os.getenv("DB_CACHE_SIZE_KB", "16384"))
+DB_MMAP_SIZE = int(os.getenv("DB_MMAP_SIZE", str(128 * 1024 * 1024)))
+
+# Rows per transaction when filling columns added to existing submissions
+DB_BACKFILL_BATCH_SIZE = int(os.getenv("DB_BACKFILL_BATCH_SIZE", "500"))
+
+# Columns added to submissions after the first release: name -> type
+SUBMISSION_COLUMNS = {
+    "feedback_summary": "TEXT",
+    "step_count": "INTEGER",
+    "error_step_count": "INTEGER",
+}
+
 
 def get_connection():
-    """Create a database connection."""
-    conn = sqlite3.connect(DATABASE_PATH)
+    """Create a database connection with WAL journaling and tuned pragmas."""
+    conn = sqlite3.connect(
+        DATABASE_PATH,
+        timeout=DB_BUSY_TIMEOUT_MS / 1000,
+        check_same_thread=False,
+    )
     conn.row_factory = sqlite3.Row
+    conn.execute("PRAGMA journal_mode=WAL")
+    conn.execute("PRAGMA synchronous=NORMAL")
+    conn.execute(f"PRAGMA cache_size=-{DB_CACHE_SIZE_KB}")
+    conn.execute(f"PRAGMA mmap_size={DB_MMAP_SIZE}")
+    conn.execute(f"PRAGMA busy_timeout={DB_BUSY_TIMEOUT_MS}")
+    conn.execute("PRAGMA temp_store=MEMORY")
     return conn
 
 
+class ConnectionPool:
+    """A small fixed-size pool of reusable SQLite connections."""
+
+    def __init__(self, size: int):
+        self.size = size
+        self._idle: queue.LifoQueue = queue.LifoQueue()
+        self._created = 0
+        self._lock = threading.Lock()
+
+    def acquire(self) -> sqlite3.Connection:
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            pass
+
+        with self._lock:
+            if self._created < self.size:
+                self._created += 1
+                try:
+                    return get_connection()
+                except Exception:
+                    self._created -= 1
+                    raise
+
+        return self._idle.get()
+
+    def release(self, conn: sqlite3.Connection):
+        self._idle.put(conn)
+
+    def close_all(self):
+        """Close every idle connection (used on shutdown and reset)."""
+        with self._lock:
+            while True:
+                try:
+                    conn = self._idle.get_nowait()
+                except queue.Empty:
+                    break
+                conn.close()
+                self._created -= 1
+
+
+pool = ConnectionPool(DB_POOL_SIZE)
+
+# One worker per pooled connection so offloaded queries never wait on the pool
+_executor = ThreadPoolExecutor(max_workers=DB_POOL_SIZE, thread_name_prefix="db")
+
+
 @contextmanager
 def get_db():
-    """Context manager for database connections."""
-    conn = get_connection()
+    """Context manager that borrows a pooled connection for one transaction."""
+    conn = pool.acquire()
     try:
         yield conn
         conn.commit()
@@ -25,7 +106,28 @@ def get_db():
         conn.rollback()
         raise
     finally:
-        conn.close()
+        pool.release(conn)
+
+
+async def run_db(func, *args, **kwargs):
+    """
+    Run a blocking database function on the DB thread pool.
+
+    `func` receives a pooled connection as its first argument and runs inside
+    a single transaction, so route handlers never block the event loop.
+    """
+    def call():
+        with get_db() as conn:
+            return func(conn, *args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, call)
+
+
+def close_db():
+    """Close pooled connections and stop the DB worker threads."""
+    pool.close_all()
+    _executor.shutdown(wait=True)
 
 
 def init_db():
@@ -65,13 +167,186 @@ def init_db():
                 is_correct BOOLEAN,
                 feedback TEXT,
                 created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                feedback_summary TEXT,
+                step_count INTEGER,
+                error_step_count INTEGER,
                 FOREIGN KEY (problem_id) REFERENCES problems (id)
             )
         """)
+        # Older databases: add the columns, left NULL for backfill_submission_columns
+        existing = {row["name"] for row in cursor.execute("PRAGMA table_info(submissions)")}
+        for name, column_type in SUBMISSION_COLUMNS.items():
+            if name not in existing:
+                cursor.execute(f"ALTER TABLE submissions ADD COLUMN {name} {column_type}")
+
+        # History pages walk this index newest-first, keyed on (created_at, id).
+        # It holds every history column, so a page never reads the table rows
+        # (or the feedback JSON stored in them)
+        cursor.execute("DROP INDEX IF EXISTS idx_submissions_created_at")
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_history
+            ON submissions (created_at, id, problem_id, is_correct, feedback_summary, step_count, error_step_count)
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_problem
+            ON submissions (problem_id, created_at, id)
+        """)
+        # Rows still waiting for backfill_submission_columns
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submissions_unsummarized
+            ON submissions (id) WHERE feedback_summary IS NULL
+        """)
+
+        # Create submission counts table: rows per problem, kept current by
+        # triggers so history totals never have to count the submissions table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS submission_counts (
+                problem_id TEXT PRIMARY KEY,
+                count INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS submissions_count_insert
+            AFTER INSERT ON submissions
+            BEGIN
+                INSERT INTO submission_counts (problem_id, count) VALUES (NEW.problem_id, 1)
+                ON CONFLICT (problem_id) DO UPDATE SET count = count + 1;
+            END
+        """)
+        cursor.execute("""
+            CREATE TRIGGER IF NOT EXISTS submissions_count_delete
+            AFTER DELETE ON submissions
+            BEGIN
+                UPDATE submission_counts SET count = count - 1 WHERE problem_id = OLD.problem_id;
+            END
+        """)
+        # Databases created before the counts table: count the existing rows once
+        if cursor.execute("SELECT 1 FROM submission_counts LIMIT 1").fetchone() is None:
+            cursor.execute("""
+                INSERT INTO submission_counts (problem_id, count)
+                SELECT problem_id, COUNT(*) FROM submissions GROUP BY problem_id
+            """)
+
+        # Create background submission jobs table
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS submission_jobs (
+                id TEXT PRIMARY KEY,
+                problem_id TEXT NOT NULL,
+                image_media_type TEXT,
+                image_data BLOB,
+                fast_verdict BOOLEAN,
+                status TEXT NOT NULL,
+                result TEXT,
+                error TEXT,
+                created_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP,
+                updated_at TIMESTAMP DEFAULT CURRENT_TIMESTAMP
+            )
+        """)
+        cursor.execute("""
+            CREATE INDEX IF NOT EXISTS idx_submission_jobs_status
+            ON submission_jobs (status)
+        """)
+
+        # Create cache tables:
+        #   result_cache:     image hash + problem id -> vision + evaluation results
+        #   evaluation_cache: canonical work + problem id -> evaluation result
+        for table in ("result_cache", "evaluation_cache"):
+            cursor.execute(f"""
+                CREATE TABLE IF NOT EXISTS {table} (
+                    key TEXT PRIMARY KEY,
+                    problem_id TEXT NOT NULL,
+                    payload TEXT NOT NULL,
+                    created_at REAL NOT NULL,
+                    last_access REAL NOT NULL,
+                    hit_count INTEGER NOT NULL DEFAULT 0
+                )
+            """)
+            cursor.execute(f"""
+                CREATE INDEX IF NOT EXISTS idx_{table}_last_access
+                ON {table} (last_access)
+            """)
+
+        # Create pipeline mode stats table: measured latency / accuracy per
+        # scope ("problem:<id>" or "topic:<id>") and mode ("two_call" / "fused")
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS pipeline_mode_stats (
+                scope TEXT NOT NULL,
+                mode TEXT NOT NULL,
+                samples INTEGER NOT NULL DEFAULT 0,
+                total_latency_ms REAL NOT NULL DEFAULT 0,
+                failures INTEGER NOT NULL DEFAULT 0,
+                disagreements INTEGER NOT NULL DEFAULT 0,
+                PRIMARY KEY (scope, mode)
+            )
+        """)
+
+        # Create catalog version table: one row, bumped by every seed_db so
+        # each process can tell its in-memory catalog is out of date
+        cursor.execute("""
+            CREATE TABLE IF NOT EXISTS catalog_version (
+                id INTEGER PRIMARY KEY CHECK (id = 1),
+                version INTEGER NOT NULL,
+                seeded_at REAL NOT NULL
+            )
+        """)
+        cursor.execute("INSERT OR IGNORE INTO catalog_version (id, version, seeded_at) VALUES (1, 0, 0)")
 
         conn.commit()
 
 
+def feedback_columns(feedback: dict) -> tuple[str, int, int]:
+    """(summary, step count, incorrect step count) of a feedback dict, as stored beside its JSON."""
+    steps = feedback.get("steps_analysis") or []
+    return (
+        feedback.get("summary") or "",
+        len(steps),
+        sum(1 for step in steps if step.get("evaluation") == "incorrect"),
+    )
+
+
+def _backfill_batch(conn, batch_size: int) -> int:
+    rows = conn.execute("""
+        SELECT id, feedback FROM submissions
+        WHERE feedback_summary IS NULL
+        ORDER BY id
+        LIMIT ?
+    """, (batch_size,)).fetchall()
+
+    updates = []
+    for row in rows:
+        try:
+            feedback = json.loads(row["feedback"]) if row["feedback"] else {}
+        except json.JSONDecodeError:
+            feedback = {}
+        updates.append((*feedback_columns(feedback), row["id"]))
+
+    conn.executemany("""
+        UPDATE submissions SET feedback_summary = ?, step_count = ?, error_step_count = ?
+        WHERE id = ?
+    """, updates)
+    return len(rows)
+
+
+async def backfill_submission_columns(batch_size: int = DB_BACKFILL_BATCH_SIZE) -> int:
+    """
+    Fill the summary columns of submissions stored before they existed.
+
+    Runs in the background after startup, one short transaction of
+    `batch_size` rows at a time, so requests keep getting the write lock in
+    between. History falls back to the feedback JSON for rows not reached yet.
+    """
+    total = 0
+    while True:
+        done = await run_db(_backfill_batch, batch_size)
+        if not done:
+            break
+        total += done
+        await asyncio.sleep(0)
+    if total:
+        print(f"Backfilled summary columns of {total} submissions")
+    return total
+
+
 def seed_db():
     """Seed database with initial data from seed_data.json."""
     if not SEED_DATA_PATH.exists():
@@ -98,6 +373,12 @@ def seed_db():
                     VALUES (?, ?, ?, ?)
                 """, (problem["id"], topic["id"], problem["question"], problem["correct_answer"]))
 
+        # In the same transaction, so the new version never goes with the old rows
+        cursor.execute("""
+            INSERT INTO catalog_version (id, version, seeded_at) VALUES (1, 1, ?)
+            ON CONFLICT (id) DO UPDATE SET version = version + 1, seeded_at = excluded.seeded_at
+        """, (time.time(),))
+
         conn.commit()
 
     print("Database seeded successfully!")
@@ -105,7 +386,10 @@ def seed_db():
 
 def reset_db():
     """Reset database by dropping all tables and reinitializing."""
-    if DATABASE_PATH.exists():
-        DATABASE_PATH.unlink()
+    pool.close_all()
+    for path in (DATABASE_PATH, DATABASE_PATH.with_name(DATABASE_PATH.name + "-wal"),
+                 DATABASE_PATH.with_name(DATABASE_PATH.name + "-shm")):
+        if path.exists():
+            path.unlink()
     init_db()
     seed_db()
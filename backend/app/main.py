@@ -1,4 +1,5 @@
 import os
+import asyncio
 from pathlib import Path
 from dotenv import load_dotenv
 
@@ -6,11 +7,14 @@ from dotenv import load_dotenv
 env_path = Path(__file__).parent.parent / ".env"
 load_dotenv(env_path)
 
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import init_db, seed_db, DATABASE_PATH
-from .routers import topics, problems, submissions
+from .database import init_db, seed_db, close_db, backfill_submission_columns, DATABASE_PATH
+from .routers import topics, problems, submissions, admin
+from .services.rate_limiter import RateLimitRejected
+from .services.metrics import metrics
 
 # Create FastAPI app
 app = FastAPI(
@@ -28,10 +32,23 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+
+@app.exception_handler(RateLimitRejected)
+async def rate_limit_rejected(request: Request, exc: RateLimitRejected):
+    """Model calls are over the rate limit: ask the client to come back later."""
+    metrics.record_error("admission", exc)
+    return JSONResponse(
+        status_code=503,
+        content={"detail": str(exc)},
+        headers={"Retry-After": str(exc.retry_after)}
+    )
+
+
 # Include routers
 app.include_router(topics.router)
 app.include_router(problems.router)
 app.include_router(submissions.router)
+app.include_router(admin.router)
 
 
 @app.on_event("startup")
@@ -43,6 +60,35 @@ async def startup_event():
         seed_db()
     else:
         print("Database already exists.")
+        # Create any tables added since the database was first built
+        init_db()
+
+    # Serve topics and problems from memory
+    from .services.catalog import catalog
+    catalog.load()
+
+    # Fill columns added since then, in small batches behind the requests
+    app.state.backfill = asyncio.create_task(backfill_submission_columns())
+
+    # Start background submission workers (resumes unfinished jobs)
+    from .services.jobs import job_queue
+    await job_queue.start(submissions.run_submission_job)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """Stop job workers and bulk runs, release the shared Anthropic client, finish cassette writes and close the database pool."""
+    from .services.llm_client import close_client
+    from .services.jobs import job_queue
+    from .services.bulk_grader import bulk_grader
+    from .services.cassette import cassette
+
+    app.state.backfill.cancel()
+    await job_queue.stop()
+    await bulk_grader.stop()
+    await close_client()
+    await asyncio.to_thread(cassette.close)
+    close_db()
 
 
 @app.get("/")
@@ -55,7 +101,11 @@ async def root():
         "endpoints": {
             "topics": "/api/topics",
             "problems": "/api/problems/{id}",
-            "submissions": "/api/submissions"
+            "submissions": "/api/submissions",
+            "submission_jobs": "/api/submissions/jobs/{id}",
+            "bulk_grade": "/api/admin/bulk-grade",
+            "reseed": "/api/admin/reseed",
+            "metrics": "/metrics"
         }
     }
 
@@ -65,15 +115,45 @@ async def health_check():
     """Health check endpoint."""
     from .services.ocr import vision_service
     from .services.evaluator import evaluator_service
+    from .services.result_cache import result_cache, evaluation_cache
+    from .services.image_prep import image_preparer
+    from .services.jobs import job_queue
+    from .services.pipeline_mode import pipeline_mode
+    from .services.llm_client import usage_tracker
+    from .services.rate_limiter import rate_limiter
+    from .services.resilience import resilience
+    from .services.ocr_router import ocr_router
+    from .services.single_flight import single_flight, idempotency_keys
+    from .services.cassette import cassette
+    from .services.catalog import catalog
 
     return {
         "status": "healthy",
         "database": DATABASE_PATH.exists(),
         "vision_configured": vision_service.is_configured(),
-        "evaluator_configured": evaluator_service.is_configured()
+        "evaluator_configured": evaluator_service.is_configured(),
+        "result_cache": result_cache.stats(),
+        "evaluation_cache": evaluation_cache.stats(),
+        "image_prep": image_preparer.stats(),
+        "jobs": job_queue.stats(),
+        "pipeline_mode": pipeline_mode.stats(),
+        "llm_usage": usage_tracker.stats(),
+        "rate_limit": rate_limiter.stats(),
+        "resilience": resilience.stats(),
+        "ocr": ocr_router.stats(),
+        "single_flight": single_flight.stats(),
+        "idempotency": idempotency_keys.stats(),
+        "cassette": cassette.stats(),
+        "catalog": catalog.stats()
     }
 
 
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    """Stage latencies, token counts, cache lookups and errors in the Prometheus text format."""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
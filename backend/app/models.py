@@ -53,6 +53,11 @@ class Feedback(BaseModel):
 class SubmissionCreate(BaseModel):
     problem_id: str
     image_data: str  # base64 encoded image
+    fast_verdict: Optional[bool] = None  # None = server default (FAST_VERDICT_MODE)
+
+
+class SubmissionBatchCreate(BaseModel):
+    submissions: list[SubmissionCreate]
 
 
 class SubmissionResponse(BaseModel):
@@ -63,18 +68,38 @@ class SubmissionResponse(BaseModel):
     quality_failed: bool = False
 
 
+class SubmissionJobAccepted(BaseModel):
+    job_id: str
+    status: str  # "queued"
+    status_url: str
+
+
+class SubmissionJobStatus(BaseModel):
+    id: str
+    problem_id: str
+    status: str  # "queued", "running", "done", "failed"
+    result: Optional[SubmissionResponse] = None
+    error: Optional[str] = None
+    created_at: str
+    updated_at: str
+
+
 class SubmissionHistoryItem(BaseModel):
     id: int
     problem_id: str
     question: str
     is_correct: bool
     feedback_summary: str
+    step_count: int = 0
+    error_step_count: int = 0
     created_at: str
 
 
 class SubmissionHistoryResponse(BaseModel):
     submissions: list[SubmissionHistoryItem]
     total: int
+    # Cursor for the next page; None on the last page
+    next_cursor: Optional[str] = None
 
 
 class SubmissionDetail(BaseModel):
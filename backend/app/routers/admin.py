@@ -0,0 +1,64 @@
+import os
+import asyncio
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException, Query
+
+from ..database import seed_db
+from ..services.bulk_grader import bulk_grader
+from ..services.catalog import catalog
+from . import submissions
+
+router = APIRouter(prefix="/api/admin", tags=["admin"])
+
+
+def _check_token(token: Optional[str]):
+    """Admin endpoints are open unless ADMIN_TOKEN is set, then the header must match."""
+    expected = os.getenv("ADMIN_TOKEN")
+    if expected and token != expected:
+        raise HTTPException(status_code=403, detail="Invalid admin token")
+
+
+@router.post("/bulk-grade", status_code=202)
+async def start_bulk_grading(
+    limit: Optional[int] = Query(default=None, ge=1),
+    x_admin_token: Optional[str] = Header(default=None)
+):
+    """
+    Start a bulk grading run over the deferred submission jobs.
+
+    The run sends the vision and evaluation requests as message batches and
+    can take a long time; poll `GET /api/admin/bulk-grade` for its status.
+    Individual results appear on `GET /api/submissions/jobs/{job_id}`.
+    """
+    _check_token(x_admin_token)
+
+    if not bulk_grader.start_run(lambda: submissions.run_bulk_grading(limit)):
+        raise HTTPException(status_code=409, detail="A bulk grading run is already in progress")
+
+    return bulk_grader.stats()
+
+
+@router.get("/bulk-grade")
+async def get_bulk_grading(x_admin_token: Optional[str] = Header(default=None)):
+    """Status of the current or most recent bulk grading run."""
+    _check_token(x_admin_token)
+    return bulk_grader.stats()
+
+
+def _reseed():
+    seed_db()
+    catalog.load()
+
+
+@router.post("/reseed")
+async def reseed(x_admin_token: Optional[str] = Header(default=None)):
+    """
+    Re-run seed_db (topics and problems from seed_data.json), which bumps
+    the stored catalog version, and reload this process's catalog. Other
+    worker processes reload within CATALOG_CHECK_INTERVAL. The ETags of
+    anything that changed change with it.
+    """
+    _check_token(x_admin_token)
+    await asyncio.to_thread(_reseed)
+    return catalog.stats()
@@ -1,27 +1,19 @@
-from fastapi import APIRouter, HTTPException
+from typing import Optional
+
+from fastapi import APIRouter, Header, HTTPException
 
-from ..database import get_db
 from ..models import Problem
+from ..services.catalog import catalog
 
 router = APIRouter(prefix="/api/problems", tags=["problems"])
 
 
 @router.get("/{problem_id}", response_model=Problem)
-async def get_problem(problem_id: str):
+async def get_problem(problem_id: str, if_none_match: Optional[str] = Header(default=None)):
     """Get a specific problem (without the answer)."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, topic_id, question FROM problems WHERE id = ?",
-            (problem_id,)
-        )
-        row = cursor.fetchone()
+    body = catalog.snapshot.problem_bodies.get(problem_id)
 
-    if not row:
+    if not body:
         raise HTTPException(status_code=404, detail="Problem not found")
 
-    return Problem(
-        id=row["id"],
-        topic_id=row["topic_id"],
-        question=row["question"]
-    )
+    return catalog.response(body, if_none_match)
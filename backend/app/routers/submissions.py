@@ -1,11 +1,20 @@
+import os
 import json
-from fastapi import APIRouter, HTTPException, Query
-from typing import Optional
+import base64
+import binascii
+import time
+import asyncio
+from fastapi import APIRouter, Header, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from typing import AsyncIterator, Optional
 
-from ..database import get_db
+from ..database import run_db, feedback_columns
 from ..models import (
     SubmissionCreate,
+    SubmissionBatchCreate,
     SubmissionResponse,
+    SubmissionJobAccepted,
+    SubmissionJobStatus,
     SubmissionHistoryResponse,
     SubmissionHistoryItem,
     SubmissionDetail,
@@ -13,60 +22,747 @@ from ..models import (
     StepAnalysis,
     ErrorResponse,
 )
-from ..services.ocr import vision_service
-from ..services.evaluator import evaluator_service
+from ..services.ocr import ImageInput, VisionResult
+from ..services.ocr_router import ocr_router
+from ..services.uploads import upload_reader, UploadError, UploadTooLarge
+from ..services.evaluator import evaluator_service, EvaluationResult
+from ..services.answer_checker import answer_checker
+from ..services.step_verifier import step_verifier
+from ..services.result_cache import result_cache, evaluation_cache
+from ..services.jobs import job_queue, JobQueue
+from ..services.bulk_grader import bulk_grader, BulkItem
+from ..services.catalog import catalog
+from ..services.fused import fused_service
+from ..services.pipeline_mode import pipeline_mode
+from ..services.rate_limiter import rate_limiter, RateLimitRejected
+from ..services.resilience import Deadline
+from ..services.single_flight import single_flight, idempotency_keys, IdempotencyConflict
+from ..services.metrics import metrics
+from ..services.cassette import cassette
 
 router = APIRouter(prefix="/api/submissions", tags=["submissions"])
 
+# Classroom batches: items per request, and pipeline runs in flight across all batches
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "50"))
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", "4"))
+_batch_slots = asyncio.Semaphore(BATCH_CONCURRENCY)
+_batch_tasks: set[asyncio.Task] = set()
+
+# Seconds a submission's model calls may take in total, retries included
+SUBMISSION_DEADLINE = float(os.getenv("SUBMISSION_DEADLINE", "90"))
+
+
+INSERT_SUBMISSION = """
+    INSERT INTO submissions (
+        problem_id, image_data, extracted_text, is_correct, feedback,
+        feedback_summary, step_count, error_step_count
+    )
+    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+"""
+
+
+def _submission_row(
+    problem_id: str,
+    image: ImageInput,
+    extracted_text: Optional[str],
+    is_correct: bool,
+    feedback: dict
+) -> tuple:
+    # The summary columns let history pages skip the feedback JSON
+    return (
+        problem_id,
+        image.preview(),
+        extracted_text,
+        is_correct,
+        json.dumps(feedback),
+        *feedback_columns(feedback)
+    )
+
+
+def _insert_submission(
+    conn,
+    problem_id: str,
+    image: ImageInput,
+    extracted_text: Optional[str],
+    is_correct: bool,
+    feedback: dict
+) -> int:
+    cursor = conn.cursor()
+    cursor.execute(INSERT_SUBMISSION, _submission_row(problem_id, image, extracted_text, is_correct, feedback))
+    return cursor.lastrowid
+
+
+def _insert_submissions(conn, rows: list[tuple]) -> list[int]:
+    """
+    Insert (problem_id, image, extracted_text, is_correct, feedback) rows with
+    one executemany and return their ids in order.
+    """
+    cursor = conn.cursor()
+    cursor.executemany(INSERT_SUBMISSION, [_submission_row(*row) for row in rows])
+    # The transaction holds SQLite's only write lock, so the new ids are consecutive
+    last_id = cursor.execute("SELECT last_insert_rowid()").fetchone()[0]
+    return list(range(last_id - len(rows) + 1, last_id + 1))
+
+
+def _encode_cursor(created_at: str, submission_id: int) -> str:
+    """Opaque history cursor: the (created_at, id) of the last row on a page."""
+    raw = json.dumps([created_at, submission_id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def _decode_cursor(cursor: str) -> tuple[str, int]:
+    """Inverse of `_encode_cursor`. Raises ValueError for a malformed cursor."""
+    try:
+        created_at, submission_id = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (binascii.Error, UnicodeDecodeError, json.JSONDecodeError, TypeError, ValueError):
+        raise ValueError("Invalid cursor")
+    if not isinstance(created_at, str) or not isinstance(submission_id, int):
+        raise ValueError("Invalid cursor")
+    return created_at, submission_id
+
+
+def _fetch_history(
+    conn,
+    limit: int,
+    offset: int = 0,
+    after: Optional[tuple[str, int]] = None,
+    problem_id: Optional[str] = None
+):
+    """
+    One page of history, newest first, plus the total. Pages continue
+    `after` the (created_at, id) of the previous page's last row, which is a
+    range scan of idx_submissions_history however deep the page is. The
+    total comes from the trigger-maintained submission_counts table.
+
+    The page reads only the index, summary columns included; the feedback
+    JSON is fetched just for rows the startup backfill hasn't reached yet.
+    """
+    cursor = conn.cursor()
+
+    if problem_id:
+        row = cursor.execute(
+            "SELECT count FROM submission_counts WHERE problem_id = ?", (problem_id,)
+        ).fetchone()
+        total = row["count"] if row else 0
+    else:
+        total = cursor.execute("SELECT COALESCE(SUM(count), 0) FROM submission_counts").fetchone()[0]
+
+    conditions, params = [], []
+    if problem_id:
+        conditions.append("s.problem_id = ?")
+        params.append(problem_id)
+    if after:
+        conditions.append("(s.created_at, s.id) < (?, ?)")
+        params.extend(after)
+    where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+    # Get submissions with problem info
+    cursor.execute(f"""
+        SELECT s.id, s.problem_id, p.question, s.is_correct, s.created_at,
+               s.feedback_summary, s.step_count, s.error_step_count
+        FROM submissions s
+        JOIN problems p ON s.problem_id = p.id
+        {where}
+        ORDER BY s.created_at DESC, s.id DESC
+        LIMIT ? OFFSET ?
+    """, (*params, limit, offset))
+    rows = [dict(row) for row in cursor.fetchall()]
+
+    pending = [row["id"] for row in rows if row["feedback_summary"] is None]
+    if pending:
+        placeholders = ",".join("?" * len(pending))
+        feedback = dict(cursor.execute(
+            f"SELECT id, feedback FROM submissions WHERE id IN ({placeholders})", pending
+        ).fetchall())
+        for row in rows:
+            if row["id"] in feedback:
+                data = json.loads(feedback[row["id"]]) if feedback[row["id"]] else {}
+                row["feedback_summary"], row["step_count"], row["error_step_count"] = feedback_columns(data)
+
+    return total, rows
+
+
+def _fetch_submission(conn, submission_id: int):
+    cursor = conn.cursor()
+    cursor.execute("""
+        SELECT s.*, p.question, p.correct_answer
+        FROM submissions s
+        JOIN problems p ON s.problem_id = p.id
+        WHERE s.id = ?
+    """, (submission_id,))
+    return cursor.fetchone()
+
 
 @router.post("", response_model=SubmissionResponse)
-async def create_submission(submission: SubmissionCreate):
+async def create_submission(
+    submission: SubmissionCreate,
+    idempotency_key: Optional[str] = Header(default=None)
+):
     """
     Submit a solution image for evaluation.
 
     1. Validates the problem exists
-    2. Claude Vision: checks image quality + extracts math (single call)
-    3. Claude: evaluates the extracted solution
-    4. Stores and returns the result
+    2. Serves repeat submissions of the same image from the result cache
+    3. Claude Vision: checks image quality + extracts math (single call,
+       optionally raced or hedged with Mathpix, see OCR_MODE);
+       in fused mode the same call also evaluates the work (steps 4-6 are
+       skipped unless its response can't be parsed)
+    4. Reuses a cached evaluation of equivalent (canonicalized) work
+    5. Checks the final answer locally with exact arithmetic; in fast-verdict
+       mode a decided check is returned without calling the evaluator
+    6. Claude: evaluates the extracted solution
+    7. Stores and returns the result
+
+    Returns 503 with Retry-After when the model rate limits leave no room
+    for the submission within a short wait.
+
+    Identical submissions (same image, problem and fast_verdict) made while
+    one is still being processed share its pipeline run and stored row. With
+    an `Idempotency-Key` header, repeating the request later returns the
+    original response; reusing the key for a different submission is a 422.
     """
     # Get problem with answer
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT id, question, correct_answer FROM problems WHERE id = ?",
-            (submission.problem_id,)
-        )
-        problem = cursor.fetchone()
+    with metrics.stage("problem_lookup"):
+        problem = catalog.problem(submission.problem_id)
+
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    try:
+        with metrics.stage("image_decode"):
+            image = ImageInput.from_base64(submission.image_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    cassette.record_submission("json", submission.problem_id, image, submission.fast_verdict)
+    return await _process_once(problem, submission.problem_id, image, submission.fast_verdict, idempotency_key)
+
+
+@router.post("/upload", response_model=SubmissionResponse)
+async def upload_submission(request: Request):
+    """
+    Submit a solution image as multipart/form-data instead of base64 JSON.
+
+    Form fields: `problem_id`, optional `fast_verdict` ("true"/"false") and the
+    file in `image`. The file is streamed into a size-limited spooled buffer
+    and its bytes go through the same pipeline as `POST /api/submissions`
+    (including coalescing and the `Idempotency-Key` header).
+    """
+    try:
+        with metrics.stage("upload_read"):
+            upload = await upload_reader.read(request)
+    except UploadTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except UploadError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    problem_id = upload.fields.get("problem_id")
+    if not problem_id:
+        raise HTTPException(status_code=400, detail="Missing form field 'problem_id'")
+
+    fast_verdict = upload.fields.get("fast_verdict")
+    if fast_verdict is not None:
+        fast_verdict = fast_verdict.strip().lower() in ("1", "true", "yes", "on")
+
+    with metrics.stage("problem_lookup"):
+        problem = catalog.problem(problem_id)
+
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    image = ImageInput(media_type=upload.file_media_type or "image/jpeg", data=upload.file_data)
+    cassette.record_submission("upload", problem_id, image, fast_verdict)
+    return await _process_once(problem, problem_id, image, fast_verdict, request.headers.get("Idempotency-Key"))
+
+
+@router.post("/stream")
+async def stream_submission(submission: SubmissionCreate):
+    """
+    Submit a solution and receive feedback as Server-Sent Events.
+
+    Takes the same body as `POST /api/submissions`. Events, in order:
+    `quality` (image check passed or failed), `extracted` (the transcribed
+    work), one `step` per StepAnalysis as soon as the evaluator has produced
+    it (`{"index", "step"}`; a later event with the same index replaces an
+    earlier one), and finally `result` with the full SubmissionResponse,
+    including the summary and `is_correct`.
+    """
+    with metrics.stage("problem_lookup"):
+        problem = catalog.problem(submission.problem_id)
 
     if not problem:
         raise HTTPException(status_code=404, detail="Problem not found")
 
-    # Step 1: Claude Vision — quality check + OCR in one call
-    vision_result = await vision_service.analyze(submission.image_data)
+    try:
+        with metrics.stage("image_decode"):
+            image = ImageInput.from_base64(submission.image_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Reject before the stream starts; later rejections arrive as an `error` event
+    rate_limiter.admit()
+    cassette.record_submission("stream", submission.problem_id, image, submission.fast_verdict)
+
+    async def event_stream():
+        try:
+            async for event, data in _submission_events(
+                problem, submission.problem_id, image, submission.fast_verdict, stream=True
+            ):
+                if isinstance(data, SubmissionResponse):
+                    data = data.model_dump()
+                yield _sse(event, data)
+        except RateLimitRejected as e:
+            yield _sse("error", {"detail": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            print(f"[Stream] Submission failed: {type(e).__name__}: {e}")
+            metrics.record_error("submission", e)
+            yield _sse("error", {"detail": "Submission processing failed"})
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        # Keep proxies from buffering the stream
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _sse(event: str, data) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+@router.post("/batch")
+async def create_submission_batch(batch: SubmissionBatchCreate):
+    """
+    Submit many (problem_id, image) pairs in one request.
+
+    Items run through the normal pipeline, at most BATCH_CONCURRENCY at a time
+    across all batches, and each result is streamed back as one NDJSON line as
+    soon as it completes:
+
+        {"index": 3, "problem_id": "...", "result": {SubmissionResponse, id 0}}
+        {"index": 5, "problem_id": "...", "error": "Problem not found"}
+
+    A failing item never affects the others. Once every item is done, all
+    rows are inserted in one transaction and a final line maps item indexes
+    to submission ids:
+
+        {"done": true, "submission_ids": {"3": 41, ...}, "succeeded": 9, "failed": 1}
+
+    The batch keeps running (and is stored) even if the client disconnects.
+    """
+    if not batch.submissions:
+        raise HTTPException(status_code=400, detail="No submissions in batch")
+    if len(batch.submissions) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch can have at most {BATCH_MAX_ITEMS} submissions")
+
+    rate_limiter.admit()
+    problems = catalog.problems({item.problem_id for item in batch.submissions})
+
+    lines: asyncio.Queue = asyncio.Queue()
+    task = asyncio.create_task(_run_batch(batch.submissions, problems, lines))
+    _batch_tasks.add(task)
+    task.add_done_callback(_batch_tasks.discard)
+
+    async def ndjson():
+        while (line := await lines.get()) is not None:
+            yield json.dumps(line) + "\n"
+
+    return StreamingResponse(ndjson(), media_type="application/x-ndjson")
+
+
+async def _run_batch(items: list[SubmissionCreate], problems: dict, lines: asyncio.Queue):
+    """Run every batch item, push one line per result, then store all rows at once."""
+
+    async def run_item(index: int, item: SubmissionCreate):
+        try:
+            problem = problems.get(item.problem_id)
+            if not problem:
+                raise LookupError("Problem not found")
+            image = ImageInput.from_base64(item.image_data)
+            async with _batch_slots:
+                response = await _process_submission(problem, item.problem_id, image, item.fast_verdict, store=False)
+            return index, item.problem_id, image, response, None
+        except (LookupError, ValueError, RateLimitRejected) as e:
+            return index, item.problem_id, None, None, str(e)
+        except Exception as e:
+            print(f"[Batch] Item {index} failed: {type(e).__name__}: {e}")
+            metrics.record_error("submission", e)
+            return index, item.problem_id, None, None, "Submission processing failed"
+
+    stored, failed = [], 0
+    try:
+        for next_done in asyncio.as_completed([run_item(i, item) for i, item in enumerate(items)]):
+            index, problem_id, image, response, error = await next_done
+            if error:
+                failed += 1
+                lines.put_nowait({"index": index, "problem_id": problem_id, "error": error})
+                continue
+            if not response.quality_failed:
+                stored.append((index, problem_id, image, response))
+            lines.put_nowait({"index": index, "problem_id": problem_id, "result": response.model_dump()})
+
+        ids = []
+        if stored:
+            with metrics.stage("db_insert"):
+                ids = await run_db(_insert_submissions, [
+                    (problem_id, image, response.extracted_work, response.is_correct, response.feedback.model_dump())
+                    for _, problem_id, image, response in stored
+                ])
+
+        lines.put_nowait({
+            "done": True,
+            "submission_ids": {str(index): submission_id for (index, *_), submission_id in zip(stored, ids)},
+            "succeeded": len(items) - failed,
+            "failed": failed,
+        })
+    except Exception as e:
+        print(f"[Batch] Failed to store batch: {type(e).__name__}: {e}")
+        lines.put_nowait({"done": True, "error": "Failed to store batch results"})
+    finally:
+        lines.put_nowait(None)
+
+
+@router.post("/jobs", response_model=SubmissionJobAccepted, status_code=202)
+async def create_submission_job(
+    submission: SubmissionCreate,
+    deferred: bool = Query(default=False, description="Wait for the next bulk grading run")
+):
+    """
+    Queue a submission for background evaluation and return immediately.
+
+    Poll `GET /api/submissions/jobs/{job_id}` for the status and, once it is
+    "done", the same SubmissionResponse `POST /api/submissions` would return.
+    With `?deferred=true` the job is graded by the next bulk run (Message
+    Batches API) instead of right away.
+    """
+    problem = catalog.problem(submission.problem_id)
+
+    if not problem:
+        raise HTTPException(status_code=404, detail="Problem not found")
+
+    try:
+        image = ImageInput.from_base64(submission.image_data)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    job_id = await job_queue.enqueue(submission.problem_id, image, submission.fast_verdict, deferred=deferred)
+
+    return SubmissionJobAccepted(
+        job_id=job_id,
+        status="deferred" if deferred else "queued",
+        status_url=f"{router.prefix}/jobs/{job_id}"
+    )
+
+
+@router.get("/jobs/{job_id}", response_model=SubmissionJobStatus)
+async def get_submission_job(job_id: str):
+    """Get the status of a background submission job (and its result when done)."""
+    job = await job_queue.get(job_id)
+
+    if not job:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    return SubmissionJobStatus(**job)
+
+
+async def run_submission_job(
+    problem_id: str,
+    image: ImageInput,
+    fast_verdict: Optional[bool] = None
+) -> SubmissionResponse:
+    """
+    Job handler used by the background workers (see main.startup_event).
+    Nobody is waiting on a job, so rate-limit rejections are waited out.
+    """
+    problem = catalog.problem(problem_id)
+    if not problem:
+        raise ValueError("Problem not found")
+    while True:
+        try:
+            return await _process_submission(problem, problem_id, image, fast_verdict)
+        except RateLimitRejected as e:
+            await asyncio.sleep(e.retry_after)
+
+
+async def run_bulk_grading(limit: Optional[int] = None) -> dict:
+    """
+    Grade deferred jobs through the Message Batches API and store the results.
+
+    Used by the admin endpoint and the `app.bulk_grade` CLI. Jobs are claimed,
+    graded by `bulk_grader` and written back to `submissions` and
+    `submission_jobs` in a single transaction. If the run is interrupted the
+    claimed jobs go back to "deferred".
+    """
+    claimed = await job_queue.claim_deferred(limit)
+    if not claimed:
+        return {"jobs": 0}
+
+    try:
+        problems = catalog.problems({problem_id for _, problem_id, _, _ in claimed})
+
+        items, failed = [], []
+        for job_id, problem_id, image, fast_verdict in claimed:
+            problem = problems.get(problem_id)
+            if not problem:
+                failed.append((job_id, "failed", None, "Problem not found"))
+                continue
+            items.append(BulkItem(
+                custom_id=job_id,
+                problem_id=problem_id,
+                question=problem["question"],
+                correct_answer=problem["correct_answer"],
+                image=image,
+                fast_verdict=fast_verdict
+            ))
+
+        outcomes = await bulk_grader.grade(items)
+
+        graded = [
+            (item.custom_id, item.problem_id, item.image, _final_response(
+                problems[item.problem_id], outcomes[item.custom_id].vision, outcomes[item.custom_id].evaluation
+            ))
+            for item in items
+        ]
+        await run_db(_store_bulk, graded, failed)
+    except BaseException:
+        await job_queue.requeue_batching([job_id for job_id, _, _, _ in claimed])
+        raise
+
+    return {
+        "jobs": len(claimed),
+        "graded": sum(1 for *_, response in graded if not response.quality_failed),
+        "quality_failed": sum(1 for *_, response in graded if response.quality_failed),
+        "failed": len(failed),
+    }
+
+
+def _store_bulk(conn, graded: list, failed: list):
+    """Insert every graded submission and finish every job in one transaction."""
+    stored = [entry for entry in graded if not entry[3].quality_failed]
+    ids = _insert_submissions(conn, [
+        (problem_id, image, response.extracted_work, response.is_correct, response.feedback.model_dump())
+        for _, problem_id, image, response in stored
+    ])
+    for (_, _, _, response), submission_id in zip(stored, ids):
+        response.id = submission_id
+
+    JobQueue.finish_many(conn, list(failed) + [
+        (job_id, "done", json.dumps(response.model_dump()), None)
+        for job_id, _, _, response in graded
+    ])
+
+
+async def _process_once(
+    problem,
+    problem_id: str,
+    image: ImageInput,
+    fast_verdict: Optional[bool],
+    idempotency_key: Optional[str]
+) -> SubmissionResponse:
+    """
+    `_process_submission` for the interactive endpoints: replays a completed
+    request with the same idempotency key, and coalesces concurrent
+    identical submissions onto one pipeline run.
+    """
+    fingerprint = f"{result_cache.make_key(image, problem_id)}:{fast_verdict}"
+    if idempotency_key:
+        try:
+            replay = idempotency_keys.lookup(idempotency_key, fingerprint)
+        except IdempotencyConflict as e:
+            raise HTTPException(status_code=422, detail=str(e))
+        if replay:
+            return replay
+
+    async def run():
+        rate_limiter.admit()
+        return await _process_submission(problem, problem_id, image, fast_verdict)
+
+    response = await single_flight.run(fingerprint, run)
+    if idempotency_key:
+        idempotency_keys.put(idempotency_key, fingerprint, response)
+    return response
+
+
+async def _process_submission(
+    problem,
+    problem_id: str,
+    image: ImageInput,
+    fast_verdict: Optional[bool] = None,
+    store: bool = True
+) -> SubmissionResponse:
+    """
+    Run the vision → evaluation pipeline for one image and store the result.
+    With `store=False` the response comes back unstored (id=0) for the caller
+    to insert.
+    """
+    result = None
+    async for event, data in _submission_events(problem, problem_id, image, fast_verdict, store=store):
+        if event == "result":
+            result = data
+    return result
+
+
+async def _submission_events(
+    problem,
+    problem_id: str,
+    image: ImageInput,
+    fast_verdict: Optional[bool] = None,
+    stream: bool = False,
+    store: bool = True
+) -> AsyncIterator[tuple[str, object]]:
+    """
+    The submission pipeline as a sequence of (event, data) pairs.
+
+    Emits "quality" once the image has been checked, "extracted" with the
+    transcribed work, one "step" per StepAnalysis and finally "result" with
+    the stored SubmissionResponse. With `stream=True` the evaluator's output
+    is streamed and steps are emitted as soon as they can be parsed.
+    Every model call shares one SUBMISSION_DEADLINE budget.
+    """
+    # Identical image + problem seen before? Reuse the stored results
+    cache_key = result_cache.make_key(image, problem_id)
+    with metrics.stage("cache_lookup"):
+        cached = await result_cache.get(cache_key)
+    mode, fused = None, None
+    started = time.perf_counter()
+    deadline = Deadline(SUBMISSION_DEADLINE)
+    if cached:
+        vision_result, eval_result = cached
+    else:
+        eval_result = None
+        # Fused mode evaluates in the vision call itself; fast verdicts need only the transcription
+        mode = "two_call"
+        if not answer_checker.use_fast_verdict(fast_verdict):
+            mode = await pipeline_mode.choose(problem_id, problem["topic_id"])
+        if mode == "fused":
+            with metrics.stage("fused"):
+                fused = await fused_service.analyze_and_evaluate(
+                    image, problem["question"], problem["correct_answer"], deadline
+                )
+
+        if fused is not None:
+            vision_result, eval_result = fused.vision, fused.evaluation
+        else:
+            # Step 1: Claude Vision — quality check + OCR in one call, hedged
+            # with Mathpix per OCR_MODE (also the fallback when a fused
+            # response can't be parsed)
+            with metrics.stage("vision"):
+                vision_result = await ocr_router.analyze(image, deadline)
 
     # Handle API/system errors
     if vision_result.error:
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO submissions (problem_id, image_data, extracted_text, is_correct, feedback)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                submission.problem_id,
-                submission.image_data[:100] + "...",
-                None,
-                False,
-                json.dumps({
-                    "summary": f"Could not process your image: {vision_result.error}",
-                    "steps_analysis": [],
-                    "suggestions": ["Please try again in a moment"],
-                    "encouragement": "Don't give up! This is a temporary issue."
-                })
-            ))
-            submission_id = cursor.lastrowid
+        yield "result", await _store_response(problem_id, image, _final_response(problem, vision_result, None), store)
+        return
+
+    # Handle quality check failure
+    if not vision_result.readable:
+        if not cached:
+            await result_cache.put(cache_key, problem_id, vision_result)
 
+        yield "quality", {
+            "readable": False,
+            "issues": vision_result.issues or [],
+            "suggestion": vision_result.suggestion,
+        }
+
+        yield "result", _final_response(problem, vision_result, None)
+        return
+
+    yield "quality", {"readable": True, "issues": vision_result.issues or [], "suggestion": None}
+    yield "extracted", {"extracted_work": vision_result.extracted_text}
+
+    # Step 2: Claude — evaluate the extracted text (unless equivalent work was seen before)
+    streamed_steps = False
+    evaluated = fused is not None and eval_result is not None
+    if eval_result is None:
+        eval_key = evaluation_cache.make_key(vision_result.extracted_text, problem_id)
+        with metrics.stage("cache_lookup"):
+            eval_result = await evaluation_cache.get(eval_key)
+
+    if eval_result is None:
+        # Exact local check of the final answer; decides is_correct when it can
+        answer_check = answer_checker.check(problem["correct_answer"], vision_result.extracted_text)
+
+        if answer_check.decided and answer_checker.use_fast_verdict(fast_verdict):
+            # Fast verdict: skip the LLM round-trip (and don't cache the thin feedback)
+            eval_result = EvaluationResult(
+                success=True,
+                is_correct=answer_check.is_correct,
+                feedback=answer_checker.fast_feedback(
+                    answer_check,
+                    step_verifier.verify(problem["question"], vision_result.extracted_text)
+                )
+            )
+        elif stream:
+            with metrics.stage("evaluation"):
+                async for event in evaluator_service.evaluate_stream(
+                    question=problem["question"],
+                    correct_answer=problem["correct_answer"],
+                    extracted_text=vision_result.extracted_text,
+                    answer_check=answer_check,
+                    deadline=deadline
+                ):
+                    if event[0] == "step":
+                        _, index, step = event
+                        yield "step", {"index": index, "step": step.model_dump()}
+                        streamed_steps = True
+                    else:
+                        eval_result = event[1]
+            evaluated = True
+            await evaluation_cache.put(eval_key, problem_id, eval_result)
+            await result_cache.put(cache_key, problem_id, vision_result, eval_result)
+        else:
+            with metrics.stage("evaluation"):
+                eval_result = await evaluator_service.evaluate(
+                    question=problem["question"],
+                    correct_answer=problem["correct_answer"],
+                    extracted_text=vision_result.extracted_text,
+                    answer_check=answer_check,
+                    deadline=deadline
+                )
+            evaluated = True
+            await evaluation_cache.put(eval_key, problem_id, eval_result)
+            await result_cache.put(cache_key, problem_id, vision_result, eval_result)
+    elif evaluated:
+        # The fused call already evaluated the work; cache it like a two-call evaluation
+        eval_key = evaluation_cache.make_key(vision_result.extracted_text, problem_id)
+        await evaluation_cache.put(eval_key, problem_id, eval_result)
+        await result_cache.put(cache_key, problem_id, vision_result, eval_result)
+    elif not cached:
+        await result_cache.put(cache_key, problem_id, vision_result, eval_result)
+
+    # Only "auto" mode reads the samples; pinned modes skip the extra check and write
+    if evaluated and pipeline_mode.is_measured(problem_id, problem["topic_id"]):
+        await _record_mode_sample(problem, problem_id, mode, fused, started, vision_result, eval_result)
+
+    if not eval_result.success:
+        yield "result", await _store_response(problem_id, image, _final_response(problem, vision_result, eval_result), store)
+        return
+
+    # Cached and fast-verdict feedback arrives whole; still emit it step by step
+    if not streamed_steps:
+        for index, step in enumerate(eval_result.feedback.steps_analysis):
+            yield "step", {"index": index, "step": step.model_dump()}
+
+    # Success — store complete result
+    yield "result", await _store_response(problem_id, image, _final_response(problem, vision_result, eval_result), store)
+
+
+def _final_response(
+    problem,
+    vision_result: VisionResult,
+    eval_result: Optional[EvaluationResult]
+) -> SubmissionResponse:
+    """
+    The response for a finished pipeline run, before it is stored (id=0).
+
+    Quality failures are returned as-is and never stored; every other
+    outcome is stored by `_store_response`.
+    """
+    # API/system errors
+    if vision_result.error:
         return SubmissionResponse(
-            id=submission_id,
+            id=0,
             is_correct=False,
             extracted_work=None,
             feedback=Feedback(
@@ -77,7 +773,7 @@ async def create_submission(submission: SubmissionCreate):
             ),
         )
 
-    # Handle quality check failure
+    # Quality check failure
     if not vision_result.readable:
         issues_text = ", ".join(vision_result.issues) if vision_result.issues else "Image quality too low"
         return SubmissionResponse(
@@ -97,123 +793,117 @@ async def create_submission(submission: SubmissionCreate):
             quality_failed=True
         )
 
-    # Step 2: Claude — evaluate the extracted text
-    eval_result = await evaluator_service.evaluate(
-        question=problem["question"],
-        correct_answer=problem["correct_answer"],
-        extracted_text=vision_result.extracted_text
-    )
-
+    # Extracted but evaluation failed
     if not eval_result.success:
-        feedback = Feedback(
-            summary=f"We extracted your work but couldn't fully evaluate it: {eval_result.error}",
-            steps_analysis=[
-                StepAnalysis(
-                    step="Your work",
-                    evaluation="unclear",
-                    comment=vision_result.extracted_text or "Work extracted but evaluation unavailable"
-                )
-            ],
-            suggestions=["Please try again in a moment"],
-            encouragement=f"The correct answer is: {problem['correct_answer']}"
-        )
-
-        with get_db() as conn:
-            cursor = conn.cursor()
-            cursor.execute("""
-                INSERT INTO submissions (problem_id, image_data, extracted_text, is_correct, feedback)
-                VALUES (?, ?, ?, ?, ?)
-            """, (
-                submission.problem_id,
-                submission.image_data[:100] + "...",
-                vision_result.extracted_text,
-                False,
-                json.dumps(feedback.model_dump())
-            ))
-            submission_id = cursor.lastrowid
-
         return SubmissionResponse(
-            id=submission_id,
+            id=0,
             is_correct=False,
             extracted_work=vision_result.extracted_text,
-            feedback=feedback,
+            feedback=Feedback(
+                summary=f"We extracted your work but couldn't fully evaluate it: {eval_result.error}",
+                steps_analysis=[
+                    StepAnalysis(
+                        step="Your work",
+                        evaluation="unclear",
+                        comment=vision_result.extracted_text or "Work extracted but evaluation unavailable"
+                    )
+                ],
+                suggestions=["Please try again in a moment"],
+                encouragement=f"The correct answer is: {problem['correct_answer']}"
+            ),
         )
 
-    # Success — store complete result
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            INSERT INTO submissions (problem_id, image_data, extracted_text, is_correct, feedback)
-            VALUES (?, ?, ?, ?, ?)
-        """, (
-            submission.problem_id,
-            submission.image_data[:100] + "...",
-            vision_result.extracted_text,
-            eval_result.is_correct,
-            json.dumps(eval_result.feedback.model_dump())
-        ))
-        submission_id = cursor.lastrowid
-
     return SubmissionResponse(
-        id=submission_id,
+        id=0,
         is_correct=eval_result.is_correct,
         extracted_work=vision_result.extracted_text,
         feedback=eval_result.feedback,
     )
 
 
+async def _store_response(
+    problem_id: str,
+    image: ImageInput,
+    response: SubmissionResponse,
+    store: bool = True
+) -> SubmissionResponse:
+    if not store:
+        return response
+    with metrics.stage("db_insert"):
+        response.id = await run_db(
+            _insert_submission,
+            problem_id,
+            image,
+            response.extracted_work,
+            response.is_correct,
+            response.feedback.model_dump()
+        )
+    return response
+
+
+async def _record_mode_sample(problem, problem_id, mode, fused, started, vision_result, eval_result):
+    """Feed the latency and accuracy of a fresh evaluation back into mode selection."""
+    answer_check = answer_checker.check(problem["correct_answer"], vision_result.extracted_text)
+    disagreed = (
+        answer_check.decided
+        and eval_result.success
+        and eval_result.is_correct != answer_check.is_correct
+    )
+    await pipeline_mode.record(
+        problem_id,
+        problem["topic_id"],
+        mode,
+        (time.perf_counter() - started) * 1000,
+        # A fused response that had to fall back to two calls counts against fused
+        failed=not eval_result.success or (mode == "fused" and fused is None),
+        disagreed=disagreed
+    )
+
+
 @router.get("", response_model=SubmissionHistoryResponse)
 async def list_submissions(
     limit: int = Query(default=10, ge=1, le=100),
-    offset: int = Query(default=0, ge=0)
+    cursor: Optional[str] = Query(default=None, description="`next_cursor` of the previous page"),
+    offset: int = Query(default=0, ge=0, description="Rows to skip; prefer `cursor`, which stays fast on deep pages"),
+    problem_id: Optional[str] = Query(default=None, description="Only submissions for this problem")
 ):
-    """Get submission history with pagination."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-
-        # Get total count
-        cursor.execute("SELECT COUNT(*) as count FROM submissions")
-        total = cursor.fetchone()["count"]
-
-        # Get submissions with problem info
-        cursor.execute("""
-            SELECT s.id, s.problem_id, p.question, s.is_correct, s.feedback, s.created_at
-            FROM submissions s
-            JOIN problems p ON s.problem_id = p.id
-            ORDER BY s.created_at DESC
-            LIMIT ? OFFSET ?
-        """, (limit, offset))
-        rows = cursor.fetchall()
+    """
+    Get submission history, newest first.
+
+    Pass the returned `next_cursor` as `cursor` to get the following page;
+    it is null on the last page.
+    """
+    try:
+        after = _decode_cursor(cursor) if cursor else None
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # One extra row tells whether there is a next page
+    total, rows = await run_db(_fetch_history, limit + 1, offset, after, problem_id)
+    next_cursor = _encode_cursor(rows[limit - 1]["created_at"], rows[limit - 1]["id"]) if len(rows) > limit else None
 
     submissions = []
-    for row in rows:
-        feedback_data = json.loads(row["feedback"]) if row["feedback"] else {}
+    for row in rows[:limit]:
         submissions.append(
             SubmissionHistoryItem(
                 id=row["id"],
                 problem_id=row["problem_id"],
                 question=row["question"],
                 is_correct=row["is_correct"],
-                feedback_summary=feedback_data.get("summary", ""),
+                feedback_summary=row["feedback_summary"],
+                step_count=row["step_count"],
+                error_step_count=row["error_step_count"],
                 created_at=row["created_at"]
             )
         )
 
-    return SubmissionHistoryResponse(submissions=submissions, total=total)
+    return SubmissionHistoryResponse(submissions=submissions, total=total, next_cursor=next_cursor)
 
 
 @router.get("/{submission_id}", response_model=SubmissionDetail)
 async def get_submission(submission_id: int):
     """Get full details of a specific submission."""
-    with get_db() as conn:
-        cursor = conn.cursor()
-        cursor.execute("""
-            SELECT s.*, p.question, p.correct_answer
-            FROM submissions s
-            JOIN problems p ON s.problem_id = p.id
-            WHERE s.id = ?
-        """, (submission_id,))
-        row = cursor.fetchone()
+    row = await run_db(_fetch_submission, submission_id)
 
     if not row:
         raise HTTPException(status_code=404, detail="Submission not found")
@@ -0,0 +1,173 @@
+import os
+import re
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional
+
+from ..models import Feedback, StepAnalysis
+from .exact_math import Linear, MathParseError, parse_line, format_fraction
+
+
+@dataclass
+class AnswerCheck:
+    """Result of checking a student's final answer with exact arithmetic."""
+    decided: bool
+    is_correct: Optional[bool] = None
+    student_answer: Optional[str] = None
+    expected_value: Optional[Fraction] = None
+    student_value: Optional[Fraction] = None
+
+
+def _assignment_value(sides: list[Linear]) -> Optional[Fraction]:
+    """Value of a `var = c` (or `c = var`) line, else None."""
+    if len(sides) != 2:
+        return None
+    lhs, rhs = sides
+    if lhs.is_bare_variable and rhs.is_constant:
+        return rhs.const
+    if rhs.is_bare_variable and lhs.is_constant:
+        return lhs.const
+    return None
+
+
+def _constant_value(sides: list[Linear]) -> Optional[Fraction]:
+    """Value of a pure-arithmetic line: its last side ("1/4 + 2/4 = 3/4" -> 3/4)."""
+    if all(side.is_constant for side in sides):
+        return sides[-1].const
+    return None
+
+
+# Lines that check the answer rather than state it ("Check: 3/4 - 1/2 = 1/4")
+_CHECK_LINE_RE = re.compile(r"^\W*(check|checking|verify|verification|proof)\b", re.IGNORECASE)
+
+
+def _parse(line: str) -> Optional[list[Linear]]:
+    try:
+        return parse_line(line)
+    except MathParseError:
+        return None
+
+
+def _line_value(line: str) -> Optional[Fraction]:
+    sides = _parse(line)
+    if sides is None:
+        return None
+    value = _constant_value(sides)
+    return value if value is not None else _assignment_value(sides)
+
+
+class AnswerChecker:
+    """Decides whether a student's final answer matches the expected one, locally."""
+
+    def __init__(self):
+        # When on, a locally decided verdict is returned without an LLM call
+        self.fast_verdict_default = os.getenv("FAST_VERDICT_MODE", "0") == "1"
+
+    def use_fast_verdict(self, requested: Optional[bool]) -> bool:
+        return self.fast_verdict_default if requested is None else requested
+
+    def check(self, correct_answer: str, extracted_text: Optional[str]) -> AnswerCheck:
+        """
+        Compare the student's final answer with the correct answer.
+
+        Equation answers ("x = 4") are matched against the last `var = value`
+        line of the work; numeric answers ("17/12", "$28", "20") against the
+        value of the last line. Lines labelled as a check ("Check:", "Verify")
+        are skipped. Returns `decided=False` whenever either side can't be
+        read unambiguously, so the caller falls back to the LLM.
+        """
+        if not extracted_text:
+            return AnswerCheck(decided=False)
+
+        expected_sides = _parse(correct_answer)
+        if expected_sides is None:
+            return AnswerCheck(decided=False)
+
+        lines = [
+            line.strip() for line in extracted_text.splitlines()
+            if line.strip() and not _CHECK_LINE_RE.match(line.strip())
+        ]
+        if not lines:
+            return AnswerCheck(decided=False)
+
+        expected = _assignment_value(expected_sides)
+        if expected is not None:
+            # Equation problem: take the last line that isolates the variable
+            for line in reversed(lines):
+                sides = _parse(line)
+                value = _assignment_value(sides) if sides else None
+                if value is not None:
+                    return self._verdict(expected, value, line)
+            return AnswerCheck(decided=False)
+
+        expected = _constant_value(expected_sides)
+        if expected is None:
+            return AnswerCheck(decided=False)
+
+        final_line = lines[-1]
+        sides = _parse(final_line)
+        if sides is None:
+            return AnswerCheck(decided=False)
+
+        value = _constant_value(sides)
+        if value is None:
+            value = _assignment_value(sides)
+        if value is None:
+            return AnswerCheck(decided=False)
+        if value != expected and any(_line_value(line) == expected for line in lines[:-1]):
+            # The expected value was reached earlier; the last line may be an unlabelled check
+            return AnswerCheck(decided=False)
+        return self._verdict(expected, value, final_line)
+
+    @staticmethod
+    def _verdict(expected: Fraction, value: Fraction, line: str) -> AnswerCheck:
+        return AnswerCheck(
+            decided=True,
+            is_correct=value == expected,
+            student_answer=line,
+            expected_value=expected,
+            student_value=value,
+        )
+
+    def fast_feedback(
+        self,
+        check: AnswerCheck,
+        steps: Optional[list[StepAnalysis]] = None
+    ) -> Feedback:
+        """
+        Minimal feedback for a locally decided verdict (no LLM call).
+
+        `steps` are locally verified step labels; without them the analysis
+        only covers the final answer.
+        """
+        if check.is_correct:
+            return Feedback(
+                summary=f"Your final answer ({check.student_answer}) is correct.",
+                steps_analysis=steps or [
+                    StepAnalysis(
+                        step=check.student_answer,
+                        evaluation="correct",
+                        comment="Your final answer matches the expected answer exactly."
+                    )
+                ],
+                suggestions=[],
+                encouragement="Great job!"
+            )
+
+        return Feedback(
+            summary=f"Your final answer ({check.student_answer}) is not correct.",
+            steps_analysis=steps or [
+                StepAnalysis(
+                    step=check.student_answer,
+                    evaluation="incorrect",
+                    comment=f"This works out to {format_fraction(check.student_value)}, "
+                            "which doesn't match the expected answer."
+                )
+            ],
+            suggestions=["Go back through your steps and check each calculation"],
+            encouragement="You're close — take another look and try again!"
+        )
+
+
+# Singleton instance
+answer_checker = AnswerChecker()
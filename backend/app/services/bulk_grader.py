@@ -0,0 +1,232 @@
+import os
+import asyncio
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+from .llm_client import get_client, usage_tracker
+from .ocr import VisionResult, ImageInput, vision_service
+from .evaluator import EvaluationResult, evaluator_service
+from .answer_checker import answer_checker
+from .step_verifier import step_verifier
+from .result_cache import result_cache, evaluation_cache
+
+
+@dataclass
+class BulkItem:
+    """One submission to grade in a bulk run; `custom_id` is its job id."""
+    custom_id: str
+    problem_id: str
+    question: str
+    correct_answer: str
+    image: ImageInput
+    fast_verdict: Optional[bool] = None
+
+
+@dataclass
+class BulkOutcome:
+    """Vision result and (when the work was readable) evaluation for one item."""
+    vision: VisionResult
+    evaluation: Optional[EvaluationResult] = None
+
+
+class BulkGrader:
+    """
+    Grades many submissions through the Message Batches API instead of one
+    interactive call per stage.
+
+    A run sends one set of batches with the vision requests, waits for them
+    to end, then sends the evaluation requests for the readable results.
+    Batched requests are billed at a discount and don't count against the
+    interactive rate limits; in exchange results can take anywhere from
+    minutes to (rarely) a day. The result and evaluation caches, the local
+    quality pre-check and fast verdicts apply exactly as in the interactive
+    pipeline, so only work that actually needs the model is batched.
+    """
+
+    def __init__(self):
+        self.poll_interval = float(os.getenv("BULK_POLL_INTERVAL", "30"))
+        # Each batch is capped at 100,000 requests / 256 MB; photos hit the size cap first
+        self.max_batch_requests = int(os.getenv("BULK_MAX_BATCH_REQUESTS", "1000"))
+        self._task: Optional[asyncio.Task] = None
+        self.last_run: dict = {}
+
+    # --- batch mechanics ---
+
+    async def _run_batches(self, kind: str, requests: dict[str, dict]) -> dict[str, tuple[Optional[str], Optional[str]]]:
+        """
+        Submit `requests` (custom_id -> Messages API params) as one or more
+        batches and wait for them. Returns custom_id -> (response text, error).
+        """
+        ids = list(requests)
+        chunks = [ids[i:i + self.max_batch_requests] for i in range(0, len(ids), self.max_batch_requests)]
+        results: dict[str, tuple[Optional[str], Optional[str]]] = {}
+        for chunk_results in await asyncio.gather(*(
+            self._run_batch(kind, {custom_id: requests[custom_id] for custom_id in chunk})
+            for chunk in chunks
+        )):
+            results.update(chunk_results)
+        return results
+
+    async def _run_batch(self, kind: str, requests: dict[str, dict]) -> dict[str, tuple[Optional[str], Optional[str]]]:
+        # The shared client leaves retries to the resilience layer; a batch run just lets the SDK retry
+        client = get_client().with_options(max_retries=3)
+        try:
+            batch = await client.messages.batches.create(requests=[
+                {"custom_id": custom_id, "params": params}
+                for custom_id, params in requests.items()
+            ])
+            print(f"[Bulk] Created {kind} batch {batch.id} with {len(requests)} request(s)")
+            self.last_run.setdefault("batches", []).append(batch.id)
+
+            while batch.processing_status != "ended":
+                await asyncio.sleep(self.poll_interval)
+                batch = await client.messages.batches.retrieve(batch.id)
+
+            counts = batch.request_counts
+            print(
+                f"[Bulk] {kind} batch {batch.id} ended: succeeded={counts.succeeded} "
+                f"errored={counts.errored} expired={counts.expired} canceled={counts.canceled}"
+            )
+
+            results = {}
+            async for entry in await client.messages.batches.results(batch.id):
+                if entry.result.type == "succeeded":
+                    message = entry.result.message
+                    usage_tracker.record(f"{kind}_batch", message.usage)
+                    results[entry.custom_id] = (message.content[0].text.strip(), None)
+                elif entry.result.type == "errored":
+                    results[entry.custom_id] = (None, f"Batch request failed: {entry.result.error.error.message}")
+                else:
+                    results[entry.custom_id] = (None, f"Batch request {entry.result.type}")
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Bulk] {kind} batch failed: {type(e).__name__}: {e}")
+            return {custom_id: (None, f"Batch error: {e}") for custom_id in requests}
+
+        # Anything the results file left out is treated as failed
+        for custom_id in requests:
+            results.setdefault(custom_id, (None, "Batch result missing"))
+        return results
+
+    # --- grading ---
+
+    async def grade(self, items: list[BulkItem]) -> dict[str, BulkOutcome]:
+        """Grade every item; returns custom_id -> BulkOutcome."""
+        outcomes: dict[str, BulkOutcome] = {}
+        by_id = {item.custom_id: item for item in items}
+        cache_keys = {item.custom_id: result_cache.make_key(item.image, item.problem_id) for item in items}
+
+        # Stage 1: vision, for images not seen before and not rejected locally
+        vision_requests = {}
+        for item in items:
+            cached = await result_cache.get(cache_keys[item.custom_id])
+            if cached:
+                outcomes[item.custom_id] = BulkOutcome(*cached)
+                continue
+
+            rejected, prepared = await vision_service.screen(item.image)
+            if rejected:
+                outcomes[item.custom_id] = BulkOutcome(rejected)
+            else:
+                vision_requests[item.custom_id] = vision_service.request_params(prepared)
+
+        fresh = set(vision_requests)
+        if vision_requests:
+            for custom_id, (text, error) in (await self._run_batches("vision", vision_requests)).items():
+                vision = VisionResult(readable=False, error=error) if error else vision_service.parse_response(text)
+                outcomes[custom_id] = BulkOutcome(vision)
+
+        # Stage 2: evaluation, for readable work without a cached or fast verdict
+        eval_requests, eval_context, fast = {}, {}, set()
+        for custom_id, outcome in outcomes.items():
+            item = by_id[custom_id]
+            if outcome.vision.error or not outcome.vision.readable or outcome.evaluation is not None:
+                continue
+
+            extracted_text = outcome.vision.extracted_text
+            outcome.evaluation = await evaluation_cache.get(evaluation_cache.make_key(extracted_text, item.problem_id))
+            if outcome.evaluation is not None:
+                continue
+
+            answer_check = answer_checker.check(item.correct_answer, extracted_text)
+            if answer_check.decided and answer_checker.use_fast_verdict(item.fast_verdict):
+                outcome.evaluation = EvaluationResult(
+                    success=True,
+                    is_correct=answer_check.is_correct,
+                    feedback=answer_checker.fast_feedback(
+                        answer_check, step_verifier.verify(item.question, extracted_text)
+                    )
+                )
+                fast.add(custom_id)
+                continue
+
+            precheck = evaluator_service.precheck(extracted_text)
+            if precheck:
+                outcome.evaluation = precheck
+                continue
+
+            params, verified_steps, focused = evaluator_service.build_request(
+                item.question, item.correct_answer, extracted_text, answer_check
+            )
+            eval_requests[custom_id] = params
+            eval_context[custom_id] = (verified_steps, focused)
+
+        if eval_requests:
+            for custom_id, (text, error) in (await self._run_batches("evaluation", eval_requests)).items():
+                if error:
+                    evaluation = EvaluationResult(success=False, error=error)
+                else:
+                    evaluation = evaluator_service.parse_response(text, *eval_context[custom_id])
+                outcomes[custom_id].evaluation = evaluation
+
+                item = by_id[custom_id]
+                extracted_text = outcomes[custom_id].vision.extracted_text
+                await evaluation_cache.put(evaluation_cache.make_key(extracted_text, item.problem_id), item.problem_id, evaluation)
+
+        # Cache fresh results for later resubmissions (not the thin fast-verdict feedback)
+        for custom_id in fresh - fast:
+            outcome = outcomes[custom_id]
+            await result_cache.put(cache_keys[custom_id], by_id[custom_id].problem_id, outcome.vision, outcome.evaluation)
+
+        return outcomes
+
+    # --- background runs (admin endpoint) ---
+
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start_run(self, runner: Callable[[], Awaitable[dict]]) -> bool:
+        """Start `runner` as a background bulk run. Returns False if one is already running."""
+        if self.is_running():
+            return False
+
+        async def run():
+            self.last_run = {"status": "running", "started_at": time.time(), "batches": []}
+            try:
+                summary = await runner()
+            except asyncio.CancelledError:
+                self.last_run.update(status="cancelled", finished_at=time.time())
+                raise
+            except Exception as e:
+                print(f"[Bulk] Run failed: {type(e).__name__}: {e}")
+                self.last_run.update(status="failed", error=str(e), finished_at=time.time())
+                return
+            self.last_run.update(status="done", summary=summary, finished_at=time.time())
+
+        self._task = asyncio.create_task(run(), name="bulk-grading-run")
+        return True
+
+    async def stop(self):
+        """Cancel a background run (its claimed jobs are returned to "deferred")."""
+        if self.is_running():
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+
+    def stats(self) -> dict:
+        return {"running": self.is_running(), **self.last_run}
+
+
+# Singleton instance
+bulk_grader = BulkGrader()
@@ -0,0 +1,365 @@
+import os
+import json
+import time
+import queue
+import base64
+import asyncio
+import hashlib
+import threading
+from pathlib import Path
+from typing import Awaitable, Callable, Optional
+
+import anthropic
+import httpx
+from anthropic.types import Message
+
+DEFAULT_DIR = Path(__file__).parent.parent.parent / "cassette"
+
+# Status errors replayed as their SDK exception class (others as APIStatusError / InternalServerError)
+STATUS_ERRORS = {
+    400: anthropic.BadRequestError,
+    401: anthropic.AuthenticationError,
+    403: anthropic.PermissionDeniedError,
+    404: anthropic.NotFoundError,
+    409: anthropic.ConflictError,
+    422: anthropic.UnprocessableEntityError,
+    429: anthropic.RateLimitError,
+}
+
+_REQUEST = httpx.Request("POST", "https://api.anthropic.com/v1/messages")
+
+
+class CassetteMiss(Exception):
+    """A replayed request with no recording in the cassette."""
+
+    def __init__(self, key: str):
+        super().__init__(f"No recorded response for request {key[:12]}")
+
+
+class Cassette:
+    """
+    Record-and-replay of model calls, for rerunning real traffic against a
+    new build offline.
+
+    With CASSETTE_MODE=record, every Messages API call made through
+    llm_client (vision, evaluation and fused) is appended to
+    CASSETTE_DIR/calls.jsonl: the request, the response or error, and its
+    timing (streams keep the offset of every text chunk). Each interactive
+    submission is appended to traffic.jsonl with its arrival time. Images
+    and long prompt texts go to blobs/ once, named by their SHA-256, and
+    records refer to them by hash. All of that file work happens on one
+    writer thread, fed by a queue in arrival order, so recording never
+    blocks the event loop.
+
+    With CASSETTE_MODE=replay, calls are answered from the cassette after
+    their recorded latency and nothing goes over the network. A call matches
+    a recording with the same request hash, or failing that the same
+    messages (so a build with a reworded system prompt still replays).
+    Repeats of a request get its recordings in order, e.g. a failure and
+    then its retry, and the last one after that.
+    """
+
+    MODES = ("off", "record", "replay")
+
+    # Text blocks at least this long are stored as blobs
+    BLOB_MIN_CHARS = 1024
+
+    def __init__(self):
+        self.mode = os.getenv("CASSETTE_MODE", "off").lower()
+        if self.mode not in self.MODES:
+            self.mode = "off"
+        self.directory = Path(os.getenv("CASSETTE_DIR") or DEFAULT_DIR)
+        # Replay: request hash -> recordings, and how many of them were served
+        self._recordings: Optional[dict[str, list[dict]]] = None
+        self._served: dict[str, int] = {}
+        # Record: (file name, function building the record) for the writer thread
+        self._writes: queue.Queue = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+        self._writer_lock = threading.Lock()
+        self.counts = {"recorded": 0, "replayed": 0, "misses": 0, "submissions": 0}
+
+    @property
+    def blob_dir(self) -> Path:
+        return self.directory / "blobs"
+
+    def store_blob(self, data: bytes) -> str:
+        digest = hashlib.sha256(data).hexdigest()
+        path = self.blob_dir / digest
+        if not path.exists():
+            self.blob_dir.mkdir(parents=True, exist_ok=True)
+            path.write_bytes(data)
+        return digest
+
+    def load_blob(self, digest: str) -> bytes:
+        return (self.blob_dir / digest).read_bytes()
+
+    def normalize(self, value, store: bool = False):
+        """
+        `value` (request params or part of them) with images and long texts
+        replaced by blob hashes and cache_control markers dropped, so the
+        same request always normalizes the same way.
+        """
+        if isinstance(value, list):
+            return [self.normalize(item, store) for item in value]
+        if not isinstance(value, dict):
+            return value
+
+        if value.get("type") == "image" and value.get("source", {}).get("type") == "base64":
+            data = base64.b64decode(value["source"]["data"])
+            digest = self.store_blob(data) if store else hashlib.sha256(data).hexdigest()
+            return {"type": "image", "media_type": value["source"]["media_type"], "blob": digest}
+        if value.get("type") == "text" and len(value.get("text", "")) >= self.BLOB_MIN_CHARS:
+            data = value["text"].encode()
+            digest = self.store_blob(data) if store else hashlib.sha256(data).hexdigest()
+            return {"type": "text", "blob": digest}
+
+        return {
+            key: self.normalize(item, store)
+            for key, item in value.items()
+            if key != "cache_control"
+        }
+
+    @staticmethod
+    def keys(request: dict) -> tuple[str, str]:
+        """(hash of the whole normalized request, hash of its messages alone)."""
+        def digest(value) -> str:
+            return hashlib.sha256(json.dumps(value, sort_keys=True).encode()).hexdigest()
+        return digest(request), digest(request.get("messages"))
+
+    def _append(self, name: str, record: dict):
+        self.directory.mkdir(parents=True, exist_ok=True)
+        with open(self.directory / name, "a") as f:
+            f.write(json.dumps(record, separators=(",", ":")) + "\n")
+
+    def _write_later(self, name: str, build: Callable[[], dict]):
+        """Queue a record for the writer thread, which builds it (storing any blobs) and appends it to `name`."""
+        with self._writer_lock:
+            if self._writer is None or not self._writer.is_alive():
+                self._writer = threading.Thread(target=self._write_loop, name="cassette-writer", daemon=True)
+                self._writer.start()
+        self._writes.put((name, build))
+
+    def _write_loop(self):
+        while True:
+            item = self._writes.get()
+            try:
+                if item is None:
+                    return
+                name, build = item
+                self._append(name, build())
+            except Exception as e:
+                print(f"[Cassette] Failed to write a record: {e}")
+            finally:
+                self._writes.task_done()
+
+    def flush(self):
+        """Block until every queued record is on disk."""
+        self._writes.join()
+
+    def close(self):
+        """Write out the queue and stop the writer thread."""
+        with self._writer_lock:
+            writer, self._writer = self._writer, None
+        if writer is not None:
+            self._writes.put(None)
+            writer.join()
+
+    def _record_call(self, params: dict, started: float, **fields):
+        at, latency = round(time.time(), 3), round(time.monotonic() - started, 4)
+
+        def build() -> dict:
+            request = self.normalize(params, store=True)
+            key, content_key = self.keys(request)
+            return {"key": key, "content_key": content_key, "at": at, "request": request, **fields, "latency": latency}
+
+        self._write_later("calls.jsonl", build)
+        self.counts["recorded"] += 1
+
+    def _record_error(self, params: dict, started: float, e: Exception):
+        if isinstance(e, anthropic.APIStatusError):
+            error = {"status": e.status_code, "body": e.body}
+        elif isinstance(e, anthropic.APITimeoutError):
+            error = {"type": "timeout"}
+        elif isinstance(e, anthropic.APIConnectionError):
+            error = {"type": "connection"}
+        else:
+            return
+        self._record_call(params, started, stream=False, error=error)
+
+    async def call(self, params: dict, send: Callable[[], Awaitable[Message]]) -> Message:
+        """One Messages API call: `send()` itself, recorded, or replayed instead."""
+        if self.mode == "replay":
+            return await self._replay(params)
+        if self.mode != "record":
+            return await send()
+
+        started = time.monotonic()
+        try:
+            message = await send()
+        except Exception as e:
+            self._record_error(params, started, e)
+            raise
+        self._record_call(params, started, stream=False, response=message.model_dump(mode="json"))
+        return message
+
+    async def stream(self, params: dict, open_stream: Callable[[], Awaitable]):
+        """Streaming counterpart of `call`; the stream is recorded once its final message is read."""
+        if self.mode == "replay":
+            record, started = self._lookup(params), time.monotonic()
+            await asyncio.sleep(record.get("opened", record["latency"]))
+            if record.get("error"):
+                raise _replayed_error(record["error"])
+            return _ReplayStream(record, started)
+        if self.mode != "record":
+            return await open_stream()
+
+        started = time.monotonic()
+        try:
+            stream = await open_stream()
+        except Exception as e:
+            self._record_error(params, started, e)
+            raise
+        return _RecordingStream(self, params, stream, started)
+
+    def _index(self) -> dict[str, list[dict]]:
+        if self._recordings is None:
+            self._recordings = {}
+            path = self.directory / "calls.jsonl"
+            loaded = 0
+            if path.exists():
+                with open(path) as f:
+                    for line in f:
+                        record = json.loads(line)
+                        self._recordings.setdefault(record["key"], []).append(record)
+                        self._recordings.setdefault(f"content:{record['content_key']}", []).append(record)
+                        loaded += 1
+            print(f"[Cassette] Loaded {loaded} recorded calls from {path}")
+        return self._recordings
+
+    def _lookup(self, params: dict) -> dict:
+        key, content_key = self.keys(self.normalize(params))
+        recordings = self._index()
+        for candidate in (key, f"content:{content_key}"):
+            if candidate in recordings:
+                served = self._served.get(candidate, 0)
+                self._served[candidate] = served + 1
+                self.counts["replayed"] += 1
+                return recordings[candidate][min(served, len(recordings[candidate]) - 1)]
+        self.counts["misses"] += 1
+        raise CassetteMiss(key)
+
+    async def _replay(self, params: dict) -> Message:
+        record = self._lookup(params)
+        await asyncio.sleep(record["latency"])
+        if record.get("error"):
+            raise _replayed_error(record["error"])
+        return _message(record)
+
+    def record_submission(self, endpoint: str, problem_id: str, image, fast_verdict: Optional[bool]):
+        """Log an incoming submission (endpoint "json", "upload" or "stream") for replaying the traffic."""
+        if self.mode != "record":
+            return
+        at = round(time.time(), 3)
+        self._write_later("traffic.jsonl", lambda: {
+            "at": at,
+            "endpoint": endpoint,
+            "problem_id": problem_id,
+            "media_type": image.media_type,
+            "image": self.store_blob(image.data),
+            "fast_verdict": fast_verdict,
+        })
+        self.counts["submissions"] += 1
+
+    def stats(self) -> dict:
+        return {"mode": self.mode, **self.counts, "pending_writes": self._writes.qsize()}
+
+
+class _RecordingStream:
+    """Passes a message stream through, noting when each text chunk arrived."""
+
+    def __init__(self, cassette: Cassette, params: dict, stream, started: float):
+        self._cassette = cassette
+        self._params = params
+        self._stream = stream
+        self._started = started
+        self._opened = time.monotonic() - started
+        self._chunks: list[list] = []
+
+    @property
+    def text_stream(self):
+        return self._text_stream()
+
+    async def _text_stream(self):
+        async for text in self._stream.text_stream:
+            self._chunks.append([round(time.monotonic() - self._started, 4), text])
+            yield text
+
+    async def get_final_message(self) -> Message:
+        message = await self._stream.get_final_message()
+        response = message.model_dump(mode="json")
+        # The text is in the chunks already
+        response["content"] = []
+        self._cassette._record_call(
+            self._params, self._started,
+            stream=True, opened=round(self._opened, 4), chunks=self._chunks, response=response,
+        )
+        return message
+
+    def __getattr__(self, name):
+        return getattr(self._stream, name)
+
+
+class _ReplayStream:
+    """A recorded call played back as a message stream with its original chunk timing."""
+
+    def __init__(self, record: dict, started: float):
+        self._record = record
+        self._started = started
+
+    async def _until(self, offset: float):
+        await asyncio.sleep(max(0.0, self._started + offset - time.monotonic()))
+
+    @property
+    def text_stream(self):
+        return self._text_stream()
+
+    async def _text_stream(self):
+        # A call recorded without streaming arrives as one chunk
+        chunks = self._record.get("chunks") or [[self._record["latency"], _text(self._record["response"])]]
+        for offset, text in chunks:
+            await self._until(offset)
+            yield text
+
+    async def get_final_message(self) -> Message:
+        await self._until(self._record["latency"])
+        return _message(self._record)
+
+
+def _text(response: dict) -> str:
+    return "".join(block.get("text", "") for block in response.get("content", []))
+
+
+def _message(record: dict) -> Message:
+    response = dict(record["response"])
+    if record.get("chunks"):
+        response["content"] = [{"type": "text", "text": "".join(text for _, text in record["chunks"])}]
+    return Message.model_validate(response)
+
+
+def _replayed_error(error: dict) -> Exception:
+    if "status" not in error:
+        if error.get("type") == "timeout":
+            return anthropic.APITimeoutError(request=_REQUEST)
+        return anthropic.APIConnectionError(request=_REQUEST)
+
+    status = error["status"]
+    response = httpx.Response(status, request=_REQUEST)
+    body = error.get("body")
+    message = (body or {}).get("error", {}).get("message", f"Error code: {status}") if isinstance(body, dict) \
+        else f"Error code: {status}"
+    cls = STATUS_ERRORS.get(status, anthropic.InternalServerError if status >= 500 else anthropic.APIStatusError)
+    return cls(message, response=response, body=body)
+
+
+# Singleton instance
+cassette = Cassette()
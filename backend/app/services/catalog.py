@@ -0,0 +1,203 @@
+import os
+import time
+import sqlite3
+import hashlib
+import threading
+from dataclasses import dataclass
+from types import MappingProxyType
+from typing import Mapping, Optional
+
+from starlette.responses import Response
+
+from ..database import get_db
+from ..models import Problem, Topic, TopicListResponse, TopicProblemsResponse, TopicWithCount
+
+
+@dataclass(frozen=True)
+class CatalogBody:
+    """A pre-serialized JSON response body, its strong ETag and the catalog version it came from."""
+    content: bytes
+    etag: str
+    version: int
+
+    @classmethod
+    def of(cls, model, version: int) -> "CatalogBody":
+        content = model.model_dump_json().encode()
+        return cls(content, f'"{hashlib.sha256(content).hexdigest()[:32]}"', version)
+
+
+@dataclass(frozen=True)
+class CatalogSnapshot:
+    """
+    The topics and problems as of one load, never modified afterwards.
+    Problems are read-only mappings (id, topic_id, question,
+    correct_answer), looked up like the rows they came from.
+    """
+    version: int
+    seeded_at: float
+    problems: Mapping[str, Mapping]
+    topics_body: CatalogBody
+    topic_problems_bodies: Mapping[str, CatalogBody]
+    problem_bodies: Mapping[str, CatalogBody]
+
+
+class Catalog:
+    """
+    In-memory index of the topics and problems, which only change when
+    seed_db runs.
+
+    `load()` reads both tables once and builds a new snapshot: O(1) lookups
+    by problem id plus the ready-to-send bodies of the topic list, each
+    topic's problem list and each problem. Readers take the current
+    snapshot and use it throughout, so a reload swaps everything at once and
+    never shows a half-built catalog.
+
+    The snapshot's version is the catalog_version row that every seed_db
+    bumps, whichever process ran it (the admin endpoint, startup, reset_db,
+    the bulk-grade CLI). At most every CATALOG_CHECK_INTERVAL seconds, the
+    next reader compares that one-row lookup with its snapshot and reloads
+    when they differ, so every worker process picks up a reseed.
+    """
+
+    def __init__(self):
+        self.check_interval = float(os.getenv("CATALOG_CHECK_INTERVAL", "1"))
+        self._snapshot: Optional[CatalogSnapshot] = None
+        self._checked_at = 0.0
+        self._lock = threading.Lock()
+        self.reloads = 0
+
+    @property
+    def snapshot(self) -> CatalogSnapshot:
+        snapshot = self._snapshot
+        if snapshot is None or time.monotonic() - self._checked_at >= self.check_interval:
+            return self.refresh()
+        return snapshot
+
+    @property
+    def version(self) -> int:
+        return self.snapshot.version
+
+    def refresh(self) -> CatalogSnapshot:
+        """Reload the catalog if the stored version has moved since the snapshot was built."""
+        with self._lock:
+            snapshot = self._snapshot
+            if snapshot is not None and time.monotonic() - self._checked_at < self.check_interval:
+                # Another thread checked while this one waited
+                return snapshot
+            try:
+                with get_db() as conn:
+                    stored = _stored_version(conn)
+            except sqlite3.Error as e:
+                if snapshot is None:
+                    raise
+                print(f"[Catalog] Version check failed, serving version {snapshot.version}: {e}")
+                return snapshot
+            self._checked_at = time.monotonic()
+            if snapshot is not None and stored == (snapshot.version, snapshot.seeded_at):
+                return snapshot
+            return self._load()
+
+    def load(self) -> CatalogSnapshot:
+        """(Re)build the catalog from the database."""
+        with self._lock:
+            return self._load()
+
+    def _load(self) -> CatalogSnapshot:
+        with get_db() as conn:
+            # Read before the tables: a reseed in between leaves an older
+            # version with newer rows, and the next check loads again
+            version, seeded_at = _stored_version(conn)
+            topic_rows = conn.execute(
+                "SELECT id, name, description, grade_level FROM topics ORDER BY grade_level, name"
+            ).fetchall()
+            problem_rows = conn.execute(
+                "SELECT id, topic_id, question, correct_answer FROM problems ORDER BY rowid"
+            ).fetchall()
+
+        problems_by_topic: dict[str, list[Problem]] = {row["id"]: [] for row in topic_rows}
+        problems, problem_bodies = {}, {}
+        for row in problem_rows:
+            problems[row["id"]] = MappingProxyType(dict(row))
+            problem = Problem(id=row["id"], topic_id=row["topic_id"], question=row["question"])
+            problem_bodies[row["id"]] = CatalogBody.of(problem, version)
+            if row["topic_id"] in problems_by_topic:
+                problems_by_topic[row["topic_id"]].append(problem)
+
+        topics = [Topic(**dict(row)) for row in topic_rows]
+        topics_body = CatalogBody.of(TopicListResponse(topics=[
+            TopicWithCount(**topic.model_dump(), problem_count=len(problems_by_topic[topic.id]))
+            for topic in topics
+        ]), version)
+        topic_problems_bodies = {
+            topic.id: CatalogBody.of(TopicProblemsResponse(topic=topic, problems=problems_by_topic[topic.id]), version)
+            for topic in topics
+        }
+
+        self._snapshot = CatalogSnapshot(
+            version=version,
+            seeded_at=seeded_at,
+            problems=MappingProxyType(problems),
+            topics_body=topics_body,
+            topic_problems_bodies=MappingProxyType(topic_problems_bodies),
+            problem_bodies=MappingProxyType(problem_bodies),
+        )
+        self._checked_at = time.monotonic()
+        self.reloads += 1
+        print(f"[Catalog] Loaded {len(topics)} topics and {len(problems)} problems (version {version})")
+        return self._snapshot
+
+    def problem(self, problem_id: str) -> Optional[Mapping]:
+        """The problem with its answer, or None."""
+        return self.snapshot.problems.get(problem_id)
+
+    def problems(self, problem_ids) -> dict[str, Mapping]:
+        """{id: problem} for the ids that exist."""
+        problems = self.snapshot.problems
+        return {problem_id: problems[problem_id] for problem_id in problem_ids if problem_id in problems}
+
+    def response(self, body: CatalogBody, if_none_match: Optional[str]) -> Response:
+        """
+        `body` as a JSON response, or 304 Not Modified when the client's
+        If-None-Match already names its ETag. Clients revalidate every time
+        (no-cache), so a reseed shows up on the next request.
+        """
+        headers = {
+            "ETag": body.etag,
+            "Cache-Control": "no-cache",
+            "X-Catalog-Version": str(body.version),
+        }
+        if if_none_match and _matches(if_none_match, body.etag):
+            return Response(status_code=304, headers=headers)
+        return Response(content=body.content, media_type="application/json", headers=headers)
+
+    def stats(self) -> dict:
+        snapshot = self._snapshot
+        if snapshot is None:
+            return {"loaded": False}
+        return {
+            "loaded": True,
+            "version": snapshot.version,
+            "reloads": self.reloads,
+            "topics": len(snapshot.topic_problems_bodies),
+            "problems": len(snapshot.problems),
+        }
+
+
+def _stored_version(conn) -> tuple[int, float]:
+    """(version, seeded_at) from the catalog_version row; (0, 0.0) before the first seed."""
+    row = conn.execute("SELECT version, seeded_at FROM catalog_version WHERE id = 1").fetchone()
+    return (row["version"], row["seeded_at"]) if row else (0, 0.0)
+
+
+def _matches(if_none_match: str, etag: str) -> bool:
+    """If-None-Match uses the weak comparison: W/ prefixes are ignored."""
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+
+# Singleton instance
+catalog = Catalog()
@@ -1,10 +1,17 @@
 import os
-import json
 import anthropic
+from contextlib import AsyncExitStack
 from dataclasses import dataclass
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from ..models import Feedback, StepAnalysis
+from .llm_client import create_message, open_message_stream, parse_json_object, mark_cache_prefix, text_block, usage_tracker
+from .rate_limiter import RateLimitRejected
+from .resilience import Deadline, UpstreamUnavailable
+from .metrics import metrics
+from .answer_checker import AnswerCheck
+from .step_verifier import step_verifier
+from .json_stream import JSONArrayStream
 
 
 @dataclass
@@ -19,13 +26,11 @@ class EvaluationResult:
 class EvaluatorService:
     """Service for evaluating student math solutions using Claude."""
 
+    # Static instructions, sent as a cached system prompt
     EVALUATION_PROMPT = """You are a supportive math tutor evaluating a student's handwritten work.
 
-PROBLEM: {question}
-CORRECT ANSWER: {correct_answer}
-
-STUDENT'S WORK (extracted from their handwriting):
-{extracted_text}
+The user message gives the PROBLEM, its CORRECT ANSWER and the STUDENT'S WORK
+(extracted from their handwriting).
 
 Analyze the student's solution and provide helpful feedback. Focus on:
 1. Whether their final answer is correct
@@ -41,19 +46,60 @@ Important guidelines:
 - If you can't determine what the student did, say so and provide general guidance
 
 Respond ONLY with valid JSON in this exact format (no other text):
-{{
+{
   "is_correct": true or false,
   "summary": "Brief 1-2 sentence summary of their work",
   "steps_analysis": [
-    {{
+    {
       "step": "Description of what the student did",
       "evaluation": "correct" or "incorrect" or "unclear",
       "comment": "Specific feedback on this step"
-    }}
+    }
+  ],
+  "suggestions": ["Improvement suggestions if any, empty array if none"],
+  "encouragement": "Brief positive closing note"
+}"""
+
+    FOCUSED_EVALUATION_PROMPT = """You are a supportive math tutor evaluating a student's handwritten work.
+
+The user message gives the PROBLEM, its CORRECT ANSWER and the STUDENT'S WORK
+(extracted from their handwriting), one numbered line per step. Each line has
+already been checked by an exact-arithmetic verifier and labeled CORRECT,
+INCORRECT or UNCLEAR.
+
+Lines marked CORRECT are verified and need no comment from you. Only analyze
+the lines marked INCORRECT or UNCLEAR: say specifically what went wrong (or
+what the student seems to have done), and frame errors as learning
+opportunities. Be encouraging but honest.
+
+Respond ONLY with valid JSON in this exact format (no other text):
+{
+  "is_correct": true or false,
+  "summary": "Brief 1-2 sentence summary of their work",
+  "flagged_steps": [
+    {
+      "line": line number from the student's work,
+      "evaluation": "correct" or "incorrect" or "unclear",
+      "comment": "Specific feedback on this step"
+    }
   ],
   "suggestions": ["Improvement suggestions if any, empty array if none"],
   "encouragement": "Brief positive closing note"
-}}"""
+}"""
+
+    # Per-problem context, cached as the first user block
+    PROBLEM_CONTEXT = """PROBLEM: {question}
+CORRECT ANSWER: {correct_answer}"""
+
+    STUDENT_WORK = """STUDENT'S WORK (extracted from their handwriting):
+{extracted_text}"""
+
+    LABELED_STUDENT_WORK = """STUDENT'S WORK (extracted from their handwriting), checked line by line:
+{labeled_steps}"""
+
+    VERDICT_NOTE = """
+
+VERIFIED ANSWER CHECK: An exact-arithmetic check found that the student's final answer ({student_answer}) is {verdict}. Take this into account for "is_correct" unless the transcription above looks misread."""
 
     def __init__(self):
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
@@ -66,7 +112,9 @@ Respond ONLY with valid JSON in this exact format (no other text):
         self,
         question: str,
         correct_answer: str,
-        extracted_text: str
+        extracted_text: str,
+        answer_check: Optional[AnswerCheck] = None,
+        deadline: Optional[Deadline] = None
     ) -> EvaluationResult:
         """
         Evaluate a student's solution using Claude.
@@ -75,10 +123,101 @@ Respond ONLY with valid JSON in this exact format (no other text):
             question: The math problem
             correct_answer: The expected answer
             extracted_text: OCR-extracted student work
+            answer_check: Local exact-arithmetic verdict; when decided it is
+                passed to the model as a hint
+            deadline: Time budget of the whole submission
 
         Returns:
             EvaluationResult with feedback
         """
+        error = self.precheck(extracted_text)
+        if error:
+            return error
+
+        params, verified_steps, focused = self.build_request(
+            question, correct_answer, extracted_text, answer_check
+        )
+
+        try:
+            message = await create_message(params, deadline)
+            usage_tracker.record("evaluation", message.usage)
+
+            response_text = message.content[0].text.strip()
+            return self.parse_response(response_text, verified_steps, focused)
+
+        except RateLimitRejected:
+            raise
+        except Exception as e:
+            return self._error_result(e)
+
+    async def evaluate_stream(
+        self,
+        question: str,
+        correct_answer: str,
+        extracted_text: str,
+        answer_check: Optional[AnswerCheck] = None,
+        deadline: Optional[Deadline] = None
+    ) -> AsyncIterator[tuple]:
+        """
+        Streaming variant of `evaluate`.
+
+        Yields ("step", index, StepAnalysis) as soon as each step can be parsed
+        from the model's partial output, then a final ("result", EvaluationResult)
+        identical to what `evaluate` would return. In focused mode the locally
+        verified steps are yielded up front and flagged lines are yielded again
+        (same index) once the model has commented on them.
+        """
+        error = self.precheck(extracted_text)
+        if error:
+            yield ("result", error)
+            return
+
+        params, verified_steps, focused = self.build_request(
+            question, correct_answer, extracted_text, answer_check
+        )
+
+        if focused:
+            for index, step in enumerate(verified_steps):
+                yield ("step", index, step)
+
+        parser = JSONArrayStream("flagged_steps" if focused else "steps_analysis")
+        streamed = 0
+        chunks = []
+
+        try:
+            async with AsyncExitStack() as stack:
+                stream, call = await open_message_stream(stack, params, deadline)
+                async for text in stream.text_stream:
+                    if deadline:
+                        deadline.check()
+                    chunks.append(text)
+                    for item in parser.feed(text):
+                        if not isinstance(item, dict):
+                            continue
+                        if focused:
+                            merged = self._merge_flagged_steps(verified_steps, [item])
+                            for index, (old, new) in enumerate(zip(verified_steps, merged)):
+                                if new is not old:
+                                    yield ("step", index, new)
+                        else:
+                            yield ("step", streamed, self._to_step(item))
+                            streamed += 1
+
+                final = await stream.get_final_message()
+                call.settle(final.usage)
+                usage_tracker.record("evaluation", final.usage)
+
+            result = self.parse_response("".join(chunks).strip(), verified_steps, focused)
+
+        except RateLimitRejected:
+            raise
+        except Exception as e:
+            result = self._error_result(e)
+
+        yield ("result", result)
+
+    def precheck(self, extracted_text: str) -> Optional[EvaluationResult]:
+        """Failure result when there is nothing to send to the model."""
         if not self.is_configured():
             return EvaluationResult(
                 success=False,
@@ -91,81 +230,144 @@ Respond ONLY with valid JSON in this exact format (no other text):
                 error="No student work to evaluate"
             )
 
-        prompt = self.EVALUATION_PROMPT.format(
-            question=question,
-            correct_answer=correct_answer,
-            extracted_text=extracted_text
-        )
-
-        try:
-            client = anthropic.Anthropic(api_key=self.api_key)
+        return None
 
-            message = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=1024,
-                messages=[{"role": "user", "content": prompt}]
-            )
+    def build_request(
+        self,
+        question: str,
+        correct_answer: str,
+        extracted_text: str,
+        answer_check: Optional[AnswerCheck]
+    ) -> tuple[dict, list[StepAnalysis], bool]:
+        """
+        Build the Messages API parameters for an evaluation (also used for
+        batches). Returns (params, verified_steps, focused).
 
-            response_text = message.content[0].text.strip()
+        The static instructions (system) and the problem context (first user
+        block) come first as one cacheable prefix, so repeat requests can
+        reuse them; only the student's work varies per call.
+        """
+        # Locally verified steps let the model comment only on flagged lines
+        verified_steps = step_verifier.verify(question, extracted_text)
+        focused = step_verifier.is_informative(verified_steps)
 
-            # Parse JSON response
-            try:
-                data = json.loads(response_text)
-            except json.JSONDecodeError:
-                # Try to extract JSON from response if wrapped in other text
-                import re
-                json_match = re.search(r'\{[\s\S]*\}', response_text)
-                if json_match:
-                    data = json.loads(json_match.group())
-                else:
-                    return EvaluationResult(
-                        success=False,
-                        error="Failed to parse evaluation response"
-                    )
-
-            # Build feedback object
-            steps_analysis = [
-                StepAnalysis(
-                    step=step.get("step", ""),
-                    evaluation=step.get("evaluation", "unclear"),
-                    comment=step.get("comment", "")
+        if focused:
+            instructions = self.FOCUSED_EVALUATION_PROMPT
+            work = self.LABELED_STUDENT_WORK.format(
+                labeled_steps="\n".join(
+                    f"{i}. [{step.evaluation.upper()}] {step.step}"
+                    for i, step in enumerate(verified_steps, start=1)
                 )
-                for step in data.get("steps_analysis", [])
-            ]
-
-            feedback = Feedback(
-                summary=data.get("summary", ""),
-                steps_analysis=steps_analysis,
-                suggestions=data.get("suggestions", []),
-                encouragement=data.get("encouragement")
             )
-
-            return EvaluationResult(
-                success=True,
-                is_correct=data.get("is_correct", False),
-                feedback=feedback
+        else:
+            instructions = self.EVALUATION_PROMPT
+            work = self.STUDENT_WORK.format(extracted_text=extracted_text)
+        if answer_check and answer_check.decided:
+            work += self.VERDICT_NOTE.format(
+                student_answer=answer_check.student_answer,
+                verdict="CORRECT" if answer_check.is_correct else "INCORRECT"
             )
 
-        except anthropic.AuthenticationError:
-            return EvaluationResult(
-                success=False,
-                error="Invalid Anthropic API key"
-            )
-        except anthropic.RateLimitError:
-            return EvaluationResult(
-                success=False,
-                error="Rate limit exceeded. Please try again later."
-            )
-        except anthropic.APIError as e:
+        system = [text_block(instructions)]
+        context = text_block(self.PROBLEM_CONTEXT.format(question=question, correct_answer=correct_answer))
+        mark_cache_prefix(system + [context])
+        content = [context, text_block(work)]
+        return {
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 1024,
+            "system": system,
+            "messages": [{"role": "user", "content": content}],
+        }, verified_steps, focused
+
+    def parse_response(
+        self,
+        response_text: str,
+        verified_steps: list[StepAnalysis],
+        focused: bool
+    ) -> EvaluationResult:
+        """Parse the model's JSON response into an EvaluationResult."""
+        data = parse_json_object(response_text)
+        if data is None:
+            metrics.record_error("evaluation", kind="UnparseableResponse")
             return EvaluationResult(
                 success=False,
-                error=f"API error: {str(e)}"
+                error="Failed to parse evaluation response"
             )
-        except Exception as e:
-            return EvaluationResult(
-                success=False,
-                error=f"Unexpected error: {str(e)}"
+        return self.result_from_data(data, verified_steps, focused)
+
+    def result_from_data(
+        self,
+        data: dict,
+        verified_steps: Optional[list[StepAnalysis]] = None,
+        focused: bool = False
+    ) -> EvaluationResult:
+        """Build an EvaluationResult from the feedback fields of a parsed response."""
+        if focused:
+            steps_analysis = self._merge_flagged_steps(
+                verified_steps, data.get("flagged_steps", [])
             )
+        else:
+            steps_analysis = [
+                self._to_step(step) for step in data.get("steps_analysis", [])
+            ]
+
+        feedback = Feedback(
+            summary=data.get("summary", ""),
+            steps_analysis=steps_analysis,
+            suggestions=data.get("suggestions", []),
+            encouragement=data.get("encouragement")
+        )
+
+        # The local answer check only decides on its own in fast-verdict mode,
+        # which never gets here; otherwise the model has the last word
+        return EvaluationResult(
+            success=True,
+            is_correct=data.get("is_correct", False),
+            feedback=feedback
+        )
+
+    @staticmethod
+    def _error_result(e: Exception) -> EvaluationResult:
+        metrics.record_error("evaluation", e)
+        if isinstance(e, anthropic.AuthenticationError):
+            error = "Invalid Anthropic API key"
+        elif isinstance(e, anthropic.RateLimitError):
+            error = "Rate limit exceeded. Please try again later."
+        elif isinstance(e, UpstreamUnavailable):
+            error = str(e)
+        elif isinstance(e, anthropic.APIError):
+            error = f"API error: {str(e)}"
+        else:
+            error = f"Unexpected error: {str(e)}"
+        return EvaluationResult(success=False, error=error)
+
+    @staticmethod
+    def _to_step(step: dict) -> StepAnalysis:
+        return StepAnalysis(
+            step=step.get("step", ""),
+            evaluation=step.get("evaluation", "unclear"),
+            comment=step.get("comment", "")
+        )
+
+    @staticmethod
+    def _merge_flagged_steps(
+        verified_steps: list[StepAnalysis],
+        flagged: list[dict]
+    ) -> list[StepAnalysis]:
+        """Overlay the model's comments for flagged lines onto the verified steps."""
+        steps = list(verified_steps)
+        for item in flagged:
+            try:
+                index = int(item.get("line")) - 1
+            except (TypeError, ValueError):
+                continue
+            if 0 <= index < len(steps):
+                steps[index] = StepAnalysis(
+                    step=steps[index].step,
+                    evaluation=item.get("evaluation", steps[index].evaluation),
+                    comment=item.get("comment", steps[index].comment)
+                )
+        return steps
 
 
 # Singleton instance
@@ -0,0 +1,208 @@
+import re
+from dataclasses import dataclass
+from fractions import Fraction
+from typing import Optional
+
+from .math_text import normalize_line
+
+
+class MathParseError(ValueError):
+    """Raised when a line can't be read as linear arithmetic in one variable."""
+
+
+@dataclass(frozen=True)
+class Linear:
+    """An exact linear expression `coef * var + const` over the rationals."""
+    coef: Fraction = Fraction(0)
+    const: Fraction = Fraction(0)
+    var: Optional[str] = None
+
+    @property
+    def is_constant(self) -> bool:
+        return self.coef == 0
+
+    @property
+    def is_bare_variable(self) -> bool:
+        return self.coef == 1 and self.const == 0 and self.var is not None
+
+    def _var_with(self, other: "Linear") -> Optional[str]:
+        if self.var and other.var and self.var != other.var:
+            raise MathParseError(f"More than one variable: {self.var}, {other.var}")
+        return self.var or other.var
+
+    def __add__(self, other: "Linear") -> "Linear":
+        return Linear(self.coef + other.coef, self.const + other.const, self._var_with(other))
+
+    def __neg__(self) -> "Linear":
+        return Linear(-self.coef, -self.const, self.var)
+
+    def __sub__(self, other: "Linear") -> "Linear":
+        return self + (-other)
+
+    def __mul__(self, other: "Linear") -> "Linear":
+        if not self.is_constant and not other.is_constant:
+            raise MathParseError("Expression is not linear")
+        var = self._var_with(other)
+        return Linear(
+            self.coef * other.const + other.coef * self.const,
+            self.const * other.const,
+            var,
+        )
+
+    def __truediv__(self, other: "Linear") -> "Linear":
+        if not other.is_constant:
+            raise MathParseError("Division by an expression containing a variable")
+        if other.const == 0:
+            raise MathParseError("Division by zero")
+        return Linear(self.coef / other.const, self.const / other.const, self.var)
+
+    def value_at(self, x: Fraction) -> Fraction:
+        return self.coef * x + self.const
+
+
+# A mixed number ("1 5/12") is one token; normalize_line keeps the space that
+# separates its digit runs, so any other such space is rejected below
+_MIXED_RE = re.compile(r"(\d+) (\d+)/(\d+)(?![\d./ ])")
+_TOKEN_RE = re.compile(r"\d+(?:\.\d+)?|\.\d+|[a-z]+|[-+*/()%]")
+
+# Words that read as multiplication ("25% of 80")
+_TIMES_WORDS = {"of"}
+
+
+def _tokenize(text: str) -> list[str]:
+    text = text.replace("$", "").replace(",", "")
+    tokens = []
+    pos = 0
+    while pos < len(text):
+        mixed = _MIXED_RE.match(text, pos)
+        if mixed:
+            whole, numerator, denominator = (int(group) for group in mixed.groups())
+            if denominator == 0:
+                raise MathParseError("Division by zero")
+            tokens.append(str(whole + Fraction(numerator, denominator)))
+            pos = mixed.end()
+            continue
+        match = _TOKEN_RE.match(text, pos)
+        if not match:
+            raise MathParseError(f"Unexpected character {text[pos]!r}")
+        token = match.group()
+        if token.isalpha() and token not in _TIMES_WORDS and len(token) > 1:
+            raise MathParseError(f"Unexpected word {token!r}")
+        tokens.append("*" if token in _TIMES_WORDS else token)
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    Recursive-descent parser for linear arithmetic with implicit multiplication.
+
+        expr    := term (('+' | '-') term)*
+        term    := unary (('*' | '/' | <implicit>) unary)*
+        unary   := ('+' | '-') unary | postfix
+        postfix := primary '%'*
+        primary := NUMBER | VARIABLE | '(' expr ')'
+    """
+
+    def __init__(self, tokens: list[str]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self) -> str:
+        token = self.peek()
+        if token is None:
+            raise MathParseError("Unexpected end of expression")
+        self.pos += 1
+        return token
+
+    def parse(self) -> Linear:
+        if not self.tokens:
+            raise MathParseError("Empty expression")
+        result = self.expr()
+        if self.peek() is not None:
+            raise MathParseError(f"Unexpected token {self.peek()!r}")
+        return result
+
+    def expr(self) -> Linear:
+        result = self.term()
+        while self.peek() in ("+", "-"):
+            op = self.take()
+            rhs = self.term()
+            result = result + rhs if op == "+" else result - rhs
+        return result
+
+    def term(self) -> Linear:
+        result = self.unary()
+        while True:
+            token = self.peek()
+            if token in ("*", "/"):
+                self.take()
+                rhs = self.unary()
+                result = result * rhs if token == "*" else result / rhs
+            elif token is not None and (token == "(" or token[0].isalnum() or token[0] == "."):
+                # Implicit multiplication: 2x, 3(x - 2), (x + 1)(2)
+                result = result * self.postfix()
+            else:
+                return result
+
+    def unary(self) -> Linear:
+        if self.peek() == "-":
+            self.take()
+            return -self.unary()
+        if self.peek() == "+":
+            self.take()
+            return self.unary()
+        return self.postfix()
+
+    def postfix(self) -> Linear:
+        result = self.primary()
+        while self.peek() == "%":
+            self.take()
+            result = result / Linear(const=Fraction(100))
+        return result
+
+    def primary(self) -> Linear:
+        token = self.take()
+        if token == "(":
+            result = self.expr()
+            if self.take() != ")":
+                raise MathParseError("Unbalanced parentheses")
+            return result
+        if token[0].isdigit() or token[0] == ".":
+            # Fraction() also reads the "17/12" tokens of mixed numbers
+            return Linear(const=Fraction(token))
+        if token.isalpha():
+            return Linear(coef=Fraction(1), var=token)
+        raise MathParseError(f"Unexpected token {token!r}")
+
+
+def parse_expression(text: str) -> Linear:
+    """Parse one side of a line (already normalized or raw) into a Linear."""
+    return _Parser(_tokenize(normalize_line(text))).parse()
+
+
+def parse_line(text: str) -> list[Linear]:
+    """Parse a line into its '='-separated sides ("a = b = c" gives three)."""
+    line = normalize_line(text)
+    # Labels ("Answer: x = 4", "Step 2: 2x = 8") carry no math
+    line = line.rsplit(":", 1)[-1]
+    # A leading "=" continues the previous line ("= 3/4")
+    line = line.lstrip("=")
+    return [_Parser(_tokenize(side)).parse() for side in line.split("=")]
+
+
+def solve_linear(lhs: Linear, rhs: Linear) -> Optional[Fraction]:
+    """Solve lhs = rhs for its variable; None when there isn't exactly one solution."""
+    diff = lhs - rhs
+    if diff.coef == 0:
+        return None
+    return -diff.const / diff.coef
+
+
+def format_fraction(value: Fraction) -> str:
+    if value.denominator == 1:
+        return str(value.numerator)
+    return f"{value.numerator}/{value.denominator}"
@@ -0,0 +1,160 @@
+import os
+from dataclasses import dataclass
+from typing import Optional
+
+from .llm_client import create_message, parse_json_object, mark_cache_prefix, text_block, usage_tracker
+from .rate_limiter import RateLimitRejected
+from .resilience import Deadline
+from .metrics import metrics
+from .ocr import VisionResult, ImageInput, vision_service
+from .evaluator import EvaluationResult, evaluator_service
+
+
+@dataclass
+class FusedResult:
+    """Quality verdict, transcription and (when readable) evaluation from one call."""
+    vision: VisionResult
+    evaluation: Optional[EvaluationResult] = None
+
+
+class FusedService:
+    """
+    Single Claude Vision call that checks quality, transcribes the work and
+    evaluates it against the problem, instead of a vision call followed by an
+    evaluation call.
+
+    `analyze_and_evaluate` returns None when the response can't be parsed
+    into the combined schema; callers then fall back to the two-call path.
+    """
+
+    # Static instructions, sent as a cached system prompt
+    PROMPT = """You are a supportive math tutor looking at a photo of a student's handwritten work.
+
+The user message gives the PROBLEM and its CORRECT ANSWER, followed by the photo. Do THREE things in order:
+
+**STEP 1 — Quality Check**
+Decide if this image is readable enough to extract math from. Mark it as NOT readable if ANY of these are true:
+- Blurry or out of focus — digits or symbols could be misread
+- Poor lighting — too dark, too bright, heavy shadows, or glare obscuring writing
+- Messy or chaotic layout — writing scribbled over, written in random directions, overlapping, or no clear top-to-bottom flow
+- Partially erased or overwritten — lines or numbers half-deleted, smudged, or layered on top of each other
+- Cropped or cut off — math work is not fully visible
+- No math content — the image has no mathematical writing
+- Low resolution — too small or pixelated to confidently read all characters
+- Distracting background — math blends into a cluttered surface
+
+When in doubt, mark it as NOT readable. It is better to ask the student to retake the photo than to evaluate misread work.
+
+**STEP 2 — Extract Math (only if readable)**
+Transcribe ALL mathematical content exactly as the student wrote it, line by line. Do NOT solve, correct, or reformat it.
+
+**STEP 3 — Evaluate (only if readable)**
+Evaluate the transcribed work, not what you think the student meant. Focus on whether the final answer is correct, the reasoning and steps shown, any errors in the process (even if the final answer happens to be correct) and what they did well. Be encouraging but honest, point to specific steps, and frame errors as learning opportunities.
+
+Respond ONLY with valid JSON (no other text):
+
+If NOT readable:
+{
+  "readable": false,
+  "issues": ["list every specific issue found"],
+  "suggestion": "A short, friendly tip to help retake the photo",
+  "extracted_text": null
+}
+
+If readable:
+{
+  "readable": true,
+  "issues": [],
+  "suggestion": null,
+  "extracted_text": "the student's math work transcribed line by line",
+  "is_correct": true or false,
+  "summary": "Brief 1-2 sentence summary of their work",
+  "steps_analysis": [
+    {
+      "step": "Description of what the student did",
+      "evaluation": "correct" or "incorrect" or "unclear",
+      "comment": "Specific feedback on this step"
+    }
+  ],
+  "suggestions": ["Improvement suggestions if any, empty array if none"],
+  "encouragement": "Brief positive closing note"
+}"""
+
+    def __init__(self):
+        self.max_tokens = int(os.getenv("FUSED_MAX_TOKENS", "2048"))
+
+    async def analyze_and_evaluate(
+        self,
+        image: ImageInput,
+        question: str,
+        correct_answer: str,
+        deadline: Optional[Deadline] = None
+    ) -> Optional[FusedResult]:
+        """
+        Run the combined call. Returns None if the response doesn't match the
+        combined schema (the caller should use the two-call path instead).
+        """
+        rejected, prepared = await vision_service.screen(image)
+        if rejected:
+            return FusedResult(vision=rejected)
+
+        try:
+            # Cacheable prefix: instructions, then the per-problem context; the image varies
+            system = [text_block(self.PROMPT)]
+            context = text_block(evaluator_service.PROBLEM_CONTEXT.format(
+                question=question,
+                correct_answer=correct_answer
+            ))
+            mark_cache_prefix(system + [context])
+            params = {
+                "model": "claude-sonnet-4-20250514",
+                "max_tokens": self.max_tokens,
+                "system": system,
+                "messages": [{
+                    "role": "user",
+                    "content": [
+                        context,
+                        {
+                            "type": "image",
+                            "source": {
+                                "type": "base64",
+                                "media_type": prepared.media_type,
+                                "data": prepared.data,
+                            },
+                        },
+                    ],
+                }],
+            }
+            message = await create_message(params, deadline)
+            usage_tracker.record("fused", message.usage)
+
+            response_text = message.content[0].text.strip()
+
+        except RateLimitRejected:
+            raise
+        except Exception as e:
+            return FusedResult(vision=vision_service.error_result(e, "fused"))
+
+        data = parse_json_object(response_text)
+        if not isinstance(data, dict) or "readable" not in data:
+            print("[Fused] Could not parse response, falling back to two calls")
+            metrics.record_error("fused", kind="UnparseableResponse")
+            return None
+
+        vision_result = vision_service.result_from_data(data)
+        if not vision_result.readable:
+            return FusedResult(vision=vision_result)
+
+        if "summary" not in data or not isinstance(data.get("steps_analysis"), list):
+            print("[Fused] Response is missing the evaluation, falling back to two calls")
+            metrics.record_error("fused", kind="IncompleteResponse")
+            return None
+
+        return FusedResult(
+            vision=vision_result,
+            evaluation=evaluator_service.result_from_data(data)
+        )
+
+
+# Singleton instance
+fused_service = FusedService()
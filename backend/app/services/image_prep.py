@@ -0,0 +1,129 @@
+import io
+import os
+import base64
+from dataclasses import dataclass
+from typing import Optional
+
+from PIL import Image, ImageOps, ImageStat, UnidentifiedImageError
+
+
+def flatten_transparency(image: Image.Image) -> Image.Image:
+    """
+    Composite an image with an alpha channel (RGBA, LA, PA or a palette
+    with a transparent color) onto white. A plain convert() would turn
+    transparent areas black, and a screenshot would read as a black page.
+    """
+    if image.mode in ("RGBA", "LA", "PA") or (image.mode == "P" and "transparency" in image.info):
+        image = image.convert("RGBA")
+        background = Image.new("RGBA", image.size, (255, 255, 255, 255))
+        return Image.alpha_composite(background, image).convert("RGB")
+    return image
+
+
+@dataclass
+class PreparedImage:
+    """An image ready to send to the vision model, with before/after sizes."""
+    media_type: str
+    data: str  # base64, no data URI prefix
+    original_bytes: int
+    prepared_bytes: int
+    width: Optional[int] = None
+    height: Optional[int] = None
+    grayscale: bool = False
+    reencoded: bool = False
+
+
+class ImagePreparer:
+    """
+    Shrinks phone photos before upload: auto-orients from EXIF, converts
+    mostly-colourless photos to grayscale, downscales to a maximum long edge
+    and re-encodes as JPEG or WebP. The original is kept whenever it can't be
+    decoded or re-encoding wouldn't make it smaller.
+    """
+
+    FORMATS = {"jpeg": ("JPEG", "image/jpeg"), "webp": ("WEBP", "image/webp")}
+
+    def __init__(self):
+        self.enabled = os.getenv("IMAGE_PREP_ENABLED", "1") != "0"
+        # 1568px is the largest long edge the vision model uses without resizing
+        self.max_long_edge = int(os.getenv("IMAGE_MAX_LONG_EDGE", "1568"))
+        self.quality = int(os.getenv("IMAGE_QUALITY", "80"))
+        self.format = os.getenv("IMAGE_FORMAT", "jpeg").lower()
+        # "auto" converts photos whose mean saturation is below the threshold
+        self.grayscale = os.getenv("IMAGE_GRAYSCALE", "auto").lower()
+        self.grayscale_max_saturation = float(os.getenv("IMAGE_GRAYSCALE_MAX_SATURATION", "24"))
+        if self.format not in self.FORMATS:
+            self.format = "jpeg"
+
+        self.total_original_bytes = 0
+        self.total_prepared_bytes = 0
+
+    def _should_grayscale(self, image: Image.Image) -> bool:
+        if self.grayscale == "always":
+            return True
+        if self.grayscale != "auto":
+            return False
+        if image.mode in ("L", "LA"):
+            return True
+        sample = image.resize((128, 128), Image.Resampling.NEAREST).convert("RGB")
+        saturation = ImageStat.Stat(sample.convert("HSV").getchannel("S")).mean[0]
+        return saturation <= self.grayscale_max_saturation
+
+    def prepare(self, image_bytes: bytes, media_type: str) -> PreparedImage:
+        """Return the smallest acceptable encoding of the image."""
+        original = PreparedImage(
+            media_type=media_type,
+            data=base64.b64encode(image_bytes).decode(),
+            original_bytes=len(image_bytes),
+            prepared_bytes=len(image_bytes),
+        )
+        if not self.enabled:
+            return self._record(original)
+
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+            # JPEG draft mode decodes at the smallest scale still >= the target size
+            scale = min(1.0, self.max_long_edge / max(image.size))
+            image.draft("RGB", (int(image.width * scale), int(image.height * scale)))
+            image = flatten_transparency(ImageOps.exif_transpose(image))
+        except (UnidentifiedImageError, OSError, ValueError):
+            return self._record(original)
+
+        grayscale = self._should_grayscale(image)
+        image = image.convert("L" if grayscale else "RGB")
+        image.thumbnail((self.max_long_edge, self.max_long_edge), Image.Resampling.BICUBIC, reducing_gap=2.0)
+
+        pil_format, out_media_type = self.FORMATS[self.format]
+        buffer = io.BytesIO()
+        image.save(buffer, pil_format, quality=self.quality, optimize=True)
+        encoded = buffer.getvalue()
+
+        if len(encoded) >= len(image_bytes):
+            return self._record(original)
+
+        return self._record(PreparedImage(
+            media_type=out_media_type,
+            data=base64.b64encode(encoded).decode(),
+            original_bytes=len(image_bytes),
+            prepared_bytes=len(encoded),
+            width=image.width,
+            height=image.height,
+            grayscale=grayscale,
+            reencoded=True,
+        ))
+
+    def _record(self, prepared: PreparedImage) -> PreparedImage:
+        self.total_original_bytes += prepared.original_bytes
+        self.total_prepared_bytes += prepared.prepared_bytes
+        return prepared
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "original_bytes": self.total_original_bytes,
+            "prepared_bytes": self.total_prepared_bytes,
+        }
+
+
+# Singleton instance
+image_preparer = ImagePreparer()
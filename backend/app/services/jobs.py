@@ -0,0 +1,249 @@
+import os
+import json
+import uuid
+import asyncio
+from typing import Awaitable, Callable, Optional
+
+from ..database import run_db
+from .ocr import ImageInput
+
+# handler(problem_id, image, fast_verdict) -> pydantic response model
+JobHandler = Callable[[str, ImageInput, Optional[bool]], Awaitable]
+
+
+class JobQueue:
+    """
+    Background submission jobs persisted in the `submission_jobs` table.
+
+    Jobs are written to SQLite before they are queued in memory, so anything
+    still queued or running when the process stops is picked up again by
+    `start()` on the next boot. A fixed number of worker tasks drain the queue.
+
+    Deferred jobs skip the workers: they wait in the table (status "deferred")
+    until a bulk grading run claims them (status "batching").
+    """
+
+    def __init__(self):
+        self.worker_count = int(os.getenv("JOB_WORKERS", "4"))
+        self._queue: Optional[asyncio.Queue] = None
+        self._workers: list[asyncio.Task] = []
+        self._handler: Optional[JobHandler] = None
+
+    # --- database helpers (run on the DB thread pool) ---
+
+    @staticmethod
+    def _insert(conn, job_id: str, problem_id: str, image: ImageInput, fast_verdict: Optional[bool], status: str):
+        conn.execute("""
+            INSERT INTO submission_jobs (id, problem_id, image_media_type, image_data, fast_verdict, status)
+            VALUES (?, ?, ?, ?, ?, ?)
+        """, (job_id, problem_id, image.media_type, image.data, fast_verdict, status))
+
+    @staticmethod
+    def _claim(conn, job_id: str):
+        conn.execute("""
+            UPDATE submission_jobs SET status = 'running', updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, (job_id,))
+        cursor = conn.execute(
+            "SELECT problem_id, image_media_type, image_data, fast_verdict FROM submission_jobs WHERE id = ?",
+            (job_id,)
+        )
+        return cursor.fetchone()
+
+    @staticmethod
+    def _finish(conn, job_id: str, status: str, result: Optional[str], error: Optional[str]):
+        JobQueue.finish_many(conn, [(job_id, status, result, error)])
+
+    @staticmethod
+    def finish_many(conn, finished: list[tuple[str, str, Optional[str], Optional[str]]]):
+        """Mark (job_id, status, result, error) rows finished inside the caller's transaction."""
+        # The image is only needed to (re)run the job; drop it once it's done
+        conn.executemany("""
+            UPDATE submission_jobs
+            SET status = ?, result = ?, error = ?, image_data = NULL, updated_at = CURRENT_TIMESTAMP
+            WHERE id = ?
+        """, [(status, result, error, job_id) for job_id, status, result, error in finished])
+
+    @staticmethod
+    def _claim_deferred(conn, limit: Optional[int]):
+        cursor = conn.execute("""
+            SELECT id FROM submission_jobs
+            WHERE status = 'deferred'
+            ORDER BY created_at, rowid
+            LIMIT ?
+        """, (limit if limit is not None else -1,))
+        job_ids = [row["id"] for row in cursor.fetchall()]
+
+        # Only keep jobs this transaction moved, in case another run claims concurrently
+        claimed = [
+            job_id for job_id in job_ids
+            if conn.execute("""
+                UPDATE submission_jobs SET status = 'batching', updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'deferred'
+            """, (job_id,)).rowcount
+        ]
+        if not claimed:
+            return []
+
+        placeholders = ",".join("?" for _ in claimed)
+        cursor = conn.execute(f"""
+            SELECT id, problem_id, image_media_type, image_data, fast_verdict
+            FROM submission_jobs WHERE id IN ({placeholders})
+            ORDER BY created_at, rowid
+        """, claimed)
+        return cursor.fetchall()
+
+    @staticmethod
+    def _requeue(conn, job_ids: Optional[list[str]]) -> int:
+        if job_ids is None:
+            cursor = conn.execute("""
+                UPDATE submission_jobs SET status = 'deferred', updated_at = CURRENT_TIMESTAMP
+                WHERE status = 'batching'
+            """)
+        else:
+            cursor = conn.executemany("""
+                UPDATE submission_jobs SET status = 'deferred', updated_at = CURRENT_TIMESTAMP
+                WHERE id = ? AND status = 'batching'
+            """, [(job_id,) for job_id in job_ids])
+        return cursor.rowcount
+
+    @staticmethod
+    def _pending(conn) -> list[str]:
+        cursor = conn.execute("""
+            SELECT id FROM submission_jobs
+            WHERE status IN ('queued', 'running')
+            ORDER BY created_at, rowid
+        """)
+        return [row["id"] for row in cursor.fetchall()]
+
+    @staticmethod
+    def _fetch(conn, job_id: str):
+        cursor = conn.execute("""
+            SELECT id, problem_id, status, result, error, created_at, updated_at
+            FROM submission_jobs WHERE id = ?
+        """, (job_id,))
+        return cursor.fetchone()
+
+    # --- lifecycle ---
+
+    async def start(self, handler: JobHandler):
+        """Start the workers and resume jobs left queued or running by a previous process."""
+        self._handler = handler
+        self._queue = asyncio.Queue()
+
+        pending = await run_db(self._pending)
+        for job_id in pending:
+            self._queue.put_nowait(job_id)
+        if pending:
+            print(f"[Jobs] Resuming {len(pending)} unfinished job(s)")
+
+        self._workers = [
+            asyncio.create_task(self._worker(), name=f"submission-job-worker-{i}")
+            for i in range(self.worker_count)
+        ]
+
+    async def stop(self):
+        """Cancel the workers. Unfinished jobs stay in the table and resume on next start."""
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    async def _worker(self):
+        while True:
+            job_id = await self._queue.get()
+            try:
+                await self._run(job_id)
+            except Exception as e:
+                # A database error claiming or finishing the job must not kill the worker
+                print(f"[Jobs] Job {job_id} errored: {type(e).__name__}: {e}")
+                await self._mark_failed(job_id, e)
+            finally:
+                self._queue.task_done()
+
+    async def _mark_failed(self, job_id: str, error: Exception):
+        """Best effort: leave the job "failed" rather than stuck in "running"."""
+        try:
+            await run_db(self._finish, job_id, "failed", None, str(error))
+        except Exception as e:
+            print(f"[Jobs] Could not mark job {job_id} failed: {type(e).__name__}: {e}")
+
+    async def _run(self, job_id: str):
+        row = await run_db(self._claim, job_id)
+        if row is None or row["image_data"] is None:
+            return
+
+        image = ImageInput(media_type=row["image_media_type"], data=row["image_data"])
+        fast_verdict = None if row["fast_verdict"] is None else bool(row["fast_verdict"])
+
+        try:
+            response = await self._handler(row["problem_id"], image, fast_verdict)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            print(f"[Jobs] Job {job_id} failed: {type(e).__name__}: {e}")
+            await run_db(self._finish, job_id, "failed", None, str(e))
+            return
+
+        await run_db(self._finish, job_id, "done", json.dumps(response.model_dump()), None)
+
+    # --- public API ---
+
+    async def enqueue(
+        self,
+        problem_id: str,
+        image: ImageInput,
+        fast_verdict: Optional[bool] = None,
+        deferred: bool = False
+    ) -> str:
+        """
+        Persist a new job and hand it to the workers, or with `deferred=True`
+        leave it for the next bulk grading run. Returns the job id.
+        """
+        job_id = uuid.uuid4().hex
+        await run_db(self._insert, job_id, problem_id, image, fast_verdict, "deferred" if deferred else "queued")
+        if not deferred:
+            self._queue.put_nowait(job_id)
+        return job_id
+
+    async def claim_deferred(self, limit: Optional[int] = None) -> list[tuple[str, str, ImageInput, Optional[bool]]]:
+        """Move up to `limit` deferred jobs to "batching" and return (job_id, problem_id, image, fast_verdict)."""
+        rows = await run_db(self._claim_deferred, limit)
+        return [
+            (
+                row["id"],
+                row["problem_id"],
+                ImageInput(media_type=row["image_media_type"], data=row["image_data"]),
+                None if row["fast_verdict"] is None else bool(row["fast_verdict"]),
+            )
+            for row in rows
+        ]
+
+    async def requeue_batching(self, job_ids: Optional[list[str]] = None) -> int:
+        """Return claimed jobs (all of them by default) to "deferred" after an interrupted bulk run."""
+        return await run_db(self._requeue, job_ids)
+
+    async def get(self, job_id: str) -> Optional[dict]:
+        """Current state of a job, with the decoded result once it is done."""
+        row = await run_db(self._fetch, job_id)
+        if row is None:
+            return None
+        return {
+            "id": row["id"],
+            "problem_id": row["problem_id"],
+            "status": row["status"],
+            "result": json.loads(row["result"]) if row["result"] else None,
+            "error": row["error"],
+            "created_at": row["created_at"],
+            "updated_at": row["updated_at"],
+        }
+
+    def stats(self) -> dict:
+        return {
+            "workers": len(self._workers),
+            "queued": self._queue.qsize() if self._queue else 0,
+        }
+
+
+# Singleton instance
+job_queue = JobQueue()
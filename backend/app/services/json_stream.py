@@ -0,0 +1,80 @@
+import json
+from typing import Optional
+
+
+class JSONArrayStream:
+    """
+    Incremental parser that pulls complete items out of one array in a JSON
+    object while the object is still being streamed.
+
+    Feed it text chunks as they arrive; every call returns the items of the
+    top-level `key` array that became complete with that chunk. Text before
+    the first "{" (e.g. a stray preamble) is ignored.
+
+        stream = JSONArrayStream("steps_analysis")
+        for chunk in chunks:
+            for step in stream.feed(chunk):
+                ...
+    """
+
+    def __init__(self, key: str):
+        self.key = key
+        self._text = ""
+        self._pos = 0
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self._string_start: Optional[int] = None
+        self._last_key: Optional[str] = None
+        self._array_depth: Optional[int] = None
+        self._item_start: Optional[int] = None
+        self._done = False
+
+    def feed(self, chunk: str) -> list:
+        items = []
+        if self._done:
+            return items
+
+        self._text += chunk
+        text = self._text
+
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif ch == "\\":
+                    self._escape = True
+                elif ch == '"':
+                    self._in_string = False
+                    if self._depth == 1 and self._array_depth is None:
+                        self._last_key = text[self._string_start + 1:i]
+                continue
+
+            if ch == '"':
+                self._in_string = True
+                self._string_start = i
+            elif ch in "{[":
+                if ch == "[" and self._depth == 1 and self._last_key == self.key:
+                    self._array_depth = self._depth + 1
+                elif ch == "{" and self._array_depth is not None and self._depth == self._array_depth:
+                    self._item_start = i
+                self._depth += 1
+            elif ch in "}]":
+                self._depth -= 1
+                if ch == "}" and self._item_start is not None and self._depth == self._array_depth:
+                    try:
+                        items.append(json.loads(text[self._item_start:i + 1]))
+                    except json.JSONDecodeError:
+                        pass
+                    self._item_start = None
+                elif ch == "]" and self._array_depth is not None and self._depth == self._array_depth - 1:
+                    self._done = True
+                    self._pos = i + 1
+                    return items
+            elif ch not in " \t\r\n:":
+                self._last_key = None if self._depth == 1 else self._last_key
+
+        self._pos = len(text)
+        return items
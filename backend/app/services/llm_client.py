@@ -0,0 +1,162 @@
+import os
+import re
+import json
+import httpx
+import anthropic
+from contextlib import AsyncExitStack
+from typing import Optional
+
+from .rate_limiter import rate_limiter
+from .resilience import resilience, Deadline
+from .metrics import metrics
+from .cassette import cassette
+
+
+# Connection pool settings (overridable via environment)
+MAX_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_CONNECTIONS", "20"))
+MAX_KEEPALIVE_CONNECTIONS = int(os.getenv("ANTHROPIC_MAX_KEEPALIVE", "10"))
+KEEPALIVE_EXPIRY = float(os.getenv("ANTHROPIC_KEEPALIVE_EXPIRY", "30"))
+CONNECT_TIMEOUT = float(os.getenv("ANTHROPIC_CONNECT_TIMEOUT", "10"))
+POOL_TIMEOUT = float(os.getenv("ANTHROPIC_POOL_TIMEOUT", "10"))
+REQUEST_TIMEOUT = float(os.getenv("ANTHROPIC_REQUEST_TIMEOUT", "60"))
+
+# Mark static prompt prefixes for prompt caching
+PROMPT_CACHE_ENABLED = os.getenv("PROMPT_CACHE_ENABLED", "1") != "0"
+# Shortest prefix the API will cache (1024 tokens for Sonnet)
+PROMPT_CACHE_MIN_TOKENS = int(os.getenv("PROMPT_CACHE_MIN_TOKENS", "1024"))
+# Rough token estimate for English prompt text
+CHARS_PER_TOKEN = 4
+
+_client: Optional[anthropic.AsyncAnthropic] = None
+
+
+def get_client() -> anthropic.AsyncAnthropic:
+    """
+    Return the process-wide async Anthropic client.
+
+    The client is created lazily on first use and reuses a pool of
+    keep-alive connections for every vision and evaluation call.
+    """
+    global _client
+    if _client is None:
+        http_client = anthropic.DefaultAsyncHttpxClient(
+            limits=httpx.Limits(
+                max_connections=MAX_CONNECTIONS,
+                max_keepalive_connections=MAX_KEEPALIVE_CONNECTIONS,
+                keepalive_expiry=KEEPALIVE_EXPIRY,
+            ),
+            # Keep the rate limiter in step with the API's rate-limit headers
+            event_hooks={"response": [rate_limiter.observe]},
+        )
+        _client = anthropic.AsyncAnthropic(
+            api_key=os.getenv("ANTHROPIC_API_KEY"),
+            http_client=http_client,
+            # Retries are made by the resilience layer (see create_message)
+            max_retries=0,
+            timeout=anthropic.Timeout(
+                REQUEST_TIMEOUT,
+                connect=CONNECT_TIMEOUT,
+                pool=POOL_TIMEOUT,
+            ),
+        )
+    return _client
+
+
+async def close_client():
+    """Close the shared client and its connection pool (call on shutdown)."""
+    global _client
+    if _client is not None:
+        await _client.close()
+        _client = None
+
+
+async def create_message(params: dict, deadline: Optional[Deadline] = None):
+    """
+    One Messages API call, admitted by the rate limiter and made through the
+    resilience layer (retries, the submission deadline, circuit breaker).
+    Recorded or replayed when CASSETTE_MODE is set.
+    """
+    client = get_client()
+
+    async def send():
+        async with rate_limiter.limit(params) as call:
+            message = await cassette.call(params, lambda: client.messages.create(**params))
+            call.settle(message.usage)
+        return message
+
+    return await resilience.call("anthropic", send, deadline, REQUEST_TIMEOUT)
+
+
+async def open_message_stream(stack: AsyncExitStack, params: dict, deadline: Optional[Deadline] = None):
+    """
+    Streaming counterpart of `create_message`. Opening the stream is retried;
+    once events arrive a failure is final, since output has already been
+    passed on. The stream is closed with `stack`. Returns (stream, call);
+    pass the final message's usage to `call.settle`.
+    """
+    client = get_client()
+
+    async def send():
+        async with rate_limiter.limit(params) as call:
+            stream = await cassette.stream(params, lambda: stack.enter_async_context(client.messages.stream(**params)))
+            return stream, call
+
+    return await resilience.call("anthropic", send, deadline, REQUEST_TIMEOUT)
+
+
+def parse_json_object(text: str) -> Optional[dict]:
+    """Parse a JSON object from a model response, tolerating surrounding text."""
+    try:
+        return json.loads(text)
+    except json.JSONDecodeError:
+        json_match = re.search(r'\{[\s\S]*\}', text)
+        if not json_match:
+            return None
+        try:
+            return json.loads(json_match.group())
+        except json.JSONDecodeError:
+            return None
+
+
+def text_block(text: str) -> dict:
+    return {"type": "text", "text": text}
+
+
+def mark_cache_prefix(prefix: list[dict]):
+    """
+    Put one cache breakpoint on the last of `prefix`, the text blocks every
+    request of a kind starts with (system prompt, then problem context).
+
+    Everything up to the breakpoint is cached by the API and read back at a
+    discount by the next request with the same prefix. The API ignores
+    prefixes shorter than PROMPT_CACHE_MIN_TOKENS, so those aren't marked.
+    """
+    tokens = sum(len(block["text"]) for block in prefix) / CHARS_PER_TOKEN
+    if PROMPT_CACHE_ENABLED and prefix and tokens >= PROMPT_CACHE_MIN_TOKENS:
+        prefix[-1]["cache_control"] = {"type": "ephemeral"}
+
+
+class UsageTracker:
+    """Per-call-type token totals, including prompt cache reads and writes."""
+
+    FIELDS = ("input_tokens", "output_tokens", "cache_creation_input_tokens", "cache_read_input_tokens")
+
+    def __init__(self):
+        self.totals: dict[str, dict[str, int]] = {}
+
+    def record(self, call: str, usage) -> dict:
+        """Add one response's usage to the totals for `call` (also exported on /metrics)."""
+        counts = {name: getattr(usage, name, None) or 0 for name in self.FIELDS}
+        totals = self.totals.setdefault(call, {"calls": 0, **{name: 0 for name in self.FIELDS}})
+        totals["calls"] += 1
+        for name, value in counts.items():
+            totals[name] += value
+        metrics.record_usage(call, counts)
+        return counts
+
+    def stats(self) -> dict:
+        return {call: dict(totals) for call, totals in self.totals.items()}
+
+
+# Singleton instance
+usage_tracker = UsageTracker()
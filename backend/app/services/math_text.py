@@ -0,0 +1,84 @@
+import re
+import unicodedata
+
+
+# Unicode / LaTeX spellings of operators mapped to a single ASCII form
+OPERATOR_MAP = {
+    "×": "*",
+    "✕": "*",
+    "⋅": "*",
+    "·": "*",
+    "∙": "*",
+    "∗": "*",
+    "÷": "/",
+    "∕": "/",
+    "⁄": "/",
+    "−": "-",
+    "–": "-",
+    "—": "-",
+    "‐": "-",
+    "﹣": "-",
+    "＝": "=",
+    "≡": "=",
+    "％": "%",
+}
+
+LATEX_MAP = {
+    r"\times": "*",
+    r"\cdot": "*",
+    r"\div": "/",
+    r"\left": "",
+    r"\right": "",
+    r"\%": "%",
+    r"\$": "$",
+}
+
+_FRAC_RE = re.compile(r"\\[dt]?frac\{([^{}]*)\}\{([^{}]*)\}")
+_SIMPLE_TERM_RE = re.compile(r"\s*[\w.]+\s*")
+_WHITESPACE_RE = re.compile(r"\s+")
+# NFKC spells "½" as "1⁄2", so "1½" would otherwise become "11/2"
+_DIGIT_VULGAR_FRACTION_RE = re.compile(r"(\d)([\u00bc-\u00be\u2150-\u215e])")
+# A space is kept only between two digit runs ("1 5/12" is not "15/12")
+_DROPPED_SPACE_RE = re.compile(r"(?<!\d) | (?!\d)")
+
+
+def _frac_to_slash(match: re.Match) -> str:
+    parts = []
+    for term in match.groups():
+        parts.append(term if _SIMPLE_TERM_RE.fullmatch(term) else f"({term})")
+    return "/".join(parts)
+
+
+def normalize_line(line: str) -> str:
+    """Normalize one line of math to a compact ASCII form."""
+    line = _DIGIT_VULGAR_FRACTION_RE.sub(r"\1 \2", line)
+    line = unicodedata.normalize("NFKC", line)
+
+    for src, dst in LATEX_MAP.items():
+        line = line.replace(src, dst)
+    line = _FRAC_RE.sub(_frac_to_slash, line)
+
+    line = "".join(OPERATOR_MAP.get(ch, ch) for ch in line)
+    line = line.replace("$", "") if line.count("$") > 1 else line
+    line = _WHITESPACE_RE.sub(" ", line).strip()
+    line = _DROPPED_SPACE_RE.sub("", line).lower()
+
+    # Trailing punctuation carries no meaning ("x = 4." vs "x = 4")
+    return line.rstrip(".,;:")
+
+
+def canonicalize_work(text: str) -> str:
+    """
+    Canonicalize extracted student work so equivalent transcriptions compare equal.
+
+    Normalizes unicode, operator spellings (×, ÷, ·, −, ...), simple LaTeX and
+    whitespace, so "x=4" and "x = 4" or "2 × 3" and "2*3" collapse to the
+    same string. One space is kept between adjacent digit runs, so the mixed
+    number "1 5/12" stays distinct from "15/12". Line order is preserved and
+    blank lines are dropped.
+    """
+    if not text:
+        return ""
+
+    lines = (normalize_line(line) for line in text.replace("\r", "\n").split("\n"))
+    return "\n".join(line for line in lines if line)
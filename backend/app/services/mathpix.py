@@ -1,8 +1,11 @@
 import httpx
 import os
+import re
 from dataclasses import dataclass
 from typing import Optional
 
+from .resilience import resilience, Deadline, UpstreamUnavailable
+
 
 @dataclass
 class OCRResult:
@@ -18,6 +21,8 @@ class MathpixService:
     """Service for extracting math from images using Mathpix API."""
 
     API_URL = "https://api.mathpix.com/v3/text"
+    # Seconds per request
+    TIMEOUT = 30.0
 
     def __init__(self):
         self.app_id = os.getenv("MATHPIX_APP_ID")
@@ -27,12 +32,29 @@ class MathpixService:
         """Check if Mathpix credentials are configured."""
         return bool(self.app_id and self.app_key)
 
-    async def extract_math(self, image_base64: str) -> OCRResult:
+    @staticmethod
+    def plain_text(text: str) -> str:
+        """
+        Mathpix Markdown to a line-by-line transcription: math delimiters and
+        alignment markup are dropped, the LaTeX inside is kept as-is.
+        """
+        text = re.sub(r"\\(begin|end)\{[a-zA-Z*]+\}", "", text)
+        text = text.replace("\\\\", "\n").replace("&", "")
+        for delimiter in ("\\(", "\\)", "\\[", "\\]", "$$"):
+            text = text.replace(delimiter, "")
+        lines = (line.strip() for line in text.splitlines())
+        return "\n".join(line for line in lines if line)
+
+    async def extract_math(self, image_base64: str, deadline: Optional[Deadline] = None) -> OCRResult:
         """
         Extract mathematical content from a base64-encoded image.
 
+        Timeouts, network errors and 5xx responses are retried through the
+        resilience layer (within `deadline`, behind the "mathpix" breaker).
+
         Args:
             image_base64: Base64-encoded image string (without data URI prefix)
+            deadline: Time budget of the whole submission
 
         Returns:
             OCRResult with extracted text and LaTeX
@@ -62,64 +84,80 @@ class MathpixService:
             }
         }
 
-        try:
-            async with httpx.AsyncClient(timeout=30.0) as client:
+        async def send() -> httpx.Response:
+            async with httpx.AsyncClient(timeout=self.TIMEOUT) as client:
                 response = await client.post(
                     self.API_URL,
                     headers=headers,
                     json=payload
                 )
+            if response.status_code >= 500:
+                response.raise_for_status()
+            return response
 
-                if response.status_code == 401:
-                    return OCRResult(
-                        success=False,
-                        error="Invalid Mathpix API credentials"
-                    )
-
-                if response.status_code == 429:
-                    return OCRResult(
-                        success=False,
-                        error="Mathpix rate limit exceeded"
-                    )
-
-                if response.status_code != 200:
-                    return OCRResult(
-                        success=False,
-                        error=f"Mathpix API error: {response.status_code}"
-                    )
-
-                data = response.json()
-
-                # Check for errors in response
-                if "error" in data:
-                    return OCRResult(
-                        success=False,
-                        error=data.get("error_info", {}).get("message", "Unknown error")
-                    )
-
-                text = data.get("text", "").strip()
-                latex = data.get("latex_styled", "").strip()
-                confidence = data.get("confidence", 0)
-
-                # Check if we got any meaningful content
-                if not text and not latex:
-                    return OCRResult(
-                        success=False,
-                        error="No mathematical content detected in image"
-                    )
+        try:
+            response = await resilience.call("mathpix", send, deadline, self.TIMEOUT)
 
+            if response.status_code == 401:
                 return OCRResult(
-                    success=True,
-                    text=text,
-                    latex=latex,
-                    confidence=confidence
+                    success=False,
+                    error="Invalid Mathpix API credentials"
                 )
 
+            if response.status_code == 429:
+                return OCRResult(
+                    success=False,
+                    error="Mathpix rate limit exceeded"
+                )
+
+            if response.status_code != 200:
+                return OCRResult(
+                    success=False,
+                    error=f"Mathpix API error: {response.status_code}"
+                )
+
+            data = response.json()
+
+            # Check for errors in response
+            if "error" in data:
+                return OCRResult(
+                    success=False,
+                    error=data.get("error_info", {}).get("message", "Unknown error")
+                )
+
+            text = data.get("text", "").strip()
+            latex = data.get("latex_styled", "").strip()
+            confidence = data.get("confidence", 0)
+
+            # Check if we got any meaningful content
+            if not text and not latex:
+                return OCRResult(
+                    success=False,
+                    error="No mathematical content detected in image"
+                )
+
+            return OCRResult(
+                success=True,
+                text=text,
+                latex=latex,
+                confidence=confidence
+            )
+
+        except UpstreamUnavailable as e:
+            return OCRResult(
+                success=False,
+                error=str(e)
+            )
         except httpx.TimeoutException:
             return OCRResult(
                 success=False,
                 error="Mathpix API request timed out"
             )
+        except httpx.HTTPStatusError as e:
+            return OCRResult(
+                success=False,
+                error=f"Mathpix API error: {e.response.status_code}"
+            )
         except httpx.RequestError as e:
             return OCRResult(
                 success=False,
@@ -0,0 +1,142 @@
+import time
+from contextlib import contextmanager
+from typing import Callable, Iterable, Optional
+
+# Seconds; covers local checks (ms) up to slow model calls and the submission deadline
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 90)
+
+PREFIX = "math_feedback"
+
+# A collector yields (metric name, type, help, [(labels, value)]) at scrape time
+Collector = Callable[[], Iterable[tuple[str, str, str, list[tuple[dict, float]]]]]
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+def _labels(labels: dict) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in labels.items()) + "}"
+
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return str(int(value)) if float(value).is_integer() else repr(float(value))
+
+
+class Counter:
+    def __init__(self, name: str, help: str):
+        self.name = name
+        self.help = help
+        self.values: dict[tuple, float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = tuple(sorted(labels.items()))
+        self.values[key] = self.values.get(key, 0) + amount
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        for key, value in sorted(self.values.items()):
+            lines.append(f"{self.name}{_labels(dict(key))} {_number(value)}")
+        return lines
+
+
+class Histogram:
+    def __init__(self, name: str, help: str, buckets: tuple = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets) + (float("inf"),)
+        # labels -> (per-bucket counts, sum, count)
+        self.values: dict[tuple, list] = {}
+
+    def observe(self, value: float, **labels):
+        key = tuple(sorted(labels.items()))
+        state = self.values.setdefault(key, [[0] * len(self.buckets), 0.0, 0])
+        for i, bound in enumerate(self.buckets):
+            if value <= bound:
+                state[0][i] += 1
+                break
+        state[1] += value
+        state[2] += 1
+
+    def render(self) -> list[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        for key, (counts, total, count) in sorted(self.values.items()):
+            labels = dict(key)
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                lines.append(f"{self.name}_bucket{_labels({**labels, 'le': _number(bound)})} {cumulative}")
+            lines.append(f"{self.name}_sum{_labels(labels)} {_number(total)}")
+            lines.append(f"{self.name}_count{_labels(labels)} {count}")
+        return lines
+
+
+class Metrics:
+    """
+    Process-wide instrumentation, exposed on `/metrics` in the Prometheus
+    text format (version 0.0.4).
+
+    Stage latencies go into one histogram labelled by stage, model tokens
+    and errors into counters. Values other services already count (cache
+    hits and misses) are read by collectors at scrape time.
+    """
+
+    def __init__(self):
+        self.stage_seconds = Histogram(
+            f"{PREFIX}_stage_seconds",
+            "Latency of each submission pipeline stage in seconds."
+        )
+        self.llm_tokens = Counter(
+            f"{PREFIX}_llm_tokens_total",
+            "Model tokens by call and kind (input, output, cache_creation, cache_read)."
+        )
+        self.llm_calls = Counter(
+            f"{PREFIX}_llm_calls_total",
+            "Completed model calls by call."
+        )
+        self.errors = Counter(
+            f"{PREFIX}_errors_total",
+            "Errors by pipeline stage and error type."
+        )
+        self.collectors: list[Collector] = []
+
+    @contextmanager
+    def stage(self, name: str):
+        """Time the enclosed block as one observation of stage `name`."""
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stage_seconds.observe(time.perf_counter() - started, stage=name)
+
+    def record_usage(self, call: str, counts: dict[str, int]):
+        """Token counts of one response, keyed by API usage field name."""
+        self.llm_calls.inc(call=call)
+        for field, value in counts.items():
+            if value:
+                self.llm_tokens.inc(value, call=call, kind=field.removesuffix("_input_tokens").removesuffix("_tokens"))
+
+    def record_error(self, stage: str, error: Optional[BaseException] = None, kind: Optional[str] = None):
+        self.errors.inc(stage=stage, type=kind or type(error).__name__)
+
+    def add_collector(self, collector: Collector):
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in (self.stage_seconds, self.llm_tokens, self.llm_calls, self.errors):
+            lines.extend(metric.render())
+        for collector in self.collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f"# HELP {name} {help}")
+                lines.append(f"# TYPE {name} {kind}")
+                lines.extend(f"{name}{_labels(labels)} {_number(value)}" for labels, value in samples)
+        return "\n".join(lines) + "\n"
+
+
+# Singleton instance
+metrics = Metrics()
@@ -1,10 +1,20 @@
 import os
-import json
-import re
+import io
+import base64
+import asyncio
+import binascii
 import anthropic
 from dataclasses import dataclass
 from typing import Optional
 
+from PIL import Image, ImageFilter, ImageStat, UnidentifiedImageError
+
+from .llm_client import create_message, parse_json_object, mark_cache_prefix, text_block, usage_tracker
+from .rate_limiter import RateLimitRejected
+from .resilience import Deadline, UpstreamUnavailable
+from .metrics import metrics
+from .image_prep import image_preparer, flatten_transparency, PreparedImage
+
 
 @dataclass
 class VisionResult:
@@ -19,6 +29,117 @@ class VisionResult:
     error: Optional[str] = None
 
 
+@dataclass
+class ImageInput:
+    """Decoded image bytes and media type, shared by every pipeline stage."""
+    media_type: str
+    data: bytes
+
+    @classmethod
+    def from_base64(cls, image_base64: str) -> "ImageInput":
+        """Decode a base64 string or data URI. Raises ValueError if it isn't usable."""
+        if image_base64.startswith("data:"):
+            header, raw = image_base64.split(",", 1)
+            media_type = header.split(":")[1].split(";")[0]
+        else:
+            media_type, raw = "image/jpeg", image_base64
+        try:
+            data = base64.b64decode(raw)
+        except binascii.Error as e:
+            raise ValueError(f"Image data is not valid base64: {e}") from e
+        if not data:
+            raise ValueError("Image data is empty")
+        return cls(media_type=media_type, data=data)
+
+    def preview(self) -> str:
+        """Truncated data URI stored with the submission instead of the full image."""
+        encoded = base64.b64encode(self.data[:75]).decode()
+        return f"data:{self.media_type};base64,{encoded}"[:100] + "..."
+
+
+class ImageQualityChecker:
+    """
+    Fast local pre-screen that rejects obviously unusable photos.
+
+    Runs on a downsampled grayscale copy and looks at resolution, exposure
+    (mean brightness), near-blank content (contrast) and blur (variance of
+    the Laplacian). It only rejects clear failures; anything borderline is
+    left for the vision model to judge.
+    """
+
+    # Long edge the image is reduced to before measuring (keeps this a few ms)
+    ANALYSIS_SIZE = 512
+
+    LAPLACIAN = ImageFilter.Kernel((3, 3), [0, 1, 0, 1, -4, 1, 0, 1, 0], scale=1, offset=128)
+
+    def __init__(self):
+        self.enabled = os.getenv("QUALITY_PRECHECK_ENABLED", "1") != "0"
+        self.min_side_px = int(os.getenv("QUALITY_MIN_SIDE_PX", "200"))
+        self.min_brightness = float(os.getenv("QUALITY_MIN_BRIGHTNESS", "45"))
+        self.max_brightness = float(os.getenv("QUALITY_MAX_BRIGHTNESS", "250"))
+        self.min_contrast = float(os.getenv("QUALITY_MIN_CONTRAST", "8"))
+        self.min_sharpness = float(os.getenv("QUALITY_MIN_SHARPNESS", "12"))
+
+    def measure(self, image_bytes: bytes) -> Optional[dict]:
+        """Compute quality metrics, or None if the image can't be decoded locally."""
+        try:
+            image = Image.open(io.BytesIO(image_bytes))
+            width, height = image.size
+            # JPEG draft mode decodes straight at a reduced scale
+            image.draft("L", (self.ANALYSIS_SIZE, self.ANALYSIS_SIZE))
+            gray = flatten_transparency(image).convert("L")
+        except (UnidentifiedImageError, OSError, ValueError):
+            return None
+
+        gray.thumbnail((self.ANALYSIS_SIZE, self.ANALYSIS_SIZE), Image.Resampling.BILINEAR, reducing_gap=2.0)
+        stats = ImageStat.Stat(gray)
+        # The filter leaves the 1px border untouched; measure the interior only
+        edges = gray.filter(self.LAPLACIAN)
+        laplacian = ImageStat.Stat(edges.crop((1, 1, edges.width - 1, edges.height - 1)))
+
+        return {
+            "width": width,
+            "height": height,
+            "brightness": stats.mean[0],
+            "contrast": stats.stddev[0],
+            "sharpness": laplacian.var[0],
+        }
+
+    def check(self, image_bytes: bytes) -> Optional[VisionResult]:
+        """Return a not-readable VisionResult for clear failures, else None."""
+        if not self.enabled:
+            return None
+
+        metrics = self.measure(image_bytes)
+        if metrics is None:
+            return None
+
+        issues = []
+        suggestion = None
+
+        if min(metrics["width"], metrics["height"]) < self.min_side_px:
+            issues.append("Low resolution — the image is too small to read reliably")
+            suggestion = "Take the photo closer to your work, or use a higher camera resolution."
+
+        if metrics["brightness"] < self.min_brightness:
+            issues.append("Poor lighting — the image is too dark")
+            suggestion = "Move to a brighter spot or turn on more lights before retaking the photo."
+        elif metrics["brightness"] > self.max_brightness:
+            issues.append("Poor lighting — the image is washed out")
+            suggestion = "Avoid direct light or flash glare on the paper."
+        elif metrics["contrast"] < self.min_contrast:
+            issues.append("No visible writing — the image looks blank")
+            suggestion = "Make sure your written work fills most of the photo."
+        elif metrics["sharpness"] < self.min_sharpness:
+            issues.append("Blurry or out of focus")
+            suggestion = "Hold the camera steady and tap to focus on your work before taking the photo."
+
+        if not issues:
+            return None
+
+        return VisionResult(readable=False, issues=issues, suggestion=suggestion)
+
+
 class VisionService:
     """Single Claude Vision call that checks image quality and extracts math."""
 
@@ -60,107 +181,134 @@ If readable:
 
     def __init__(self):
         self.api_key = os.getenv("ANTHROPIC_API_KEY")
+        self.quality_checker = ImageQualityChecker()
 
     def is_configured(self) -> bool:
         return bool(self.api_key)
 
-    def _parse_image_data(self, image_base64: str) -> tuple[str, str]:
-        if image_base64.startswith("data:"):
-            header, data = image_base64.split(",", 1)
-            media_type = header.split(":")[1].split(";")[0]
-            return media_type, data
-        else:
-            return "image/jpeg", image_base64
-
-    async def analyze(self, image_base64: str) -> VisionResult:
+    async def analyze(self, image: ImageInput, deadline: Optional[Deadline] = None) -> VisionResult:
         """
         Single Claude Vision call: checks quality, and if readable, extracts math.
         """
+        rejected, prepared = await self.screen(image)
+        if rejected:
+            return rejected
+        return await self.analyze_prepared(prepared, deadline)
+
+    async def analyze_prepared(self, prepared: PreparedImage, deadline: Optional[Deadline] = None) -> VisionResult:
+        """The vision call for an image that already passed `screen`."""
+        try:
+            message = await create_message(self.request_params(prepared), deadline)
+            usage_tracker.record("vision", message.usage)
+
+            return self.parse_response(message.content[0].text.strip())
+
+        except RateLimitRejected:
+            raise
+        except Exception as e:
+            return self.error_result(e)
+
+    def request_params(self, prepared: PreparedImage) -> dict:
+        """Messages API parameters for one vision request (also used for batches)."""
+        # Instructions go first as a cacheable system prefix; only the image varies
+        system = [text_block(self.PROMPT)]
+        mark_cache_prefix(system)
+        return {
+            "model": "claude-sonnet-4-20250514",
+            "max_tokens": 1024,
+            "system": system,
+            "messages": [{
+                "role": "user",
+                "content": [
+                    {
+                        "type": "image",
+                        "source": {
+                            "type": "base64",
+                            "media_type": prepared.media_type,
+                            "data": prepared.data,
+                        },
+                    },
+                    {
+                        "type": "text",
+                        "text": "Analyze this photo as instructed.",
+                    }
+                ],
+            }],
+        }
+
+    def parse_response(self, response_text: str) -> VisionResult:
+        data = parse_json_object(response_text)
+        if data is None:
+            print("[Vision] Could not parse response")
+            metrics.record_error("vision", kind="UnparseableResponse")
+            return VisionResult(
+                readable=False,
+                error="Failed to parse image analysis response"
+            )
+        return self.result_from_data(data)
+
+    async def screen(self, image: ImageInput) -> tuple[Optional[VisionResult], Optional[PreparedImage]]:
+        """
+        Checks shared by every vision call: configuration, the local quality
+        pre-screen and downscaling. Returns (rejection, None) when the image
+        should not be sent, otherwise (None, prepared image).
+        """
         if not self.is_configured():
             return VisionResult(
                 readable=False,
                 error="Anthropic API key not configured"
-            )
+            ), None
 
-        try:
-            media_type, raw_base64 = self._parse_image_data(image_base64)
-            print(f"[Vision] Analyzing image, media_type={media_type}, data_length={len(raw_base64)}")
-
-            client = anthropic.Anthropic(api_key=self.api_key)
-
-            message = client.messages.create(
-                model="claude-sonnet-4-20250514",
-                max_tokens=1024,
-                messages=[{
-                    "role": "user",
-                    "content": [
-                        {
-                            "type": "image",
-                            "source": {
-                                "type": "base64",
-                                "media_type": media_type,
-                                "data": raw_base64,
-                            },
-                        },
-                        {
-                            "type": "text",
-                            "text": self.PROMPT,
-                        }
-                    ],
-                }]
-            )
+        # Local pre-screen: reject obviously unusable photos without an API call
+        rejected = await asyncio.to_thread(self.quality_checker.check, image.data)
+        if rejected:
+            return rejected, None
+
+        # Downscale / re-encode so we upload (and pay for) fewer bytes
+        prepared = await asyncio.to_thread(image_preparer.prepare, image.data, image.media_type)
+        return None, prepared
 
-            response_text = message.content[0].text.strip()
-            print(f"[Vision] Claude response: {response_text}")
-
-            # Parse JSON
-            try:
-                data = json.loads(response_text)
-            except json.JSONDecodeError:
-                json_match = re.search(r'\{[\s\S]*\}', response_text)
-                if json_match:
-                    data = json.loads(json_match.group())
-                else:
-                    print("[Vision] Could not parse response")
-                    return VisionResult(
-                        readable=False,
-                        error="Failed to parse image analysis response"
-                    )
-
-            readable = data.get("readable", False)
-            issues = data.get("issues", [])
-            suggestion = data.get("suggestion")
-            extracted_text = data.get("extracted_text")
-
-            if not readable:
-                return VisionResult(
-                    readable=False,
-                    issues=issues if issues else ["Image not readable"],
-                    suggestion=suggestion,
-                )
-
-            # Readable but no text extracted
-            if not extracted_text or extracted_text.strip() == "" or extracted_text.upper() == "NONE":
-                return VisionResult(
-                    readable=False,
-                    issues=["No mathematical content detected"],
-                    suggestion="Make sure your math work is visible in the photo.",
-                )
+    @staticmethod
+    def result_from_data(data: dict) -> VisionResult:
+        """Turn the quality/transcription fields of a parsed response into a VisionResult."""
+        readable = data.get("readable", False)
+        issues = data.get("issues", [])
+        suggestion = data.get("suggestion")
+        extracted_text = data.get("extracted_text")
 
+        if not readable:
             return VisionResult(
-                readable=True,
-                extracted_text=extracted_text.strip(),
+                readable=False,
+                issues=issues if issues else ["Image not readable"],
+                suggestion=suggestion,
             )
 
-        except anthropic.AuthenticationError:
+        # Readable but no text extracted
+        if not extracted_text or extracted_text.strip() == "" or extracted_text.upper() == "NONE":
+            return VisionResult(
+                readable=False,
+                issues=["No mathematical content detected"],
+                suggestion="Make sure your math work is visible in the photo.",
+            )
+
+        return VisionResult(
+            readable=True,
+            extracted_text=extracted_text.strip(),
+        )
+
+    @staticmethod
+    def error_result(e: Exception, stage: str = "vision") -> VisionResult:
+        metrics.record_error(stage, e)
+        if isinstance(e, anthropic.AuthenticationError):
             return VisionResult(readable=False, error="Invalid Anthropic API key")
-        except anthropic.RateLimitError:
+        if isinstance(e, anthropic.RateLimitError):
             return VisionResult(readable=False, error="Rate limit exceeded. Please try again later.")
-        except anthropic.APIError as e:
+        if isinstance(e, UpstreamUnavailable):
+            return VisionResult(readable=False, error=str(e))
+        if isinstance(e, anthropic.APIError):
             return VisionResult(readable=False, error=f"API error: {str(e)}")
-        except Exception as e:
-            print(f"[Vision] Unexpected error: {type(e).__name__}: {e}")
-            return VisionResult(readable=False, error=f"Unexpected error: {str(e)}")
+        print(f"[Vision] Unexpected error: {type(e).__name__}: {e}")
+        return VisionResult(readable=False, error=f"Unexpected error: {str(e)}")
 
 
 # Singleton instance
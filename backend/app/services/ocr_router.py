@@ -0,0 +1,146 @@
+import os
+import time
+import asyncio
+from collections import deque
+from typing import Optional
+
+from .ocr import VisionResult, ImageInput, PreparedImage, vision_service
+from .mathpix import mathpix_service
+from .rate_limiter import RateLimitRejected
+from .resilience import Deadline
+
+
+class OCRRouter:
+    """
+    Routes the OCR stage to Claude Vision, optionally backed up by Mathpix.
+
+    OCR_MODE selects the strategy:
+      - "vision": Claude Vision only (the default, and the only mode
+        without Mathpix credentials)
+      - "race": send the image to both at once
+      - "hedge": send it to Claude Vision, and to Mathpix as well only if
+        Vision hasn't answered within the hedge delay (or failed)
+
+    The hedge delay is the p95 of recent Vision latencies (sampled in every
+    mode), so only the slow tail pays for a second request. The first acceptable result wins and the
+    slower call is cancelled. Any Vision verdict without an error is
+    acceptable, including "not readable". A Mathpix transcription counts only
+    when its `confidence` is at least MATHPIX_MIN_CONFIDENCE, since Mathpix
+    doesn't judge photo quality the way the Vision prompt does.
+    """
+
+    MODES = ("vision", "race", "hedge")
+
+    def __init__(self):
+        self.mode = os.getenv("OCR_MODE", "vision").lower()
+        self.min_confidence = float(os.getenv("MATHPIX_MIN_CONFIDENCE", "0.8"))
+        # Used until enough Vision latencies have been seen
+        self.default_hedge_delay = float(os.getenv("OCR_HEDGE_DELAY", "6"))
+        self.min_hedge_samples = int(os.getenv("OCR_HEDGE_MIN_SAMPLES", "20"))
+        self.latencies: deque[float] = deque(maxlen=500)
+        self.counts = {"vision_wins": 0, "mathpix_wins": 0, "hedged": 0, "raced": 0, "mathpix_rejected": 0}
+
+    def active_mode(self) -> str:
+        if self.mode not in self.MODES or not mathpix_service.is_configured():
+            return "vision"
+        return self.mode
+
+    def hedge_delay(self) -> float:
+        """Seconds to wait for Vision before also asking Mathpix: p95 of recent Vision latencies."""
+        if len(self.latencies) < self.min_hedge_samples:
+            return self.default_hedge_delay
+        ordered = sorted(self.latencies)
+        return ordered[int(0.95 * (len(ordered) - 1))]
+
+    async def analyze(self, image: ImageInput, deadline: Optional[Deadline] = None) -> VisionResult:
+        """Quality check + transcription of one image, from whichever provider answers acceptably first."""
+        # Local pre-check and downscaling apply to both providers
+        rejected, prepared = await vision_service.screen(image)
+        if rejected:
+            return rejected
+
+        mode = self.active_mode()
+        if mode == "vision":
+            return await self._vision(prepared, deadline)
+
+        vision_task = asyncio.create_task(self._vision(prepared, deadline))
+        mathpix_task = None
+        try:
+            if mode == "hedge":
+                done, _ = await asyncio.wait({vision_task}, timeout=self.hedge_delay())
+                if done and vision_task.exception() is None and not vision_task.result().error:
+                    self.counts["vision_wins"] += 1
+                    return vision_task.result()
+                self.counts["hedged"] += 1
+            else:
+                self.counts["raced"] += 1
+            mathpix_task = asyncio.create_task(self._mathpix(prepared, deadline))
+
+            fallback, rejection = None, None
+            pending = {vision_task, mathpix_task}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task is vision_task:
+                        try:
+                            result = task.result()
+                        except RateLimitRejected as e:
+                            rejection = e
+                            continue
+                        if not result.error:
+                            self.counts["vision_wins"] += 1
+                            return result
+                        fallback = result
+                    elif task.result() is not None:
+                        self.counts["mathpix_wins"] += 1
+                        print("[OCR] Using Mathpix transcription")
+                        return task.result()
+
+            # Neither was acceptable: report what Vision ran into
+            if rejection:
+                raise rejection
+            return fallback
+        finally:
+            for task in (vision_task, mathpix_task):
+                if task is not None and not task.done():
+                    task.cancel()
+
+    async def _vision(self, prepared: PreparedImage, deadline: Optional[Deadline]) -> VisionResult:
+        """
+        The Vision call, timed in every mode. A call cancelled because
+        Mathpix won took at least as long as it ran, so it is sampled too;
+        leaving it out would keep the slow tail out of the hedge delay.
+        """
+        started = time.perf_counter()
+        sample = True
+        try:
+            result = await vision_service.analyze_prepared(prepared, deadline)
+            sample = not result.error
+            return result
+        except RateLimitRejected:
+            sample = False
+            raise
+        finally:
+            if sample:
+                self.latencies.append(time.perf_counter() - started)
+
+    async def _mathpix(self, prepared: PreparedImage, deadline: Optional[Deadline]) -> Optional[VisionResult]:
+        """A readable VisionResult from Mathpix, or None if its result isn't confident enough to use."""
+        result = await mathpix_service.extract_math(f"data:{prepared.media_type};base64,{prepared.data}", deadline)
+        text = mathpix_service.plain_text(result.text or result.latex or "") if result.success else ""
+        if not text or (result.confidence or 0) < self.min_confidence:
+            self.counts["mathpix_rejected"] += 1
+            print(f"[OCR] Mathpix result not used: {result.error or f'confidence {result.confidence}'}")
+            return None
+        return VisionResult(readable=True, extracted_text=text)
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.active_mode(),
+            "hedge_delay": round(self.hedge_delay(), 3),
+            **self.counts,
+        }
+
+
+# Singleton instance
+ocr_router = OCRRouter()
@@ -0,0 +1,148 @@
+import os
+import random
+from typing import Optional
+
+from ..database import run_db
+
+
+class PipelineModeSelector:
+    """
+    Chooses between the two-call pipeline (vision, then evaluation) and the
+    fused single-call mode for each submission.
+
+    PIPELINE_MODE sets the default ("two_call", "fused" or "auto") and
+    PIPELINE_MODE_OVERRIDES pins individual problems or topics, e.g.
+    "fractions-addition=fused,lin-eq-001=two_call" (problem ids win over topic ids).
+
+    In "auto" mode every fresh evaluation is recorded in the
+    `pipeline_mode_stats` table for both its problem and its topic. Once both
+    modes have enough samples for a problem (or else its topic), the mode with
+    the lowest mean latency is picked among those whose error rate is within
+    a tolerance of the best. Errors are unparseable fused responses, failed
+    evaluations and verdicts that disagree with the exact local answer check.
+    Until then, and for a small share of traffic afterwards, the less-sampled
+    mode is tried.
+    """
+
+    MODES = ("two_call", "fused")
+
+    def __init__(self):
+        self.default_mode = os.getenv("PIPELINE_MODE", "two_call").lower()
+        self.overrides = self._parse_overrides(os.getenv("PIPELINE_MODE_OVERRIDES", ""))
+        self.min_samples = int(os.getenv("PIPELINE_MODE_MIN_SAMPLES", "20"))
+        self.accuracy_tolerance = float(os.getenv("PIPELINE_MODE_ACCURACY_TOLERANCE", "0.02"))
+        self.explore_rate = float(os.getenv("PIPELINE_MODE_EXPLORE_RATE", "0.05"))
+        self.chosen = {mode: 0 for mode in self.MODES}
+
+    @staticmethod
+    def _parse_overrides(value: str) -> dict[str, str]:
+        overrides = {}
+        for item in value.split(","):
+            if "=" in item:
+                key, mode = item.split("=", 1)
+                overrides[key.strip()] = mode.strip().lower()
+        return overrides
+
+    # --- database helpers (run on the DB thread pool) ---
+
+    @staticmethod
+    def _fetch(conn, scopes: list[str]) -> dict[str, dict[str, dict]]:
+        placeholders = ",".join("?" for _ in scopes)
+        cursor = conn.execute(f"""
+            SELECT scope, mode, samples, total_latency_ms, failures, disagreements
+            FROM pipeline_mode_stats WHERE scope IN ({placeholders})
+        """, scopes)
+        stats: dict[str, dict[str, dict]] = {}
+        for row in cursor.fetchall():
+            stats.setdefault(row["scope"], {})[row["mode"]] = dict(row)
+        return stats
+
+    @staticmethod
+    def _record(conn, scopes: list[str], mode: str, latency_ms: float, failed: bool, disagreed: bool):
+        conn.executemany("""
+            INSERT INTO pipeline_mode_stats (scope, mode, samples, total_latency_ms, failures, disagreements)
+            VALUES (?, ?, 1, ?, ?, ?)
+            ON CONFLICT (scope, mode) DO UPDATE SET
+                samples = samples + 1,
+                total_latency_ms = total_latency_ms + excluded.total_latency_ms,
+                failures = failures + excluded.failures,
+                disagreements = disagreements + excluded.disagreements
+        """, [(scope, mode, latency_ms, int(failed), int(disagreed)) for scope in scopes])
+
+    @staticmethod
+    def _scopes(problem_id: str, topic_id: Optional[str]) -> list[str]:
+        scopes = [f"problem:{problem_id}"]
+        if topic_id:
+            scopes.append(f"topic:{topic_id}")
+        return scopes
+
+    # --- public API ---
+
+    def configured_mode(self, problem_id: str, topic_id: Optional[str]) -> str:
+        return self.overrides.get(problem_id) or self.overrides.get(topic_id) or self.default_mode
+
+    def is_measured(self, problem_id: str, topic_id: Optional[str]) -> bool:
+        """True when this problem's mode is chosen from measurements ("auto")."""
+        return self.configured_mode(problem_id, topic_id) == "auto"
+
+    async def choose(self, problem_id: str, topic_id: Optional[str]) -> str:
+        """Mode to use for the next submission to this problem."""
+        mode = self.configured_mode(problem_id, topic_id)
+        if mode == "auto":
+            mode = await self._choose_measured(self._scopes(problem_id, topic_id))
+        if mode not in self.MODES:
+            mode = "two_call"
+        self.chosen[mode] += 1
+        return mode
+
+    async def _choose_measured(self, scopes: list[str]) -> str:
+        stats = await run_db(self._fetch, scopes)
+
+        def samples(scope: str, mode: str) -> int:
+            return stats.get(scope, {}).get(mode, {}).get("samples", 0)
+
+        # Explore at the widest scope, where samples accumulate fastest
+        widest = scopes[-1]
+        least_sampled = min(self.MODES, key=lambda mode: samples(widest, mode))
+
+        for scope in scopes:
+            if all(samples(scope, mode) >= self.min_samples for mode in self.MODES):
+                if random.random() < self.explore_rate:
+                    return least_sampled
+                return self._best(stats[scope])
+
+        return least_sampled
+
+    def _best(self, scope_stats: dict[str, dict]) -> str:
+        def error_rate(row: dict) -> float:
+            return (row["failures"] + row["disagreements"]) / row["samples"]
+
+        best_error = min(error_rate(row) for row in scope_stats.values())
+        candidates = [
+            mode for mode, row in scope_stats.items()
+            if mode in self.MODES and error_rate(row) <= best_error + self.accuracy_tolerance
+        ]
+        return min(candidates, key=lambda mode: scope_stats[mode]["total_latency_ms"] / scope_stats[mode]["samples"])
+
+    async def record(
+        self,
+        problem_id: str,
+        topic_id: Optional[str],
+        mode: str,
+        latency_ms: float,
+        failed: bool = False,
+        disagreed: bool = False
+    ):
+        """Record one fresh (uncached) evaluation made in `mode` (only needed in "auto" mode)."""
+        await run_db(self._record, self._scopes(problem_id, topic_id), mode, latency_ms, failed, disagreed)
+
+    def stats(self) -> dict:
+        return {
+            "default": self.default_mode,
+            "overrides": len(self.overrides),
+            "chosen": dict(self.chosen),
+        }
+
+
+# Singleton instance
+pipeline_mode = PipelineModeSelector()
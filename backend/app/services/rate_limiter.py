@@ -0,0 +1,240 @@
+import os
+import math
+import time
+import asyncio
+from contextlib import asynccontextmanager
+from typing import Optional
+
+import anthropic
+import httpx
+
+
+# Rough token cost of a prepared photo (~1.15 megapixels / 750)
+IMAGE_TOKENS = 1600
+
+
+class RateLimitRejected(Exception):
+    """A model call that can't be made within the allowed wait; retry after `retry_after` seconds."""
+
+    def __init__(self, retry_after: float):
+        self.retry_after = max(1, math.ceil(retry_after))
+        super().__init__(f"Too many submissions right now, please retry in {self.retry_after}s")
+
+
+class TokenBucket:
+    """
+    Continuously refilling bucket holding up to `capacity` units, refilled
+    at `capacity` per minute.
+
+    Reservations may take the level below zero; the deficit is the queue of
+    work already promised, and a new reservation waits until it is repaid.
+    """
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60)
+        self.updated = now
+
+    def wait_time(self, amount: float) -> float:
+        """Seconds until `amount` could be taken, without taking it."""
+        self._refill()
+        return max(0.0, (amount - self.level) * 60 / self.capacity)
+
+    def reserve(self, amount: float) -> float:
+        """Take `amount` now and return how long the caller must wait before using it."""
+        wait = self.wait_time(amount)
+        self.level -= amount
+        return wait
+
+    def refund(self, amount: float):
+        self.level = min(self.capacity, self.level + amount)
+
+    def sync(self, limit: Optional[str], remaining: Optional[str]):
+        """Adopt the limit reported by the API and never assume more room than it reports."""
+        try:
+            if limit is not None and float(limit) > 0:
+                self.capacity = float(limit)
+            if remaining is not None:
+                self._refill()
+                self.level = min(self.level, float(remaining))
+        except ValueError:
+            pass
+
+    def pause(self, seconds: float):
+        """Empty the bucket so nothing is admitted for `seconds`."""
+        self._refill()
+        self.level = min(self.level, -seconds * self.capacity / 60)
+
+
+class RateLimiter:
+    """
+    Process-wide admission control for interactive model calls (vision,
+    evaluation and fused; message batches have their own limits).
+
+    Two token buckets track requests per minute and tokens per minute. A call
+    reserves one request and its estimated input tokens, then waits until both
+    buckets can cover it, so bursts queue briefly here instead of being
+    throttled by the API. The estimate is corrected with the real usage once
+    the response arrives. If the wait would exceed RATE_LIMIT_MAX_WAIT, or
+    RATE_LIMIT_MAX_QUEUE calls are already waiting, the call is rejected at
+    once with `RateLimitRejected` (a 503 with Retry-After for the client).
+
+    Bucket sizes start from RATE_LIMIT_RPM / RATE_LIMIT_TPM and follow the
+    `anthropic-ratelimit-*` headers of every Messages API response; a 429
+    empties both buckets for its `retry-after`.
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("RATE_LIMIT_ENABLED", "1") != "0"
+        self.requests = TokenBucket(float(os.getenv("RATE_LIMIT_RPM", "50")))
+        self.tokens = TokenBucket(float(os.getenv("RATE_LIMIT_TPM", "30000")))
+        self.max_wait = float(os.getenv("RATE_LIMIT_MAX_WAIT", "10"))
+        self.max_queue = int(os.getenv("RATE_LIMIT_MAX_QUEUE", "100"))
+        self.waiting = 0
+        self.counts = {"admitted": 0, "queued": 0, "rejected": 0, "throttled": 0}
+
+    @staticmethod
+    def estimate_tokens(params: dict) -> int:
+        """Input tokens a Messages API request is likely to count for (about 4 characters per token)."""
+        blocks = list(params.get("system") or [])
+        for message in params.get("messages", []):
+            content = message["content"]
+            blocks.extend([content] if isinstance(content, str) else content)
+
+        chars, images = 0, 0
+        for block in blocks:
+            if isinstance(block, str):
+                chars += len(block)
+            elif block.get("type") == "image":
+                images += 1
+            else:
+                chars += len(block.get("text", ""))
+        return chars // 4 + images * IMAGE_TOKENS
+
+    def _wait_time(self, tokens: float) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(tokens))
+
+    def _reject(self, retry_after: float):
+        self.counts["rejected"] += 1
+        raise RateLimitRejected(retry_after)
+
+    def admit(self):
+        """
+        Early check for an incoming submission: raise RateLimitRejected if a
+        model call started now would be rejected anyway.
+        """
+        if not self.enabled:
+            return
+        if self.waiting >= self.max_queue:
+            self._reject(self._wait_time(0))
+        wait = self._wait_time(0)
+        if wait > self.max_wait:
+            self._reject(wait)
+
+    async def acquire(self, tokens: int):
+        """Reserve one request and `tokens` tokens, waiting (boundedly) until they are available."""
+        if self.waiting >= self.max_queue:
+            self._reject(self._wait_time(tokens))
+
+        wait = max(self.requests.reserve(1), self.tokens.reserve(tokens))
+        if wait > self.max_wait:
+            self.requests.refund(1)
+            self.tokens.refund(tokens)
+            self._reject(wait)
+
+        self.counts["admitted"] += 1
+        if wait > 0:
+            self.counts["queued"] += 1
+            self.waiting += 1
+            try:
+                await asyncio.sleep(wait)
+            except asyncio.CancelledError:
+                self.requests.refund(1)
+                self.tokens.refund(tokens)
+                raise
+            finally:
+                self.waiting -= 1
+
+    @asynccontextmanager
+    async def limit(self, params: dict):
+        """
+        Wrap one Messages API call:
+
+            async with rate_limiter.limit(params) as call:
+                message = await client.messages.create(**params)
+                call.settle(message.usage)
+
+        A 429 from the API inside the block is re-raised as RateLimitRejected.
+        """
+        call = _LimitedCall(self, self.estimate_tokens(params) if self.enabled else 0)
+        if self.enabled:
+            await self.acquire(call.estimate)
+        try:
+            yield call
+        except anthropic.RateLimitError as e:
+            if not self.enabled:
+                raise
+            raise RateLimitRejected(_retry_after(e.response.headers) or 1) from e
+
+    async def observe(self, response: httpx.Response):
+        """httpx response hook: adapt the buckets to the API's rate-limit headers."""
+        if not self.enabled or not response.request.url.path.endswith("/v1/messages"):
+            return
+        headers = response.headers
+        self.requests.sync(
+            headers.get("anthropic-ratelimit-requests-limit"),
+            headers.get("anthropic-ratelimit-requests-remaining"),
+        )
+        # "tokens-*" is the most restrictive of the input/output limits when present
+        prefix = "anthropic-ratelimit-tokens" if "anthropic-ratelimit-tokens-limit" in headers else "anthropic-ratelimit-input-tokens"
+        self.tokens.sync(headers.get(f"{prefix}-limit"), headers.get(f"{prefix}-remaining"))
+
+        if response.status_code == 429:
+            self.counts["throttled"] += 1
+            retry_after = _retry_after(headers) or 1
+            print(f"[RateLimit] Throttled by the API, pausing for {retry_after:.1f}s")
+            self.requests.pause(retry_after)
+            self.tokens.pause(retry_after)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "requests_per_minute": self.requests.capacity,
+            "tokens_per_minute": self.tokens.capacity,
+            "waiting": self.waiting,
+            **self.counts,
+        }
+
+
+class _LimitedCall:
+    """Handle for one admitted call; `settle` replaces the token estimate with real usage."""
+
+    def __init__(self, limiter: RateLimiter, estimate: int):
+        self.limiter = limiter
+        self.estimate = estimate
+
+    def settle(self, usage):
+        if not self.limiter.enabled:
+            return
+        # Cache reads don't count towards the input token limit
+        actual = sum(
+            getattr(usage, name, None) or 0
+            for name in ("input_tokens", "cache_creation_input_tokens", "output_tokens")
+        )
+        self.limiter.tokens.refund(self.estimate - actual)
+
+
+def _retry_after(headers) -> Optional[float]:
+    try:
+        return float(headers.get("retry-after"))
+    except (TypeError, ValueError):
+        return None
+
+
+# Singleton instance
+rate_limiter = RateLimiter()
@@ -0,0 +1,209 @@
+import os
+import time
+import random
+import asyncio
+from typing import Awaitable, Callable, Optional, TypeVar
+
+import anthropic
+import httpx
+
+T = TypeVar("T")
+
+
+class UpstreamUnavailable(Exception):
+    """A call that was not made, or abandoned, by the resilience layer. The message is user-facing."""
+
+
+class CircuitOpen(UpstreamUnavailable):
+    def __init__(self, upstream: str, retry_in: float):
+        self.upstream = upstream
+        self.retry_in = retry_in
+        super().__init__("The grading service is temporarily unavailable. Please try again in a moment.")
+
+
+class DeadlineExceeded(UpstreamUnavailable):
+    def __init__(self):
+        super().__init__("Grading took too long. Please try again in a moment.")
+
+
+class Deadline:
+    """Absolute time budget for one submission, shared by every call it makes."""
+
+    def __init__(self, seconds: Optional[float]):
+        self.expires = time.monotonic() + seconds if seconds else None
+
+    def remaining(self) -> Optional[float]:
+        """Seconds left, or None without a deadline."""
+        if self.expires is None:
+            return None
+        return max(0.0, self.expires - time.monotonic())
+
+    def check(self):
+        if self.expires is not None and time.monotonic() >= self.expires:
+            raise DeadlineExceeded()
+
+
+def is_transient(e: Exception) -> bool:
+    """Errors worth retrying: connection problems, timeouts, 408/409 and 5xx (incl. overloaded)."""
+    if isinstance(e, anthropic.APIConnectionError):
+        return True
+    if isinstance(e, anthropic.APIStatusError):
+        return e.status_code in (408, 409) or e.status_code >= 500
+    if isinstance(e, httpx.TransportError):
+        return True
+    if isinstance(e, httpx.HTTPStatusError):
+        return e.response.status_code >= 500
+    return False
+
+
+class CircuitBreaker:
+    """
+    Consecutive-failure circuit breaker for one upstream.
+
+    After `failure_threshold` transient failures in a row the breaker opens
+    and calls fail immediately. After `reset_timeout` seconds one trial call
+    is let through (half-open): success closes the breaker, failure opens it
+    again.
+    """
+
+    def __init__(self, name: str, failure_threshold: int, reset_timeout: float):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.state = "closed"
+        self.failures = 0
+        self.opened_at = 0.0
+        self.trial_running = False
+        self.opened = 0
+
+    def before_call(self):
+        """Raise CircuitOpen unless a call may go out now."""
+        if self.state == "closed":
+            return
+        if self.state == "open":
+            retry_in = self.opened_at + self.reset_timeout - time.monotonic()
+            if retry_in > 0:
+                raise CircuitOpen(self.name, retry_in)
+            self.state = "half_open"
+        if self.trial_running:
+            raise CircuitOpen(self.name, self.reset_timeout)
+        self.trial_running = True
+
+    def record_success(self):
+        if self.state != "closed":
+            print(f"[Breaker] {self.name} closed")
+        self.state = "closed"
+        self.failures = 0
+        self.trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        self.trial_running = False
+        if self.state == "half_open" or self.failures >= self.failure_threshold:
+            if self.state != "open":
+                print(f"[Breaker] {self.name} opened after {self.failures} consecutive failure(s)")
+                self.opened += 1
+            self.state = "open"
+            self.opened_at = time.monotonic()
+
+    def release(self):
+        """The call ended without telling us anything about the upstream's health."""
+        self.trial_running = False
+
+    def stats(self) -> dict:
+        return {"state": self.state, "consecutive_failures": self.failures, "times_opened": self.opened}
+
+
+class Resilience:
+    """
+    Retries, deadlines and circuit breakers for calls to external services
+    (the Anthropic API and Mathpix).
+
+    `call` makes up to RETRY_MAX_ATTEMPTS attempts. Only transient errors
+    are retried, with full-jitter exponential backoff between attempts, and
+    never past the caller's deadline. Each attempt is also cut off at the
+    deadline. Each upstream has one circuit breaker, so an outage costs a
+    handful of timeouts before calls start failing fast with CircuitOpen.
+    """
+
+    def __init__(self):
+        self.max_attempts = max(1, int(os.getenv("RETRY_MAX_ATTEMPTS", "3")))
+        self.base_delay = float(os.getenv("RETRY_BASE_DELAY", "0.5"))
+        self.max_delay = float(os.getenv("RETRY_MAX_DELAY", "8"))
+        self.failure_threshold = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+        self.reset_timeout = float(os.getenv("BREAKER_RESET_TIMEOUT", "30"))
+        self.breakers: dict[str, CircuitBreaker] = {}
+        self.retries = 0
+
+    def breaker(self, upstream: str) -> CircuitBreaker:
+        if upstream not in self.breakers:
+            self.breakers[upstream] = CircuitBreaker(upstream, self.failure_threshold, self.reset_timeout)
+        return self.breakers[upstream]
+
+    def backoff(self, attempt: int) -> float:
+        """Full jitter: uniform in [0, min(max_delay, base_delay * 2^attempt)]."""
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** attempt))
+
+    async def call(
+        self,
+        upstream: str,
+        func: Callable[[], Awaitable[T]],
+        deadline: Optional[Deadline] = None,
+        timeout: Optional[float] = None
+    ) -> T:
+        """
+        Run `func` against `upstream` with retries, the deadline and its
+        circuit breaker. `timeout` is the call's own timeout: an attempt cut
+        off by the deadline counts against the breaker only if it had run
+        that long, since otherwise the budget went on earlier stages.
+        """
+        breaker = self.breaker(upstream)
+        deadline = deadline or Deadline(None)
+
+        for attempt in range(self.max_attempts):
+            deadline.check()
+            breaker.before_call()
+            started = time.monotonic()
+            try:
+                result = await asyncio.wait_for(func(), deadline.remaining())
+            except asyncio.TimeoutError:
+                # Only the deadline times out here; the clients' own timeouts raise their own errors
+                if timeout is not None and time.monotonic() - started >= timeout:
+                    breaker.record_failure()
+                else:
+                    breaker.release()
+                raise DeadlineExceeded()
+            except Exception as e:
+                if not is_transient(e):
+                    # The upstream answered (or was never reached); that says nothing about an outage
+                    if isinstance(e, anthropic.APIStatusError):
+                        breaker.record_success()
+                    else:
+                        breaker.release()
+                    raise
+                breaker.record_failure()
+
+                delay = self.backoff(attempt)
+                remaining = deadline.remaining()
+                if attempt + 1 >= self.max_attempts or (remaining is not None and delay >= remaining):
+                    raise
+                print(f"[Retry] {upstream} attempt {attempt + 1} failed ({type(e).__name__}), retrying in {delay:.2f}s")
+                self.retries += 1
+                await asyncio.sleep(delay)
+                continue
+            except BaseException:
+                breaker.release()
+                raise
+
+            breaker.record_success()
+            return result
+
+    def stats(self) -> dict:
+        return {
+            "retries": self.retries,
+            "breakers": {name: breaker.stats() for name, breaker in self.breakers.items()},
+        }
+
+
+# Singleton instance
+resilience = Resilience()
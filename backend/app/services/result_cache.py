@@ -0,0 +1,210 @@
+import os
+import json
+import time
+import hashlib
+from dataclasses import asdict
+from typing import Optional
+
+from ..database import run_db
+from ..models import Feedback
+from .ocr import VisionResult, ImageInput
+from .evaluator import EvaluationResult
+from .math_text import canonicalize_work
+from .metrics import metrics, PREFIX
+
+
+class SQLiteCache:
+    """
+    Persistent key/value cache stored in a SQLite table.
+
+    Entries expire after a TTL and are evicted least-recently-used once the
+    table grows past its size bound. Hit/miss counts are kept per process.
+    Subclasses choose the table, the key and the payload encoding.
+    """
+
+    TABLE = ""
+    ENV_PREFIX = ""
+
+    def __init__(self):
+        self.enabled = os.getenv(f"{self.ENV_PREFIX}_ENABLED", "1") != "0"
+        self.ttl_seconds = float(os.getenv(f"{self.ENV_PREFIX}_TTL_SECONDS", "86400"))
+        self.max_entries = int(os.getenv(f"{self.ENV_PREFIX}_MAX_ENTRIES", "5000"))
+        self.hits = 0
+        self.misses = 0
+
+    def _get(self, conn, key: str) -> Optional[str]:
+        now = time.time()
+        cursor = conn.cursor()
+        cursor.execute(
+            f"SELECT payload, created_at FROM {self.TABLE} WHERE key = ?",
+            (key,)
+        )
+        row = cursor.fetchone()
+        if not row:
+            return None
+
+        if now - row["created_at"] > self.ttl_seconds:
+            cursor.execute(f"DELETE FROM {self.TABLE} WHERE key = ?", (key,))
+            return None
+
+        cursor.execute(
+            f"UPDATE {self.TABLE} SET last_access = ?, hit_count = hit_count + 1 WHERE key = ?",
+            (now, key)
+        )
+        return row["payload"]
+
+    def _put(self, conn, key: str, problem_id: str, payload: str):
+        now = time.time()
+        cursor = conn.cursor()
+        cursor.execute(f"""
+            INSERT OR REPLACE INTO {self.TABLE}
+                (key, problem_id, payload, created_at, last_access, hit_count)
+            VALUES (?, ?, ?, ?, ?, 0)
+        """, (key, problem_id, payload, now, now))
+
+        # Drop expired entries, then trim least-recently-used beyond the bound
+        cursor.execute(
+            f"DELETE FROM {self.TABLE} WHERE created_at < ?",
+            (now - self.ttl_seconds,)
+        )
+        cursor.execute(f"""
+            DELETE FROM {self.TABLE} WHERE key IN (
+                SELECT key FROM {self.TABLE}
+                ORDER BY last_access DESC
+                LIMIT -1 OFFSET ?
+            )
+        """, (self.max_entries,))
+
+    async def get_payload(self, key: str) -> Optional[str]:
+        """Look up the raw payload for a key, counting the hit or miss."""
+        if not self.enabled:
+            return None
+
+        payload = await run_db(self._get, key)
+        if payload is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return payload
+
+    async def put_payload(self, key: str, problem_id: str, payload: str):
+        if self.enabled:
+            await run_db(self._put, key, problem_id, payload)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {
+            "enabled": self.enabled,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+        }
+
+
+class ResultCache(SQLiteCache):
+    """
+    Content-addressed cache of full pipeline results.
+
+    Keyed by the SHA-256 of the decoded image bytes plus the problem id, so a
+    resubmitted photo skips both the vision and the evaluation call.
+    """
+
+    TABLE = "result_cache"
+    ENV_PREFIX = "RESULT_CACHE"
+
+    def make_key(self, image: ImageInput, problem_id: str) -> str:
+        return f"{hashlib.sha256(image.data).hexdigest()}:{problem_id}"
+
+    async def get(self, key: str) -> Optional[tuple[VisionResult, Optional[EvaluationResult]]]:
+        payload = await self.get_payload(key)
+        if payload is None:
+            return None
+
+        data = json.loads(payload)
+        return VisionResult(**data["vision"]), _load_evaluation(data["evaluation"])
+
+    async def put(
+        self,
+        key: str,
+        problem_id: str,
+        vision_result: VisionResult,
+        eval_result: Optional[EvaluationResult] = None
+    ):
+        """Store results for a key. Transient errors are never cached."""
+        if vision_result.error:
+            return
+        if eval_result is not None and not eval_result.success:
+            return
+
+        payload = json.dumps({
+            "vision": asdict(vision_result),
+            "evaluation": _dump_evaluation(eval_result),
+        })
+        await self.put_payload(key, problem_id, payload)
+
+
+class EvaluationCache(SQLiteCache):
+    """
+    Cache of evaluations keyed by canonicalized student work plus problem id.
+
+    Different photos of the same work usually transcribe to text that only
+    differs in spacing or operator glyphs; after canonicalization they share
+    one entry and one evaluation call.
+    """
+
+    TABLE = "evaluation_cache"
+    ENV_PREFIX = "EVALUATION_CACHE"
+
+    def make_key(self, extracted_text: str, problem_id: str) -> str:
+        canonical = canonicalize_work(extracted_text)
+        return f"{hashlib.sha256(canonical.encode()).hexdigest()}:{problem_id}"
+
+    async def get(self, key: str) -> Optional[EvaluationResult]:
+        payload = await self.get_payload(key)
+        if payload is None:
+            return None
+        return _load_evaluation(json.loads(payload))
+
+    async def put(self, key: str, problem_id: str, eval_result: EvaluationResult):
+        """Store a successful evaluation for a key."""
+        if eval_result.success:
+            await self.put_payload(key, problem_id, json.dumps(_dump_evaluation(eval_result)))
+
+
+def _dump_evaluation(result: Optional[EvaluationResult]) -> Optional[dict]:
+    if result is None:
+        return None
+    return {
+        "success": result.success,
+        "is_correct": result.is_correct,
+        "feedback": result.feedback.model_dump() if result.feedback else None,
+        "error": result.error,
+    }
+
+
+def _load_evaluation(data: Optional[dict]) -> Optional[EvaluationResult]:
+    if data is None:
+        return None
+    feedback = data.get("feedback")
+    return EvaluationResult(
+        success=data["success"],
+        is_correct=data.get("is_correct"),
+        feedback=Feedback(**feedback) if feedback else None,
+        error=data.get("error"),
+    )
+
+
+# Singleton instances
+result_cache = ResultCache()
+evaluation_cache = EvaluationCache()
+
+
+def _collect_cache_metrics():
+    samples = []
+    for name, cache in (("result", result_cache), ("evaluation", evaluation_cache)):
+        samples.append(({"cache": name, "outcome": "hit"}, cache.hits))
+        samples.append(({"cache": name, "outcome": "miss"}, cache.misses))
+    yield f"{PREFIX}_cache_lookups_total", "counter", "Cache lookups by cache and outcome.", samples
+
+
+metrics.add_collector(_collect_cache_metrics)
@@ -0,0 +1,95 @@
+import os
+import time
+import asyncio
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class IdempotencyConflict(Exception):
+    """An idempotency key reused for a different request."""
+
+    def __init__(self, key: str):
+        super().__init__(f"Idempotency-Key {key!r} was already used for a different submission")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls with the same key onto one task.
+
+    The first caller for a key starts `func`; callers arriving while it runs
+    await the same task and get the same result (or exception). The task is
+    shielded from its callers, so it finishes (and stores its result) even if
+    every caller disconnects.
+    """
+
+    def __init__(self):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.counts = {"started": 0, "coalesced": 0}
+
+    async def run(self, key: str, func: Callable[[], Awaitable[T]]) -> T:
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.create_task(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda done: self._forget(key, done))
+            self.counts["started"] += 1
+        else:
+            self.counts["coalesced"] += 1
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # Mark a failure as retrieved even if every caller has gone
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        return {"in_flight": len(self._inflight), **self.counts}
+
+
+class IdempotencyKeys:
+    """
+    Responses of completed requests by client idempotency key, kept for
+    IDEMPOTENCY_TTL seconds (at most IDEMPOTENCY_MAX_KEYS, oldest dropped
+    first) together with a fingerprint of the request they answered.
+    """
+
+    def __init__(self):
+        self.ttl = float(os.getenv("IDEMPOTENCY_TTL", "3600"))
+        self.max_keys = int(os.getenv("IDEMPOTENCY_MAX_KEYS", "10000"))
+        self._entries: OrderedDict[str, tuple[float, str, Any]] = OrderedDict()
+        self.replays = 0
+
+    def lookup(self, key: str, fingerprint: str) -> Optional[Any]:
+        """
+        The stored response for `key`, if any. Raises IdempotencyConflict
+        when the key was used for a different request.
+        """
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires, stored_fingerprint, response = entry
+        if expires < time.monotonic():
+            del self._entries[key]
+            return None
+        if stored_fingerprint != fingerprint:
+            raise IdempotencyConflict(key)
+        self.replays += 1
+        return response
+
+    def put(self, key: str, fingerprint: str, response: Any):
+        self._entries[key] = (time.monotonic() + self.ttl, fingerprint, response)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_keys:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        return {"keys": len(self._entries), "replays": self.replays}
+
+
+# Singleton instances
+single_flight = SingleFlight()
+idempotency_keys = IdempotencyKeys()
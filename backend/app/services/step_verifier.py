@@ -0,0 +1,133 @@
+import os
+import re
+from fractions import Fraction
+from typing import Optional
+
+from ..models import StepAnalysis
+from .exact_math import Linear, MathParseError, parse_line, solve_linear, format_fraction
+from .math_text import normalize_line
+
+# Lead-ins stripped from a question before reading its math ("What is 1/4 + 1/2?")
+_QUESTION_LEAD_RE = re.compile(r"^(what\s+is|find|calculate|compute|evaluate|simplify)\s+", re.IGNORECASE)
+
+
+class _State:
+    """What the previous steps established: a solution or a running value."""
+
+    def __init__(self):
+        self.solution: Optional[Fraction] = None
+        self.variable: Optional[str] = None
+        self.value: Optional[Fraction] = None
+        self.expression: Optional[Linear] = None
+
+
+class StepVerifier:
+    """
+    Labels each line of extracted work as correct, incorrect or unclear.
+
+    Equation lines are compared by their solution with the previous equation
+    (or the one in the question); arithmetic lines must be internally
+    consistent, and a line continuing a calculation ("= 3/4") must keep its
+    value. Anything the exact-arithmetic parser can't read is "unclear".
+    """
+
+    def __init__(self):
+        self.enabled = os.getenv("STEP_VERIFIER_ENABLED", "1") != "0"
+
+    def _seed(self, question: str) -> _State:
+        state = _State()
+        text = _QUESTION_LEAD_RE.sub("", question.strip().rstrip("?"))
+        try:
+            sides = parse_line(text)
+        except MathParseError:
+            return state
+        self._update(state, sides)
+        return state
+
+    @staticmethod
+    def _update(state: _State, sides: list[Linear]):
+        if len(sides) == 2 and not all(side.is_constant for side in sides):
+            solution = solve_linear(*sides)
+            if solution is not None:
+                state.solution = solution
+                state.variable = (sides[0] - sides[1]).var
+        elif all(side.is_constant for side in sides):
+            state.value = sides[-1].const
+        elif len(sides) == 1:
+            state.expression = sides[0]
+
+    def _check_line(self, state: _State, line: str) -> StepAnalysis:
+        try:
+            sides = parse_line(line)
+        except MathParseError:
+            return StepAnalysis(
+                step=line,
+                evaluation="unclear",
+                comment="This line couldn't be checked automatically."
+            )
+
+        continues = normalize_line(line).startswith("=")
+
+        if all(side.is_constant for side in sides):
+            values = [side.const for side in sides]
+            if any(value != values[0] for value in values):
+                evaluation, comment = "incorrect", (
+                    "The sides of this calculation aren't equal: "
+                    + " vs ".join(format_fraction(v) for v in values)
+                )
+            elif (continues or len(sides) == 1) and state.value is not None and values[0] != state.value:
+                evaluation, comment = "incorrect", (
+                    f"This changes the value from {format_fraction(state.value)} "
+                    f"to {format_fraction(values[0])}."
+                )
+            else:
+                evaluation, comment = "correct", "The arithmetic in this step checks out."
+
+        elif len(sides) == 2:
+            solution = solve_linear(*sides)
+            if solution is None:
+                evaluation, comment = "unclear", "This equation doesn't have a single solution."
+            elif state.solution is not None and solution != state.solution:
+                evaluation, comment = "incorrect", (
+                    f"This step changes the solution: before it {state.variable} = "
+                    f"{format_fraction(state.solution)}, after it {state.variable} = "
+                    f"{format_fraction(solution)}."
+                )
+            else:
+                evaluation, comment = "correct", "This step keeps the equation equivalent."
+
+        elif len(sides) == 1 and state.expression is not None:
+            if sides[0] == state.expression:
+                evaluation, comment = "correct", "This expression is equivalent to the previous one."
+            else:
+                evaluation, comment = "incorrect", "This expression isn't equivalent to the previous one."
+
+        else:
+            evaluation, comment = "unclear", "This line couldn't be checked automatically."
+
+        # Judge each transformation against the line before it, so one slip
+        # doesn't mark every following (otherwise correct) step as wrong
+        if evaluation != "unclear":
+            self._update(state, sides)
+        return StepAnalysis(step=line, evaluation=evaluation, comment=comment)
+
+    def verify(self, question: str, extracted_text: Optional[str]) -> list[StepAnalysis]:
+        """Return one StepAnalysis per non-empty line of the student's work."""
+        if not self.enabled or not extracted_text:
+            return []
+
+        state = self._seed(question)
+        return [
+            self._check_line(state, line.strip())
+            for line in extracted_text.splitlines()
+            if line.strip()
+        ]
+
+    @staticmethod
+    def is_informative(steps: list[StepAnalysis]) -> bool:
+        """True when at least one line was actually checked (not all unclear)."""
+        return any(step.evaluation != "unclear" for step in steps)
+
+
+# Singleton instance
+step_verifier = StepVerifier()
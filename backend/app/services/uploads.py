@@ -0,0 +1,133 @@
+import os
+import tempfile
+from dataclasses import dataclass, field
+from typing import Optional
+
+from python_multipart.exceptions import MultipartParseError
+from python_multipart.multipart import MultipartParser, parse_options_header
+from starlette.requests import Request
+
+
+class UploadError(ValueError):
+    """The multipart body is malformed or missing required parts."""
+
+
+class UploadTooLarge(UploadError):
+    """The uploaded file (or the whole body) exceeds the configured limit."""
+
+
+@dataclass
+class MultipartUpload:
+    """Form fields plus the single uploaded file from a multipart request."""
+    fields: dict[str, str] = field(default_factory=dict)
+    file_name: Optional[str] = None
+    file_media_type: Optional[str] = None
+    file_data: Optional[bytes] = None
+
+
+class UploadReader:
+    """
+    Streams a multipart/form-data body into a spooled temp buffer.
+
+    The file part is written chunk by chunk to a SpooledTemporaryFile that
+    stays in memory up to `spool_bytes` and rolls over to disk beyond that,
+    so slow uploads don't pin their whole body in RAM. Reading stops with
+    UploadTooLarge as soon as the file passes `max_bytes`.
+    """
+
+    # Non-file form fields are tiny (problem_id, flags)
+    MAX_FIELD_BYTES = 1024
+
+    def __init__(self):
+        self.max_bytes = int(os.getenv("UPLOAD_MAX_BYTES", str(10 * 1024 * 1024)))
+        self.spool_bytes = int(os.getenv("UPLOAD_SPOOL_BYTES", str(1024 * 1024)))
+
+    async def read(self, request: Request, file_field: str = "image") -> MultipartUpload:
+        content_type, params = parse_options_header(request.headers.get("content-type", ""))
+        if content_type != b"multipart/form-data" or b"boundary" not in params:
+            raise UploadError("Expected a multipart/form-data body")
+
+        # Reject early when the client announces an oversized body
+        content_length = request.headers.get("content-length")
+        if content_length and content_length.isdigit() and int(content_length) > self.max_bytes + 64 * 1024:
+            raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+
+        upload = MultipartUpload()
+        spool = tempfile.SpooledTemporaryFile(max_size=self.spool_bytes)
+        state = {"headers": {}, "header_field": b"", "header_value": b"", "name": None,
+                 "is_file": False, "field": bytearray(), "file_size": 0}
+
+        def on_part_begin():
+            state["headers"] = {}
+            state["field"] = bytearray()
+
+        def on_header_field(data, start, end):
+            state["header_field"] += data[start:end]
+
+        def on_header_value(data, start, end):
+            state["header_value"] += data[start:end]
+
+        def on_header_end():
+            state["headers"][state["header_field"].lower()] = state["header_value"]
+            state["header_field"] = b""
+            state["header_value"] = b""
+
+        def on_headers_finished():
+            _, disposition = parse_options_header(state["headers"].get(b"content-disposition", b""))
+            name = disposition.get(b"name", b"").decode("latin-1")
+            state["name"] = name
+            state["is_file"] = name == file_field
+            if state["is_file"]:
+                filename = disposition.get(b"filename")
+                upload.file_name = filename.decode("utf-8", "replace") if filename else None
+                part_type = state["headers"].get(b"content-type", b"image/jpeg")
+                upload.file_media_type = part_type.decode("latin-1").split(";")[0].strip()
+
+        def on_part_data(data, start, end):
+            chunk = data[start:end]
+            if state["is_file"]:
+                state["file_size"] += len(chunk)
+                if state["file_size"] > self.max_bytes:
+                    raise UploadTooLarge(f"Upload exceeds {self.max_bytes} bytes")
+                spool.write(chunk)
+            else:
+                state["field"] += chunk
+                if len(state["field"]) > self.MAX_FIELD_BYTES:
+                    raise UploadError(f"Form field '{state['name']}' is too large")
+
+        def on_part_end():
+            if not state["is_file"] and state["name"]:
+                upload.fields[state["name"]] = state["field"].decode("utf-8", "replace")
+
+        parser = MultipartParser(params[b"boundary"], {
+            "on_part_begin": on_part_begin,
+            "on_header_field": on_header_field,
+            "on_header_value": on_header_value,
+            "on_header_end": on_header_end,
+            "on_headers_finished": on_headers_finished,
+            "on_part_data": on_part_data,
+            "on_part_end": on_part_end,
+        })
+
+        try:
+            try:
+                async for chunk in request.stream():
+                    parser.write(chunk)
+                parser.finalize()
+            except MultipartParseError as e:
+                raise UploadError(f"Malformed multipart body: {e}") from e
+
+            if state["file_size"] == 0:
+                raise UploadError(f"Missing file field '{file_field}'")
+
+            # One read into a single bytes object that every later stage shares
+            spool.seek(0)
+            upload.file_data = spool.read()
+        finally:
+            spool.close()
+
+        return upload
+
+
+# Singleton instance
+upload_reader = UploadReader()
@@ -0,0 +1,8 @@
+"""
+Load-test and benchmark harness.
+
+Starts the app against a local stub of the Anthropic Messages API
+(`fake_llm`), drives it with fixed-rate traffic (`load`) and saves the
+results as JSON baselines that can be compared between releases. Run it
+from backend/ with `python -m bench --help`.
+"""
@@ -0,0 +1,130 @@
+"""
+Benchmark CLI.
+
+Usage (from backend/):
+    python -m bench run [--duration 30] [--submission-rate 1] [--save PATH] [--compare BASELINE]
+    python -m bench replay CASSETTE [--speed 1] [--save PATH] [--compare BASELINE]
+    python -m bench compare BASELINE CURRENT [--threshold 10]
+    python -m bench stub [--port 8765] [--profile PATH]
+"""
+import sys
+import argparse
+from datetime import datetime
+from pathlib import Path
+
+import uvicorn
+
+from . import baseline
+from .fake_llm import create_app, load_profile
+from .runner import PHASES, git_commit, run_benchmark, run_replay
+
+BASELINE_DIR = Path(__file__).parent / "baselines"
+
+
+def _env_pair(value: str) -> tuple[str, str]:
+    name, sep, setting = value.partition("=")
+    if not sep:
+        raise argparse.ArgumentTypeError(f"expected NAME=VALUE, got {value!r}")
+    return name, setting
+
+
+def _phases(value: str) -> list[str]:
+    phases = [phase.strip() for phase in value.split(",") if phase.strip()]
+    unknown = set(phases) - set(PHASES)
+    if unknown:
+        raise argparse.ArgumentTypeError(f"unknown phase(s): {', '.join(sorted(unknown))}")
+    return phases
+
+
+def _compare(baseline_path: str, current: dict, threshold: float) -> int:
+    table, regressions = baseline.compare(baseline.load(baseline_path), current, threshold)
+    print(table)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s) over {threshold}%:")
+        for regression in regressions:
+            print(f"  {regression}")
+        return 1
+    print("\nNo regressions.")
+    return 0
+
+
+def _add_output_arguments(parser: argparse.ArgumentParser):
+    parser.add_argument("--env", type=_env_pair, action="append", default=[], metavar="NAME=VALUE",
+                        help="Extra environment for the app (repeatable), e.g. PIPELINE_MODE=fused")
+    parser.add_argument("--save", type=Path, help="Baseline file (default: bench/baselines/<timestamp>-<commit>.json)")
+    parser.add_argument("--compare", metavar="BASELINE", help="Compare the results with this baseline")
+    parser.add_argument("--threshold", type=float, default=10, help="Regression threshold in percent")
+
+
+def _finish(result: dict, args: argparse.Namespace) -> int:
+    """Print, save and optionally compare a run's results."""
+    print()
+    print(baseline.report(result))
+
+    path = args.save or BASELINE_DIR / f"{datetime.now():%Y%m%d-%H%M%S}-{git_commit() or 'unknown'}.json"
+    baseline.save(path, result)
+    print(f"\nSaved {path}")
+
+    if args.compare:
+        print()
+        return _compare(args.compare, result, args.threshold)
+    return 0
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(prog="python -m bench", description="Load tests against a fake Anthropic API")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    run = commands.add_parser("run", help="Benchmark the app and save the results as a baseline")
+    run.add_argument("--phases", type=_phases, default=list(PHASES),
+                     help=f"Comma-separated phases to run (default: {','.join(PHASES)})")
+    run.add_argument("--duration", type=float, default=30, help="Measured seconds per phase")
+    run.add_argument("--warmup", type=float, default=5, help="Unmeasured seconds before each phase")
+    run.add_argument("--submission-rate", type=float, default=1, help="POST /api/submissions per second")
+    run.add_argument("--history-rate", type=float, default=20, help="GET /api/submissions per second")
+    run.add_argument("--topics-rate", type=float, default=50, help="GET /api/topics per second")
+    run.add_argument("--arrivals", choices=("constant", "poisson"), default="constant")
+    run.add_argument("--profile", help="Fake API profile (default: bench/profiles/default.json)")
+    run.add_argument("--latency-scale", type=float, default=1.0, help="Multiply every fake API latency")
+    run.add_argument("--prefill", type=int, default=1000, help="Submissions inserted before the first phase")
+    _add_output_arguments(run)
+
+    replay = commands.add_parser("replay", help="Replay traffic recorded with CASSETTE_MODE=record, offline")
+    replay.add_argument("cassette", type=Path, help="Cassette directory (CASSETTE_DIR of the recording)")
+    replay.add_argument("--speed", type=float, default=1.0, help="Replay this many times faster than recorded")
+    replay.add_argument("--limit", type=int, help="Replay only the first N submissions")
+    _add_output_arguments(replay)
+
+    compare = commands.add_parser("compare", help="Compare two saved baselines")
+    compare.add_argument("baseline")
+    compare.add_argument("current")
+    compare.add_argument("--threshold", type=float, default=10, help="Regression threshold in percent")
+
+    stub = commands.add_parser("stub", help="Serve the fake Anthropic API on its own")
+    stub.add_argument("--port", type=int, default=8765)
+    stub.add_argument("--profile")
+    stub.add_argument("--latency-scale", type=float, default=1.0)
+
+    args = parser.parse_args()
+
+    if args.command == "stub":
+        uvicorn.run(create_app(load_profile(args.profile), args.latency_scale),
+                    host="127.0.0.1", port=args.port, log_level="warning")
+        return 0
+
+    if args.command == "compare":
+        return _compare(args.baseline, baseline.load(args.current), args.threshold)
+
+    if args.command == "replay":
+        return _finish(run_replay(args.cassette, args.speed, args.limit, dict(args.env)), args)
+
+    rates = {"submissions": args.submission_rate, "history": args.history_rate, "topics": args.topics_rate}
+    result = run_benchmark(
+        args.phases, rates, args.duration, args.warmup, args.arrivals,
+        args.profile, args.latency_scale, args.prefill, dict(args.env)
+    )
+    return _finish(result, args)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
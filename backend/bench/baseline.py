@@ -0,0 +1,118 @@
+import json
+from pathlib import Path
+from typing import Optional
+
+# Metric -> True when a higher value is better
+METRICS = {
+    "p50_ms": False,
+    "p95_ms": False,
+    "p99_ms": False,
+    "rps": True,
+    "peak_rss_mb": False,
+}
+
+# An error rate this much higher (absolute) than the baseline's is a regression
+ERROR_RATE_TOLERANCE = 0.01
+
+# Stage means must also grow by this much to count as a regression (sub-ms stages are noisy)
+STAGE_MIN_DELTA_MS = 1.0
+
+
+def load(path: str) -> dict:
+    with open(path) as f:
+        return json.load(f)
+
+
+def save(path: Path, result: dict):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(json.dumps(result, indent=2) + "\n")
+
+
+def _rows(result: dict):
+    """(phase, endpoint, summary with the phase's peak RSS) for every endpoint of every phase."""
+    for phase, data in result["phases"].items():
+        for endpoint, summary in data["endpoints"].items():
+            yield phase, endpoint, {**summary, "peak_rss_mb": data["peak_rss_mb"]}
+
+
+def _fmt(value) -> str:
+    if value is None:
+        return "-"
+    return f"{value:.4f}" if isinstance(value, float) and value < 1 else f"{value:g}"
+
+
+def report(result: dict) -> str:
+    header = ("phase", "endpoint", "requests", "ok", "rps", "p50_ms", "p95_ms", "p99_ms", "peak_rss_mb")
+    lines = [header]
+    for phase, endpoint, summary in _rows(result):
+        lines.append((phase, endpoint, *(_fmt(summary[name]) for name in header[2:])))
+    widths = [max(len(str(line[i])) for line in lines) for i in range(len(header))]
+    table = ["  ".join(str(cell).rjust(width) for cell, width in zip(line, widths)) for line in lines]
+
+    for phase, data in result["phases"].items():
+        stages = ", ".join(f"{stage} {_fmt(timing['mean_ms'])}ms" for stage, timing in data.get("stages", {}).items())
+        if stages:
+            table.append(f"{phase} stage means: {stages}")
+        database = data.get("database")
+        if database:
+            table.append(f"{phase} database: {database['submissions']} submissions, "
+                         f"{_fmt(database['bytes_per_submission'])} bytes each")
+    return "\n".join(table)
+
+
+def _change(old: Optional[float], new: Optional[float]) -> Optional[float]:
+    if old is None or new is None:
+        return None
+    if old == 0:
+        return 0.0 if new == 0 else float("inf")
+    return (new - old) / old * 100
+
+
+def compare(baseline: dict, current: dict, threshold: float) -> tuple[str, list[str]]:
+    """
+    Compare per-endpoint results with a baseline. Returns the comparison
+    table and the regressions: latency or peak RSS up, or throughput down,
+    by more than `threshold` percent, or the error rate up by more than
+    ERROR_RATE_TOLERANCE.
+    """
+    old_rows = {(phase, endpoint): summary for phase, endpoint, summary in _rows(baseline)}
+    lines = [f"baseline {baseline.get('git_commit') or '?'} ({baseline['created_at']}) -> "
+             f"current {current.get('git_commit') or '?'} ({current['created_at']})"]
+    regressions = []
+
+    for phase, endpoint, new in _rows(current):
+        old = old_rows.get((phase, endpoint))
+        if old is None:
+            lines.append(f"{phase}/{endpoint}: not in baseline")
+            continue
+        cells = []
+        for name, higher_is_better in METRICS.items():
+            delta = _change(old[name], new[name])
+            cells.append(f"{name} {_fmt(old[name])}->{_fmt(new[name])}" + (f" ({delta:+.1f}%)" if delta is not None else ""))
+            if delta is not None and (-delta if higher_is_better else delta) > threshold:
+                regressions.append(f"{phase}/{endpoint} {name}: {_fmt(old[name])} -> {_fmt(new[name])}")
+        cells.append(f"error_rate {_fmt(old['error_rate'])}->{_fmt(new['error_rate'])}")
+        if new["error_rate"] - old["error_rate"] > ERROR_RATE_TOLERANCE:
+            regressions.append(f"{phase}/{endpoint} error_rate: {_fmt(old['error_rate'])} -> {_fmt(new['error_rate'])}")
+        lines.append(f"{phase}/{endpoint}: " + ", ".join(cells))
+
+    for phase, new_data in current["phases"].items():
+        old_data = baseline["phases"].get(phase, {})
+        for stage, new in new_data.get("stages", {}).items():
+            old = old_data.get("stages", {}).get(stage)
+            if not old or old["mean_ms"] is None or new["mean_ms"] is None:
+                continue
+            delta = _change(old["mean_ms"], new["mean_ms"])
+            lines.append(f"{phase} stage {stage}: mean_ms {_fmt(old['mean_ms'])}->{_fmt(new['mean_ms'])} ({delta:+.1f}%)")
+            if delta > threshold and new["mean_ms"] - old["mean_ms"] >= STAGE_MIN_DELTA_MS:
+                regressions.append(f"{phase} stage {stage} mean_ms: {_fmt(old['mean_ms'])} -> {_fmt(new['mean_ms'])}")
+
+        old_size = (old_data.get("database") or {}).get("bytes_per_submission")
+        new_size = (new_data.get("database") or {}).get("bytes_per_submission")
+        delta = _change(old_size, new_size)
+        if delta is not None:
+            lines.append(f"{phase} database: bytes_per_submission {old_size}->{new_size} ({delta:+.1f}%)")
+            if delta > threshold:
+                regressions.append(f"{phase} database bytes_per_submission: {old_size} -> {new_size}")
+
+    return "\n".join(lines), regressions
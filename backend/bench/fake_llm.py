@@ -0,0 +1,247 @@
+import json
+import time
+import random
+import asyncio
+from collections import Counter, deque
+from pathlib import Path
+from typing import Optional
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, StreamingResponse
+
+DEFAULT_PROFILE = Path(__file__).parent / "profiles" / "default.json"
+
+# Rough token cost of one image, as counted by the app's rate limiter
+IMAGE_TOKENS = 1600
+
+STREAM_CHUNK_CHARS = 40
+
+ERROR_TYPES = {429: "rate_limit_error", 500: "api_error", 529: "overloaded_error"}
+
+
+def load_profile(path: Optional[str] = None) -> dict:
+    with open(path or DEFAULT_PROFILE) as f:
+        return json.load(f)
+
+
+class LatencyDistribution:
+    """
+    Seconds to wait before answering, sampled from a profile entry such as
+    {"dist": "lognormal", "median": 2.5, "sigma": 0.4}. Supported
+    distributions: fixed (seconds), uniform (low, high), normal (mean,
+    stddev) and lognormal (median, sigma). Samples are multiplied by `scale`.
+    """
+
+    def __init__(self, spec: dict, scale: float = 1.0):
+        self.spec = spec
+        self.scale = scale
+        if spec.get("dist", "fixed") not in ("fixed", "uniform", "normal", "lognormal"):
+            raise ValueError(f"Unknown latency distribution: {spec.get('dist')!r}")
+
+    def sample(self) -> float:
+        spec = self.spec
+        dist = spec.get("dist", "fixed")
+        if dist == "fixed":
+            value = spec.get("seconds", 0)
+        elif dist == "uniform":
+            value = random.uniform(spec["low"], spec["high"])
+        elif dist == "normal":
+            value = random.gauss(spec["mean"], spec["stddev"])
+        else:
+            value = random.lognormvariate(0, spec["sigma"]) * spec["median"]
+        return max(0.0, value * self.scale)
+
+
+class FakeLLM:
+    """
+    Stand-in for the Anthropic Messages API (`POST /v1/messages`, plain and
+    streamed) with the latencies, error rate and rate limits of a profile.
+
+    Calls are told apart the way the app makes them: an image with the
+    evaluation schema in the system prompt is a fused call, any other image
+    a vision call, and text only an evaluation. Answers are the profile's
+    canned JSON with {a}, {b}, {c}, {d} and {x} filled in from a random
+    linear equation (a·x + b = c, a·x = d), so transcriptions differ between
+    calls the way real ones do and don't all hit the evaluation cache.
+    """
+
+    KINDS = ("vision", "evaluation", "fused")
+
+    def __init__(self, profile: dict, latency_scale: float = 1.0):
+        self.profile = profile
+        self.latency = {
+            kind: LatencyDistribution(profile["latency"][kind], latency_scale)
+            for kind in self.KINDS
+        }
+        self.error_latency = LatencyDistribution(profile.get("error_latency", {"seconds": 0.2}), latency_scale)
+        self.error_rate = float(profile.get("error_rate", 0))
+        self.error_status = int(profile.get("error_status", 529))
+        self.unreadable_rate = float(profile.get("unreadable_rate", 0))
+        self.first_token_share = float(profile.get("stream_first_token_share", 0.3))
+        limits = profile.get("rate_limits", {})
+        self.requests_per_minute = int(limits.get("requests_per_minute", 4000))
+        self.tokens_per_minute = int(limits.get("tokens_per_minute", 4000000))
+        self.responses = profile["responses"]
+        # (time, tokens) of accepted calls in the last minute
+        self.window: deque[tuple[float, int]] = deque()
+        self.counts = Counter()
+
+    def classify(self, body: dict) -> str:
+        content = body["messages"][0]["content"]
+        has_image = isinstance(content, list) and any(block.get("type") == "image" for block in content)
+        if not has_image:
+            return "evaluation"
+        return "fused" if "is_correct" in json.dumps(body.get("system") or "") else "vision"
+
+    @staticmethod
+    def input_tokens(body: dict) -> int:
+        chars, images = len(json.dumps(body.get("system") or "")), 0
+        for message in body["messages"]:
+            content = message["content"]
+            for block in [content] if isinstance(content, str) else content:
+                if isinstance(block, str):
+                    chars += len(block)
+                elif block.get("type") == "image":
+                    images += 1
+                else:
+                    chars += len(block.get("text", ""))
+        return chars // 4 + images * IMAGE_TOKENS
+
+    def answer(self, kind: str) -> dict:
+        equation = self._equation()
+        readable = _fill(random.choice(self.responses["readable"]), equation)
+        if kind != "evaluation" and random.random() < self.unreadable_rate:
+            return random.choice(self.responses["unreadable"])
+        if kind == "vision":
+            return readable
+        feedback = _fill(random.choice(self.responses["feedback"]), equation)
+        return {**readable, **feedback} if kind == "fused" else feedback
+
+    @staticmethod
+    def _equation() -> dict:
+        a, b, x = random.randint(2, 9), random.randint(1, 20), random.randint(-5, 12)
+        return {"a": a, "b": b, "x": x, "c": a * x + b, "d": a * x}
+
+    def _prune(self, now: float):
+        while self.window and now - self.window[0][0] > 60:
+            self.window.popleft()
+
+    def rate_limit_headers(self) -> dict:
+        self._prune(time.monotonic())
+        tokens = sum(count for _, count in self.window)
+        return {
+            "anthropic-ratelimit-requests-limit": str(self.requests_per_minute),
+            "anthropic-ratelimit-requests-remaining": str(max(0, self.requests_per_minute - len(self.window))),
+            "anthropic-ratelimit-input-tokens-limit": str(self.tokens_per_minute),
+            "anthropic-ratelimit-input-tokens-remaining": str(max(0, self.tokens_per_minute - tokens)),
+        }
+
+    def error(self, status: int, message: str, headers: Optional[dict] = None) -> JSONResponse:
+        self.counts[f"status_{status}"] += 1
+        return JSONResponse(
+            {"type": "error", "error": {"type": ERROR_TYPES.get(status, "api_error"), "message": message}},
+            status_code=status,
+            headers={**self.rate_limit_headers(), **(headers or {})},
+        )
+
+    async def messages(self, request: Request):
+        body = await request.json()
+        kind = self.classify(body)
+        self.counts[kind] += 1
+        now = time.monotonic()
+        self._prune(now)
+
+        tokens = self.input_tokens(body)
+        if len(self.window) >= self.requests_per_minute or \
+                sum(count for _, count in self.window) + tokens > self.tokens_per_minute:
+            retry_after = max(1, int(60 - (now - self.window[0][0]))) if self.window else 1
+            return self.error(429, "Rate limit exceeded", {"retry-after": str(retry_after)})
+        if random.random() < self.error_rate:
+            await asyncio.sleep(self.error_latency.sample())
+            return self.error(self.error_status, "Simulated upstream error")
+        self.window.append((now, tokens))
+
+        text = json.dumps(self.answer(kind), indent=1)
+        usage = {
+            "input_tokens": tokens,
+            "output_tokens": len(text) // 4,
+            "cache_creation_input_tokens": 0,
+            "cache_read_input_tokens": 0,
+        }
+        message = {
+            "id": f"msg_bench_{sum(self.counts.values())}",
+            "type": "message",
+            "role": "assistant",
+            "model": body["model"],
+            "content": [],
+            "stop_reason": None,
+            "stop_sequence": None,
+            "usage": usage,
+        }
+        latency = self.latency[kind].sample()
+        headers = self.rate_limit_headers()
+
+        if body.get("stream"):
+            self.counts["streamed"] += 1
+            return StreamingResponse(
+                self._stream(message, text, latency),
+                media_type="text/event-stream",
+                headers=headers,
+            )
+
+        await asyncio.sleep(latency)
+        self.counts["status_200"] += 1
+        message.update(content=[{"type": "text", "text": text}], stop_reason="end_turn")
+        return JSONResponse(message, headers=headers)
+
+    async def _stream(self, message: dict, text: str, latency: float):
+        """Server-sent events: the first token after a share of `latency`, the rest spread over the remainder."""
+        chunks = [text[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(text), STREAM_CHUNK_CHARS)]
+        first = latency * self.first_token_share
+        between = (latency - first) / max(1, len(chunks) - 1)
+
+        await asyncio.sleep(first)
+        yield _sse("message_start", {"type": "message_start", "message": message})
+        yield _sse("content_block_start", {
+            "type": "content_block_start", "index": 0, "content_block": {"type": "text", "text": ""}
+        })
+        for i, chunk in enumerate(chunks):
+            if i:
+                await asyncio.sleep(between)
+            yield _sse("content_block_delta", {
+                "type": "content_block_delta", "index": 0, "delta": {"type": "text_delta", "text": chunk}
+            })
+        yield _sse("content_block_stop", {"type": "content_block_stop", "index": 0})
+        yield _sse("message_delta", {
+            "type": "message_delta",
+            "delta": {"stop_reason": "end_turn", "stop_sequence": None},
+            "usage": {"output_tokens": message["usage"]["output_tokens"]},
+        })
+        yield _sse("message_stop", {"type": "message_stop"})
+        self.counts["status_200"] += 1
+
+    def stats(self) -> dict:
+        return dict(self.counts)
+
+
+def _fill(value, fields: dict):
+    """`value` with {field} placeholders in its strings replaced."""
+    if isinstance(value, str):
+        return value.format_map(fields)
+    if isinstance(value, list):
+        return [_fill(item, fields) for item in value]
+    if isinstance(value, dict):
+        return {key: _fill(item, fields) for key, item in value.items()}
+    return value
+
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+
+def create_app(profile: dict, latency_scale: float = 1.0) -> FastAPI:
+    fake = FakeLLM(profile, latency_scale)
+    app = FastAPI(title="Fake Anthropic API")
+    app.add_api_route("/v1/messages", fake.messages, methods=["POST"])
+    app.add_api_route("/stats", fake.stats, methods=["GET"])
+    return app
@@ -0,0 +1,299 @@
+import io
+import math
+import time
+import base64
+import random
+import asyncio
+from dataclasses import dataclass, field
+from typing import Callable, Optional
+
+import httpx
+from PIL import Image, ImageDraw, ImageFont
+
+
+def percentile(ordered: list[float], q: float) -> Optional[float]:
+    """Linearly interpolated q-th percentile (0-100) of an already sorted list."""
+    if not ordered:
+        return None
+    position = (len(ordered) - 1) * q / 100
+    low, high = math.floor(position), math.ceil(position)
+    return ordered[low] + (ordered[high] - ordered[low]) * (position - low)
+
+
+@dataclass
+class EndpointStats:
+    """Latencies (seconds) and outcomes of the requests sent to one endpoint during a phase."""
+
+    name: str
+    rate: float
+    latencies: list[float] = field(default_factory=list)
+    statuses: dict[str, int] = field(default_factory=dict)
+
+    def record(self, latency: float, status: str):
+        self.statuses[status] = self.statuses.get(status, 0) + 1
+        if status.startswith("2"):
+            self.latencies.append(latency)
+
+    def summary(self, elapsed: float) -> dict:
+        ordered = sorted(self.latencies)
+        total = sum(self.statuses.values())
+
+        def ms(value):
+            return round(value * 1000, 1) if value is not None else None
+
+        return {
+            "target_rps": self.rate,
+            "requests": total,
+            "ok": len(ordered),
+            "error_rate": round(1 - len(ordered) / total, 4) if total else 0.0,
+            "rps": round(len(ordered) / elapsed, 2) if elapsed else 0.0,
+            "p50_ms": ms(percentile(ordered, 50)),
+            "p95_ms": ms(percentile(ordered, 95)),
+            "p99_ms": ms(percentile(ordered, 99)),
+            "mean_ms": ms(sum(ordered) / len(ordered)) if ordered else None,
+            "max_ms": ms(ordered[-1]) if ordered else None,
+            "statuses": dict(sorted(self.statuses.items())),
+        }
+
+
+# One request: (method, path, keyword arguments for httpx)
+RequestFactory = Callable[[], tuple[str, str, dict]]
+
+
+async def drive(
+    client: httpx.AsyncClient,
+    make_request: RequestFactory,
+    stats: EndpointStats,
+    duration: float,
+    arrivals: str = "constant",
+    record: bool = True
+):
+    """
+    Open-loop traffic: send `stats.rate` requests per second for `duration`
+    seconds, whether or not earlier ones have finished.
+
+    Arrivals are evenly spaced ("constant") or exponentially distributed
+    ("poisson"). Latency is measured from each request's scheduled send
+    time, so a server that falls behind is charged for the queueing it
+    causes instead of slowing the load down (no coordinated omission).
+    """
+    loop = asyncio.get_running_loop()
+    started = loop.time()
+    scheduled = started
+    in_flight: set[asyncio.Task] = set()
+
+    while True:
+        scheduled += random.expovariate(stats.rate) if arrivals == "poisson" else 1 / stats.rate
+        if scheduled - started >= duration:
+            break
+        delay = scheduled - loop.time()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        task = asyncio.create_task(_send(client, make_request(), stats if record else None, scheduled))
+        in_flight.add(task)
+        task.add_done_callback(in_flight.discard)
+
+    if in_flight:
+        await asyncio.wait(in_flight)
+
+
+async def _send(client: httpx.AsyncClient, request: tuple[str, str, dict], stats: Optional[EndpointStats], at: float):
+    """Send one request (reading the whole response) and record its latency from `at`."""
+    method, path, kwargs = request
+    try:
+        response = await client.request(method, path, **kwargs)
+        status = str(response.status_code)
+    except httpx.HTTPError as e:
+        status = type(e).__name__
+    if stats is not None:
+        stats.record(asyncio.get_running_loop().time() - at, status)
+
+
+def read_rss_bytes(pid: int) -> Optional[int]:
+    """Current resident set size of `pid` (Linux /proc), or None where unavailable."""
+    try:
+        with open(f"/proc/{pid}/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+class RSSSampler:
+    """Polls a process's RSS in the background and keeps the peak."""
+
+    def __init__(self, pid: int, interval: float = 0.05):
+        self.pid = pid
+        self.interval = interval
+        self.peak: Optional[int] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def _run(self):
+        while True:
+            rss = read_rss_bytes(self.pid)
+            if rss is not None:
+                self.peak = max(self.peak or 0, rss)
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        self.peak = read_rss_bytes(self.pid)
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> Optional[float]:
+        """Stop sampling and return the peak in MiB."""
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        return round(self.peak / 2 ** 20, 1) if self.peak is not None else None
+
+
+def make_photo(seed: int, size: tuple[int, int] = (1600, 1200)) -> bytes:
+    """
+    A JPEG that looks enough like a photo of handwritten work to pass the
+    app's local quality pre-check: dark strokes on an off-white page with
+    some noise. Every seed gives different bytes, so each submission misses
+    the result cache.
+    """
+    rng = random.Random(seed)
+    width, height = size
+    image = Image.new("L", size, 228)
+    draw = ImageDraw.Draw(image)
+    try:
+        font = ImageFont.load_default(size=72)
+    except TypeError:
+        font = ImageFont.load_default()
+
+    a, b, x = rng.randint(2, 9), rng.randint(1, 20), rng.randint(-5, 12)
+    lines = [f"{a}x + {b} = {a * x + b}", f"{a}x = {a * x}", f"x = {x}"]
+    for i, line in enumerate(lines):
+        top = 150 + i * 250 + rng.randint(-20, 20)
+        draw.text((200 + rng.randint(-30, 30), top), line, fill=30, font=font)
+        draw.line([(180, top + 110), (1300, top + 110 + rng.randint(-15, 15))], fill=140, width=2)
+    for _ in range(400):
+        px, py = rng.randrange(width), rng.randrange(height)
+        draw.point((px, py), fill=rng.randint(150, 210))
+
+    buffer = io.BytesIO()
+    image.convert("RGB").save(buffer, format="JPEG", quality=85)
+    return buffer.getvalue()
+
+
+def photo_data_uri(seed: int) -> str:
+    return "data:image/jpeg;base64," + base64.b64encode(make_photo(seed)).decode()
+
+
+class Workload:
+    """
+    The request mix of the benchmark: submissions of freshly generated
+    photos, history pages and the topic list.
+    """
+
+    ENDPOINTS = ("submissions", "history", "topics")
+
+    def __init__(self, problem_ids: list[str], history_limit: int = 10, seed: int = 0):
+        self.problem_ids = problem_ids
+        self.history_limit = history_limit
+        self.rng = random.Random(seed)
+        self.photos: list[str] = []
+
+    def prepare_photos(self, count: int):
+        """Generate the photos up front so encoding them doesn't skew the arrival rate."""
+        self.photos.extend(photo_data_uri(self.rng.randrange(2 ** 31)) for _ in range(count))
+
+    def submissions(self) -> tuple[str, str, dict]:
+        image = self.photos.pop() if self.photos else photo_data_uri(self.rng.randrange(2 ** 31))
+        body = {"problem_id": self.rng.choice(self.problem_ids), "image_data": image}
+        return "POST", "/api/submissions", {"json": body}
+
+    def history(self) -> tuple[str, str, dict]:
+        return "GET", "/api/submissions", {"params": {"limit": self.history_limit}}
+
+    def topics(self) -> tuple[str, str, dict]:
+        return "GET", "/api/topics", {}
+
+    def factory(self, endpoint: str) -> RequestFactory:
+        return getattr(self, endpoint)
+
+
+async def run_phase(
+    base_url: str,
+    pid: int,
+    workload: Workload,
+    rates: dict[str, float],
+    duration: float,
+    warmup: float = 0.0,
+    arrivals: str = "constant"
+) -> dict:
+    """
+    Drive each endpoint in `rates` concurrently at its rate and report
+    per-endpoint latencies plus the app's peak RSS while the load ran.
+    A warm-up period at the same rates runs first and isn't recorded.
+    """
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        if "submissions" in rates:
+            workload.prepare_photos(math.ceil(rates["submissions"] * (duration + warmup) * 1.1) + 5)
+
+        if warmup:
+            scratch = {name: EndpointStats(name, rate) for name, rate in rates.items()}
+            await asyncio.gather(*(
+                drive(client, workload.factory(name), scratch[name], warmup, arrivals, record=False)
+                for name in rates
+            ))
+
+        stats = {name: EndpointStats(name, rate) for name, rate in rates.items()}
+        sampler = RSSSampler(pid)
+        sampler.start()
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            drive(client, workload.factory(name), stats[name], duration, arrivals)
+            for name in rates
+        ))
+        elapsed = time.perf_counter() - started
+        peak_rss = await sampler.stop()
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "peak_rss_mb": peak_rss,
+        "endpoints": {name: endpoint.summary(elapsed) for name, endpoint in stats.items()},
+    }
+
+
+async def run_trace(base_url: str, pid: int, schedule: list[tuple[float, str, RequestFactory]]) -> dict:
+    """
+    Replay recorded traffic: each (offset, endpoint, request) is sent
+    `offset` seconds after the start, however the earlier ones are doing.
+    Reports the same per-endpoint figures as `run_phase`.
+    """
+    duration = max((offset for offset, _, _ in schedule), default=0) or 1
+    counts: dict[str, int] = {}
+    for _, endpoint, _ in schedule:
+        counts[endpoint] = counts.get(endpoint, 0) + 1
+    stats = {name: EndpointStats(name, round(count / duration, 3)) for name, count in counts.items()}
+
+    limits = httpx.Limits(max_connections=None, max_keepalive_connections=200)
+    async with httpx.AsyncClient(base_url=base_url, timeout=300, limits=limits) as client:
+        loop = asyncio.get_running_loop()
+        sampler = RSSSampler(pid)
+        sampler.start()
+        started = loop.time()
+        in_flight = []
+        for offset, endpoint, make_request in schedule:
+            delay = started + offset - loop.time()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            in_flight.append(asyncio.create_task(_send(client, make_request(), stats[endpoint], started + offset)))
+        if in_flight:
+            await asyncio.wait(in_flight)
+        elapsed = loop.time() - started
+        peak_rss = await sampler.stop()
+
+    return {
+        "elapsed_s": round(elapsed, 2),
+        "peak_rss_mb": peak_rss,
+        "endpoints": {name: endpoint.summary(elapsed) for name, endpoint in stats.items()},
+    }
@@ -0,0 +1,363 @@
+import os
+import sys
+import json
+import base64
+import time
+import random
+import socket
+import sqlite3
+import asyncio
+import platform
+import subprocess
+import tempfile
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from app.database import feedback_columns
+
+from .fake_llm import FakeLLM, load_profile
+from .load import RequestFactory, Workload, run_phase, run_trace
+
+BACKEND_DIR = Path(__file__).parent.parent
+
+PHASES = ("submissions", "history", "topics", "mixed")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_ready(url: str, process: subprocess.Popen, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"{' '.join(process.args)} exited with status {process.returncode}")
+        try:
+            if httpx.get(url, timeout=1).status_code < 500:
+                return
+        except httpx.HTTPError:
+            pass
+        time.sleep(0.1)
+    raise RuntimeError(f"{url} not ready after {timeout}s")
+
+
+class Services:
+    """
+    The app under test, and the fake Anthropic API when one is used, each
+    in its own process so the app's RSS is measured alone. The app gets a
+    throwaway database in `workdir`.
+    """
+
+    def __init__(self, workdir: Path, app_env: dict[str, str]):
+        self.workdir = workdir
+        self.app_env = app_env
+        self.fake: Optional[subprocess.Popen] = None
+        self.fake_url = ""
+        self.app: Optional[subprocess.Popen] = None
+        self.app_url = ""
+
+    @property
+    def database_path(self) -> Path:
+        return self.workdir / "bench.db"
+
+    def _spawn(self, name: str, args: list[str], env: dict) -> subprocess.Popen:
+        log = open(self.workdir / f"{name}.log", "ab")
+        return subprocess.Popen(
+            [sys.executable, *args], cwd=BACKEND_DIR, env=env, stdout=log, stderr=subprocess.STDOUT
+        )
+
+    def start_fake(self, profile_path: Optional[str], latency_scale: float):
+        port = free_port()
+        args = ["-m", "bench", "stub", "--port", str(port), "--latency-scale", str(latency_scale)]
+        if profile_path:
+            args += ["--profile", profile_path]
+        self.fake = self._spawn("fake_llm", args, os.environ.copy())
+        self.fake_url = f"http://127.0.0.1:{port}"
+        wait_ready(f"{self.fake_url}/stats", self.fake)
+
+    def start_app(self, env: Optional[dict[str, str]] = None):
+        """Start the app against the fake API (or, without one, an address nothing listens on)."""
+        port = free_port()
+        env = {
+            **os.environ,
+            "ANTHROPIC_API_KEY": "bench",
+            "ANTHROPIC_BASE_URL": self.fake_url or "http://127.0.0.1:9",
+            "DATABASE_PATH": str(self.database_path),
+            # Keep Mathpix credentials from .env out of the run
+            "MATHPIX_APP_ID": "",
+            "MATHPIX_APP_KEY": "",
+            **(env or {}),
+            **self.app_env,
+        }
+        self.app = self._spawn(
+            "app",
+            ["-m", "uvicorn", "app.main:app", "--host", "127.0.0.1", "--port", str(port),
+             "--log-level", "warning", "--no-access-log"],
+            env,
+        )
+        self.app_url = f"http://127.0.0.1:{port}"
+        wait_ready(f"{self.app_url}/health", self.app)
+
+    def app_report(self) -> dict:
+        """Per-stage timings from the app's /metrics and the size of its database."""
+        return {
+            "stages": stage_timings(httpx.get(f"{self.app_url}/metrics").text),
+            "database": database_stats(self.database_path),
+        }
+
+    def stop_app(self):
+        _stop(self.app)
+        self.app = None
+
+    def fake_stats(self) -> dict:
+        return httpx.get(f"{self.fake_url}/stats").json()
+
+    def dump_logs(self):
+        for name in ("app", "fake_llm"):
+            log = self.workdir / f"{name}.log"
+            if log.exists():
+                print(f"--- {name}.log ---\n{log.read_text()[-4000:]}", file=sys.stderr)
+
+    def close(self):
+        _stop(self.app)
+        _stop(self.fake)
+
+
+def _stop(process: Optional[subprocess.Popen]):
+    if process is None or process.poll() is not None:
+        return
+    process.terminate()
+    try:
+        process.wait(timeout=10)
+    except subprocess.TimeoutExpired:
+        process.kill()
+        process.wait()
+
+
+def prefill_history(database_path: Path, profile: dict, count: int):
+    """Insert `count` graded submissions, spread over the past days, so history pages have rows to read."""
+    fake = FakeLLM(profile)
+    conn = sqlite3.connect(database_path)
+    with conn:
+        problem_ids = [row[0] for row in conn.execute("SELECT id FROM problems")]
+        rows = []
+        for i in range(count):
+            vision, feedback = fake.answer("vision"), fake.answer("evaluation")
+            rows.append((
+                random.choice(problem_ids),
+                "data:image/jpeg;base64,/9j/4AAQSkZJRg...",
+                vision.get("extracted_text"),
+                feedback["is_correct"],
+                json.dumps(feedback),
+                *feedback_columns(feedback),
+                f"-{count - i} minutes",
+            ))
+        conn.executemany("""
+            INSERT INTO submissions (
+                problem_id, image_data, extracted_text, is_correct, feedback,
+                feedback_summary, step_count, error_step_count, created_at
+            )
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?, datetime('now', ?))
+        """, rows)
+    conn.close()
+
+
+def stage_timings(exposition: str) -> dict:
+    """{stage: {"count", "mean_ms"}} from the stage latency histogram in a /metrics scrape."""
+    sums, counts = {}, {}
+    for line in exposition.splitlines():
+        for suffix, values in (("_sum", sums), ("_count", counts)):
+            prefix = f"math_feedback_stage_seconds{suffix}{{stage=\""
+            if line.startswith(prefix):
+                stage, _, value = line[len(prefix):].partition("\"} ")
+                values[stage] = float(value)
+    return {
+        stage: {"count": int(count), "mean_ms": round(sums.get(stage, 0) / count * 1000, 2) if count else None}
+        for stage, count in sorted(counts.items())
+    }
+
+
+def database_stats(database_path: Path) -> dict:
+    conn = sqlite3.connect(database_path)
+    try:
+        rows = conn.execute("SELECT COUNT(*) FROM submissions").fetchone()[0]
+    finally:
+        conn.close()
+    size = sum(
+        path.stat().st_size
+        for path in (database_path, Path(f"{database_path}-wal"))
+        if path.exists()
+    )
+    return {"submissions": rows, "bytes": size, "bytes_per_submission": round(size / rows) if rows else None}
+
+
+def fetch_problem_ids(base_url: str) -> list[str]:
+    topics = httpx.get(f"{base_url}/api/topics").json()["topics"]
+    return [
+        problem["id"]
+        for topic in topics
+        for problem in httpx.get(f"{base_url}/api/topics/{topic['id']}/problems").json()["problems"]
+    ]
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BACKEND_DIR, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmark(
+    phases: list[str],
+    rates: dict[str, float],
+    duration: float,
+    warmup: float,
+    arrivals: str,
+    profile_path: Optional[str],
+    latency_scale: float,
+    prefill: int,
+    app_env: dict[str, str]
+) -> dict:
+    """
+    Run each phase against a freshly started app (sharing one database) and
+    return the results in baseline form.
+
+    The single-endpoint phases attribute peak RSS to one endpoint; "mixed"
+    runs all three endpoints at once.
+    """
+    profile = load_profile(profile_path)
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "duration_s": duration,
+            "warmup_s": warmup,
+            "arrivals": arrivals,
+            "rates": rates,
+            "profile": profile.get("description", profile_path),
+            "latency_scale": latency_scale,
+            "prefill": prefill,
+            "app_env": app_env,
+        },
+        "phases": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="math-feedback-bench-") as workdir:
+        services = Services(Path(workdir), app_env)
+        try:
+            services.start_fake(profile_path, latency_scale)
+            for i, phase in enumerate(phases):
+                services.start_app()
+                if i == 0:
+                    prefill_history(services.database_path, profile, prefill)
+                    workload = Workload(fetch_problem_ids(services.app_url))
+                phase_rates = {
+                    name: rate for name, rate in rates.items()
+                    if rate > 0 and phase in (name, "mixed")
+                }
+                if not phase_rates:
+                    services.stop_app()
+                    continue
+                print(f"[Bench] {phase}: {', '.join(f'{name} {rate}/s' for name, rate in phase_rates.items())} "
+                      f"for {duration}s (+{warmup}s warm-up)")
+                result["phases"][phase] = asyncio.run(run_phase(
+                    services.app_url, services.app.pid, workload, phase_rates, duration, warmup, arrivals
+                ))
+                result["phases"][phase].update(services.app_report())
+                services.stop_app()
+            result["upstream"] = services.fake_stats()
+        except Exception:
+            services.dump_logs()
+            raise
+        finally:
+            services.close()
+
+    return result
+
+
+def load_trace(cassette_dir: Path, speed: float, limit: Optional[int]) -> list[tuple[float, str, RequestFactory]]:
+    """The submissions recorded in a cassette's traffic.jsonl, as a replay schedule."""
+    with open(cassette_dir / "traffic.jsonl") as f:
+        arrivals = sorted((json.loads(line) for line in f), key=lambda arrival: arrival["at"])
+    arrivals = arrivals[:limit] if limit else arrivals
+    if not arrivals:
+        return []
+    first = arrivals[0]["at"]
+
+    def factory(arrival: dict) -> RequestFactory:
+        def make_request():
+            data = (cassette_dir / "blobs" / arrival["image"]).read_bytes()
+            if arrival["endpoint"] == "upload":
+                form = {"problem_id": arrival["problem_id"]}
+                if arrival["fast_verdict"] is not None:
+                    form["fast_verdict"] = str(arrival["fast_verdict"]).lower()
+                return "POST", "/api/submissions/upload", {
+                    "data": form, "files": {"image": ("photo", data, arrival["media_type"])}
+                }
+            body = {
+                "problem_id": arrival["problem_id"],
+                "image_data": f"data:{arrival['media_type']};base64,{base64.b64encode(data).decode()}",
+                "fast_verdict": arrival["fast_verdict"],
+            }
+            path = "/api/submissions/stream" if arrival["endpoint"] == "stream" else "/api/submissions"
+            return "POST", path, {"json": body}
+        return make_request
+
+    return [((arrival["at"] - first) / speed, arrival["endpoint"], factory(arrival)) for arrival in arrivals]
+
+
+def run_replay(cassette_dir: Path, speed: float, limit: Optional[int], app_env: dict[str, str]) -> dict:
+    """
+    Replay a recorded cassette against the current build with no network:
+    the app answers model calls from the cassette (CASSETTE_MODE=replay) and
+    the recorded submissions are re-sent at their original pace / `speed`.
+    The model-call rate limiter is off unless `app_env` turns it back on,
+    since the recorded traffic already went through the real limits.
+    """
+    schedule = load_trace(cassette_dir, speed, limit)
+    if not schedule:
+        raise RuntimeError(f"No recorded submissions in {cassette_dir / 'traffic.jsonl'}")
+    result = {
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "git_commit": git_commit(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "config": {
+            "cassette": str(cassette_dir),
+            "speed": speed,
+            "submissions": len(schedule),
+            "app_env": app_env,
+        },
+        "phases": {},
+    }
+
+    with tempfile.TemporaryDirectory(prefix="math-feedback-replay-") as workdir:
+        services = Services(Path(workdir), app_env)
+        try:
+            services.start_app({
+                "CASSETTE_MODE": "replay",
+                "CASSETTE_DIR": str(cassette_dir.resolve()),
+                "RATE_LIMIT_ENABLED": "0",
+            })
+            print(f"[Bench] replay: {len(schedule)} submissions over {schedule[-1][0]:.0f}s")
+            result["phases"]["replay"] = asyncio.run(run_trace(services.app_url, services.app.pid, schedule))
+            result["phases"]["replay"].update(services.app_report())
+            result["cassette"] = httpx.get(f"{services.app_url}/health").json()["cassette"]
+        except Exception:
+            services.dump_logs()
+            raise
+        finally:
+            services.close()
+
+    if result["cassette"]["misses"]:
+        print(f"[Bench] {result['cassette']['misses']} model call(s) had no recording and failed")
+    return result
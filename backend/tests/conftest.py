@@ -0,0 +1,15 @@
+import os
+import tempfile
+
+import pytest
+
+# Point the app at a throwaway database before anything imports app.database
+os.environ["DATABASE_PATH"] = os.path.join(tempfile.mkdtemp(prefix="math-feedback-tests-"), "test.db")
+
+
+@pytest.fixture
+def db():
+    """A freshly initialized and seeded database."""
+    from app.database import reset_db
+    reset_db()
+    yield
@@ -0,0 +1,45 @@
+from fractions import Fraction
+
+from app.services.answer_checker import answer_checker
+from app.services.exact_math import parse_line
+
+
+def test_mixed_number_answer_is_correct():
+    # frac-add-002: 2/3 + 3/4 = 17/12 = 1 5/12
+    check = answer_checker.check("17/12", "2/3 + 3/4 = 8/12 + 9/12\n= 1 5/12")
+    assert check.decided
+    assert check.is_correct
+    assert check.student_value == Fraction(17, 12)
+
+
+def test_joined_digits_are_not_a_mixed_number():
+    check = answer_checker.check("17/12", "= 15/12")
+    assert check.decided
+    assert not check.is_correct
+
+
+def test_negative_mixed_number():
+    assert parse_line("-1 1/2 + 3")[0].const == Fraction(3, 2)
+
+
+def test_ambiguous_digit_runs_are_undecided():
+    for work in ("= 12 3", "= 1 5/12/2", "= $1 000"):
+        assert not answer_checker.check("17/12", work).decided
+
+
+def test_labelled_check_line_is_skipped():
+    check = answer_checker.check("3/4", "1/4 + 1/2 = 3/4\nCheck: 3/4 - 1/2 = 1/4")
+    assert check.decided
+    assert check.is_correct
+    assert check.student_value == Fraction(3, 4)
+
+
+def test_unlabelled_check_after_the_answer_is_undecided():
+    check = answer_checker.check("3/4", "1/4 + 1/2 = 3/4\n3/4 - 1/2 = 1/4")
+    assert not check.decided
+
+
+def test_labelled_check_of_an_equation_is_skipped():
+    check = answer_checker.check("x = 4", "2x + 3 = 11\n2x = 8\nx = 4\nVerify: 2(4) + 3 = 11")
+    assert check.decided
+    assert check.is_correct
@@ -0,0 +1,85 @@
+import json
+import base64
+import asyncio
+import threading
+
+import pytest
+from anthropic.types import Message
+
+from app.services.cassette import Cassette
+from app.services.ocr import ImageInput
+
+MESSAGE = {
+    "id": "msg_1",
+    "type": "message",
+    "role": "assistant",
+    "model": "claude-sonnet-4-20250514",
+    "content": [{"type": "text", "text": "{}"}],
+    "stop_reason": "end_turn",
+    "stop_sequence": None,
+    "usage": {"input_tokens": 10, "output_tokens": 5},
+}
+
+
+@pytest.fixture
+def recorder(tmp_path, monkeypatch):
+    monkeypatch.setenv("CASSETTE_MODE", "record")
+    monkeypatch.setenv("CASSETTE_DIR", str(tmp_path))
+    cassette = Cassette()
+    yield cassette
+    cassette.close()
+
+
+def _params(image: bytes) -> dict:
+    return {
+        "model": "claude-sonnet-4-20250514",
+        "max_tokens": 100,
+        "messages": [{"role": "user", "content": [
+            {"type": "image", "source": {"type": "base64", "media_type": "image/png", "data": base64.b64encode(image).decode()}},
+            {"type": "text", "text": "Read this."},
+        ]}],
+    }
+
+
+def test_recording_does_not_wait_for_the_disk(recorder, monkeypatch):
+    disk = threading.Event()
+    append = recorder._append
+
+    def slow_append(name, record):
+        disk.wait(5)
+        append(name, record)
+    monkeypatch.setattr(recorder, "_append", slow_append)
+
+    async def submit():
+        async def send():
+            return Message.model_validate(MESSAGE)
+        recorder.record_submission("json", "lin-eq-001", ImageInput("image/png", b"png"), None)
+        await recorder.call(_params(b"png"), send)
+
+    # Both return while the writer is still stuck on the first record
+    asyncio.run(asyncio.wait_for(submit(), 1))
+    assert not (recorder.directory / "calls.jsonl").exists()
+
+    disk.set()
+    recorder.flush()
+    traffic = [json.loads(line) for line in (recorder.directory / "traffic.jsonl").read_text().splitlines()]
+    calls = [json.loads(line) for line in (recorder.directory / "calls.jsonl").read_text().splitlines()]
+    assert [record["problem_id"] for record in traffic] == ["lin-eq-001"]
+    assert len(calls) == 1
+    # The image went to one blob, shared by both records
+    assert calls[0]["request"]["messages"][0]["content"][0]["blob"] == traffic[0]["image"]
+    assert recorder.load_blob(traffic[0]["image"]) == b"png"
+
+
+def test_recorded_calls_replay(recorder, monkeypatch):
+    async def send():
+        return Message.model_validate(MESSAGE)
+
+    asyncio.run(recorder.call(_params(b"png"), send))
+    recorder.close()
+
+    monkeypatch.setenv("CASSETTE_MODE", "replay")
+    replayer = Cassette()
+    message = asyncio.run(replayer.call(_params(b"png"), None))
+    assert message.id == "msg_1"
+    assert replayer.counts["replayed"] == 1
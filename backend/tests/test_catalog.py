@@ -0,0 +1,65 @@
+import sqlite3
+
+import pytest
+
+from app.database import DATABASE_PATH, reset_db, seed_db
+from app.services.catalog import Catalog
+
+
+def _edit_elsewhere(problem_id: str, question: str, bump: bool = True):
+    """What another process does: change a problem, and bump the version the way seed_db does."""
+    conn = sqlite3.connect(DATABASE_PATH)
+    conn.execute("UPDATE problems SET question = ? WHERE id = ?", (question, problem_id))
+    if bump:
+        conn.execute("UPDATE catalog_version SET version = version + 1, seeded_at = seeded_at + 1")
+    conn.commit()
+    conn.close()
+
+
+@pytest.fixture
+def catalog(db):
+    catalog = Catalog()
+    catalog.check_interval = 0
+    catalog.load()
+    return catalog
+
+
+def test_seed_db_bumps_the_stored_version(catalog):
+    version = catalog.version
+    seed_db()
+    assert catalog.version == version + 1
+
+
+def test_reload_after_another_process_reseeds(catalog):
+    version = catalog.version
+    _edit_elsewhere("lin-eq-001", "Changed elsewhere")
+
+    assert catalog.problem("lin-eq-001")["question"] == "Changed elsewhere"
+    assert catalog.version == version + 1
+    assert catalog.snapshot.problem_bodies["lin-eq-001"].version == version + 1
+
+
+def test_no_reload_without_a_version_bump(catalog):
+    reloads = catalog.reloads
+    _edit_elsewhere("lin-eq-001", "Changed without a seed", bump=False)
+
+    assert catalog.problem("lin-eq-001")["question"] != "Changed without a seed"
+    assert catalog.reloads == reloads
+
+
+def test_snapshot_is_trusted_within_the_check_interval(catalog):
+    catalog.check_interval = 3600
+    catalog.refresh()
+    _edit_elsewhere("lin-eq-001", "Changed elsewhere")
+
+    assert catalog.problem("lin-eq-001")["question"] != "Changed elsewhere"
+
+
+def test_reset_db_is_picked_up(catalog):
+    version, reloads = catalog.version, catalog.reloads
+
+    # The rebuilt database counts from 1 again, so only the seed time tells them apart
+    reset_db()
+    catalog.problem("lin-eq-001")
+    assert catalog.version == version
+    assert catalog.reloads == reloads + 1
@@ -0,0 +1,51 @@
+import io
+import base64
+import random
+
+from PIL import Image, ImageDraw
+
+from app.services.image_prep import ImagePreparer, flatten_transparency
+
+
+def _transparent_page(mode: str) -> Image.Image:
+    """Dark writing on a fully transparent background."""
+    image = Image.new("RGBA", (400, 300), (0, 0, 0, 0))
+    ImageDraw.Draw(image).text((20, 20), "2x + 3 = 11", fill=(20, 20, 20, 255))
+    return image.convert(mode) if mode != "RGBA" else image
+
+
+def test_transparent_areas_become_white():
+    for mode in ("RGBA", "LA"):
+        flattened = flatten_transparency(_transparent_page(mode))
+        assert flattened.mode == "RGB"
+        assert flattened.getpixel((399, 299)) == (255, 255, 255)
+
+
+def test_palette_transparency_becomes_white():
+    image = Image.new("P", (10, 10), 0)
+    image.putpalette([0, 0, 0] * 256)
+    image.info["transparency"] = 0
+    assert flatten_transparency(image).getpixel((5, 5)) == (255, 255, 255)
+
+
+def test_opaque_images_are_unchanged():
+    image = Image.new("RGB", (10, 10), (1, 2, 3))
+    assert flatten_transparency(image) is image
+
+
+def test_prepared_png_screenshot_is_not_black():
+    # Noisy writing on the left half (so re-encoding pays off), transparent on the right
+    rng = random.Random(0)
+    image = Image.new("RGBA", (1200, 900), (0, 0, 0, 0))
+    image.putdata([
+        (rng.randrange(256), rng.randrange(256), rng.randrange(256), 255) if i % 1200 < 600 else (0, 0, 0, 0)
+        for i in range(1200 * 900)
+    ])
+    buffer = io.BytesIO()
+    image.save(buffer, "PNG")
+
+    prepared = ImagePreparer().prepare(buffer.getvalue(), "image/png")
+
+    assert prepared.reencoded
+    decoded = Image.open(io.BytesIO(base64.b64decode(prepared.data))).convert("L")
+    assert decoded.getpixel((decoded.width - 1, decoded.height - 1)) > 240
@@ -0,0 +1,59 @@
+import asyncio
+import sqlite3
+
+from pydantic import BaseModel
+
+from app.services.jobs import JobQueue
+from app.services.ocr import ImageInput
+
+
+class _Response(BaseModel):
+    ok: bool = True
+
+
+async def _handler(problem_id, image, fast_verdict):
+    return _Response()
+
+
+def _fail_once(monkeypatch, name: str):
+    original = getattr(JobQueue, name)
+    calls = {"count": 0}
+
+    def flaky(conn, *args):
+        calls["count"] += 1
+        if calls["count"] == 1:
+            raise sqlite3.OperationalError("database is locked")
+        return original(conn, *args)
+
+    monkeypatch.setattr(JobQueue, name, staticmethod(flaky))
+
+
+async def _run_two_jobs() -> list[dict]:
+    queue = JobQueue()
+    queue.worker_count = 1
+    await queue.start(_handler)
+    try:
+        image = ImageInput(media_type="image/jpeg", data=b"jpeg")
+        job_ids = [await queue.enqueue("frac-add-001", image) for _ in range(2)]
+        await asyncio.wait_for(queue._queue.join(), 5)
+        assert len(queue._workers) == 1 and not queue._workers[0].done()
+        return [await queue.get(job_id) for job_id in job_ids]
+    finally:
+        await queue.stop()
+
+
+def test_worker_survives_a_failed_claim(db, monkeypatch):
+    _fail_once(monkeypatch, "_claim")
+    first, second = asyncio.run(_run_two_jobs())
+    assert first["status"] == "failed"
+    assert "database is locked" in first["error"]
+    assert second["status"] == "done"
+    assert second["result"] == {"ok": True}
+
+
+def test_worker_survives_a_failed_finish(db, monkeypatch):
+    _fail_once(monkeypatch, "_finish")
+    first, second = asyncio.run(_run_two_jobs())
+    # The success write failed; the best-effort retry marks the job failed instead
+    assert first["status"] == "failed"
+    assert second["status"] == "done"
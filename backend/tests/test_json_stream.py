@@ -0,0 +1,62 @@
+import codecs
+import json
+
+from app.services.json_stream import JSONArrayStream
+
+STEPS = [
+    {"step": "2x + 3 = 11", "evaluation": "correct", "comment": "Good start."},
+    {"step": "say \"x\" is {4}", "evaluation": "unclear", "comment": "Brackets ] and [ and } in a string, a \\ backslash"},
+    {"step": "x = 4", "evaluation": "correct", "comment": "Nested", "detail": {"checks": [1, {"a": "]"}], "note": "é ✓"}},
+]
+
+RESPONSE = "Here is my evaluation:\n" + json.dumps({
+    "is_correct": True,
+    "summary": "steps_analysis [not this] {one}",
+    "other": {"steps_analysis": [{"step": "nested, not top-level"}]},
+    "steps_analysis": STEPS,
+    "suggestions": [{"step": "after the array"}],
+}, indent=2, ensure_ascii=False)
+
+
+def _collect(chunks: list[str]) -> list:
+    stream = JSONArrayStream("steps_analysis")
+    items = []
+    for chunk in chunks:
+        items.extend(stream.feed(chunk))
+    return items
+
+
+def test_whole_response():
+    assert _collect([RESPONSE]) == STEPS
+
+
+def test_split_at_every_offset():
+    for offset in range(len(RESPONSE) + 1):
+        assert _collect([RESPONSE[:offset], RESPONSE[offset:]]) == STEPS, offset
+
+
+def test_one_character_at_a_time():
+    assert _collect(list(RESPONSE)) == STEPS
+
+
+def test_split_at_every_utf8_byte_offset():
+    # Streamed bytes decoded incrementally: a multi-byte character may arrive late
+    data = RESPONSE.encode()
+    for offset in range(len(data) + 1):
+        decoder = codecs.getincrementaldecoder("utf-8")()
+        chunks = [decoder.decode(data[:offset]), decoder.decode(data[offset:], final=True)]
+        assert _collect(chunks) == STEPS, offset
+
+
+def test_nothing_after_the_array_is_returned():
+    stream = JSONArrayStream("steps_analysis")
+    assert stream.feed(RESPONSE) == STEPS
+    assert stream.feed('{"steps_analysis": [{"step": "again"}]}') == []
+
+
+def test_items_are_returned_as_soon_as_they_close():
+    text = json.dumps({"steps_analysis": STEPS[:2]})
+    end_of_first = text.index(json.dumps(STEPS[0])) + len(json.dumps(STEPS[0]))
+    stream = JSONArrayStream("steps_analysis")
+    assert stream.feed(text[:end_of_first]) == STEPS[:1]
+    assert stream.feed(text[end_of_first:]) == STEPS[1:2]
@@ -0,0 +1,14 @@
+from app.services.math_text import canonicalize_work
+
+
+def test_whitespace_around_operators_is_dropped():
+    assert canonicalize_work("x = 4") == canonicalize_work("x=4")
+    assert canonicalize_work("2 × 3") == canonicalize_work("2*3")
+    assert canonicalize_work("2 x + 3") == "2x+3"
+
+
+def test_mixed_number_stays_distinct():
+    # frac-add-002: 1 5/12 is the correct answer, 15/12 is not
+    assert canonicalize_work("1 5/12") == "1 5/12"
+    assert canonicalize_work("= 1   5 / 12") == "=1 5/12"
+    assert canonicalize_work("1 5/12") != canonicalize_work("15/12")
@@ -0,0 +1,78 @@
+import asyncio
+
+import pytest
+
+from app.services.mathpix import OCRResult, mathpix_service
+from app.services.ocr import VisionResult, vision_service
+from app.services.ocr_router import OCRRouter
+
+
+@pytest.fixture
+def providers(monkeypatch):
+    """Vision answers after `vision_delay` seconds, Mathpix at once with a confident transcription."""
+    delays = {"vision": 0.0}
+
+    async def screen(image):
+        return None, object()
+
+    async def analyze_prepared(prepared, deadline=None):
+        await asyncio.sleep(delays["vision"])
+        return VisionResult(readable=True, extracted_text="x = 4")
+
+    async def extract_math(image_base64, deadline=None):
+        return OCRResult(success=True, text="x = 5", confidence=0.99)
+
+    monkeypatch.setattr(vision_service, "screen", screen)
+    monkeypatch.setattr(vision_service, "analyze_prepared", analyze_prepared)
+    monkeypatch.setattr(mathpix_service, "is_configured", lambda: True)
+    monkeypatch.setattr(mathpix_service, "extract_math", extract_math)
+    monkeypatch.setattr(OCRRouter, "_mathpix", _plain_mathpix)
+    return delays
+
+
+async def _plain_mathpix(self, prepared, deadline):
+    result = await mathpix_service.extract_math("", deadline)
+    return VisionResult(readable=True, extracted_text=result.text)
+
+
+def _router(mode: str) -> OCRRouter:
+    router = OCRRouter()
+    router.mode = mode
+    router.default_hedge_delay = 0.05
+    return router
+
+
+def test_vision_mode_samples_latency(providers):
+    router = _router("vision")
+    providers["vision"] = 0.02
+
+    result = asyncio.run(router.analyze(None))
+
+    assert result.extracted_text == "x = 4"
+    assert len(router.latencies) == 1
+    assert router.latencies[0] >= 0.02
+
+
+def test_cancelled_vision_call_still_counts_its_elapsed_time(providers):
+    router = _router("hedge")
+    providers["vision"] = 10
+
+    result = asyncio.run(router.analyze(None))
+
+    # Mathpix won after the hedge delay and the Vision call was cancelled
+    assert result.extracted_text == "x = 5"
+    assert router.counts["mathpix_wins"] == 1
+    assert len(router.latencies) == 1
+    assert router.latencies[0] >= 0.05
+
+
+def test_slow_tail_raises_the_hedge_delay(providers):
+    router = _router("hedge")
+    router.min_hedge_samples = 20
+    router.latencies.extend([0.01] * 18)
+    providers["vision"] = 10
+
+    for _ in range(2):
+        asyncio.run(router.analyze(None))
+
+    assert router.hedge_delay() >= 0.05
@@ -0,0 +1,111 @@
+import json
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from anthropic.types import Message
+
+from app.services import llm_client
+from app.services.evaluator import evaluator_service
+from app.services.llm_client import usage_tracker
+from app.services.metrics import metrics
+
+RESPONSE = {
+    "is_correct": True,
+    "summary": "Well done.",
+    "steps_analysis": [{"step": "x = 4", "evaluation": "correct", "comment": "Right."}],
+    "suggestions": [],
+    "encouragement": "Great job!",
+}
+
+
+class StubMessages:
+    """Stands in for `client.messages`: records each request and answers with growing cache reads."""
+
+    def __init__(self):
+        self.requests = []
+
+    async def create(self, **params):
+        self.requests.append(params)
+        first = len(self.requests) == 1
+        return Message(
+            id=f"msg_{len(self.requests)}",
+            type="message",
+            role="assistant",
+            model=params["model"],
+            content=[{"type": "text", "text": json.dumps(RESPONSE)}],
+            stop_reason="end_turn",
+            stop_sequence=None,
+            usage={
+                "input_tokens": 40,
+                "output_tokens": 60,
+                "cache_creation_input_tokens": 1200 if first else 0,
+                "cache_read_input_tokens": 0 if first else 1200,
+            },
+        )
+
+
+@pytest.fixture
+def stub_api(monkeypatch):
+    stub = StubMessages()
+    monkeypatch.setattr(llm_client, "_client", SimpleNamespace(messages=stub))
+    monkeypatch.setattr(evaluator_service, "api_key", "test")
+    return stub.requests
+
+
+def _evaluate_twice():
+    async def run():
+        for _ in range(2):
+            result = await evaluator_service.evaluate("Solve 2x + 3 = 11", "x = 4", "2x + 3 = 11\nx = 4")
+            assert result.success and result.is_correct
+    asyncio.run(run())
+
+
+def _markers(request: dict) -> list[str]:
+    blocks = [("system", block) for block in request["system"]]
+    blocks += [("user", block) for block in request["messages"][0]["content"]]
+    return [f"{where}:{block['text'][:20]}" for where, block in blocks if "cache_control" in block]
+
+
+def test_short_prefix_is_not_marked(stub_api):
+    _evaluate_twice()
+    assert [_markers(request) for request in stub_api] == [[], []]
+
+
+def test_one_breakpoint_after_the_problem_context(stub_api, monkeypatch):
+    monkeypatch.setattr(llm_client, "PROMPT_CACHE_MIN_TOKENS", 100)
+    _evaluate_twice()
+
+    for request in stub_api:
+        system, content = request["system"], request["messages"][0]["content"]
+        assert "cache_control" not in system[0]
+        assert content[0]["cache_control"] == {"type": "ephemeral"}
+        assert "Solve 2x + 3 = 11" in content[0]["text"]
+        # The student's work comes after the breakpoint
+        assert "cache_control" not in content[1]
+        assert "STUDENT'S WORK" in content[1]["text"]
+    # Identical prefixes, so the second call can read the first one's cache entry
+    assert stub_api[0]["system"] == stub_api[1]["system"]
+    assert stub_api[0]["messages"][0]["content"][0] == stub_api[1]["messages"][0]["content"][0]
+
+
+def test_usage_and_cache_tokens_are_counted(stub_api):
+    before = dict(usage_tracker.totals.get("evaluation", {}))
+    scrape_before = metrics.render()
+
+    _evaluate_twice()
+
+    after = usage_tracker.totals["evaluation"]
+    assert after["calls"] - before.get("calls", 0) == 2
+    assert after["input_tokens"] - before.get("input_tokens", 0) == 80
+    assert after["output_tokens"] - before.get("output_tokens", 0) == 120
+    assert after["cache_creation_input_tokens"] - before.get("cache_creation_input_tokens", 0) == 1200
+    assert after["cache_read_input_tokens"] - before.get("cache_read_input_tokens", 0) == 1200
+
+    def tokens(scrape: str, kind: str) -> float:
+        prefix = f'math_feedback_llm_tokens_total{{call="evaluation",kind="{kind}"}} '
+        return next((float(line[len(prefix):]) for line in scrape.splitlines() if line.startswith(prefix)), 0.0)
+
+    scrape = metrics.render()
+    assert tokens(scrape, "cache_read") - tokens(scrape_before, "cache_read") == 1200
+    assert tokens(scrape, "cache_creation") - tokens(scrape_before, "cache_creation") == 1200
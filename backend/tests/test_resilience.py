@@ -0,0 +1,164 @@
+import asyncio
+
+import httpx
+import pytest
+
+from app.services import resilience as resilience_module
+from app.services.resilience import CircuitBreaker, CircuitOpen, Deadline, DeadlineExceeded, Resilience
+
+
+class FakeClock:
+    """Replaces the resilience module's `time`; only moves when told to."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+    def advance(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = FakeClock()
+    monkeypatch.setattr(resilience_module, "time", clock)
+    return clock
+
+
+def _open(breaker: CircuitBreaker):
+    for _ in range(breaker.failure_threshold):
+        breaker.before_call()
+        breaker.record_failure()
+
+
+def test_opens_after_consecutive_failures(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for _ in range(2):
+        breaker.before_call()
+        breaker.record_failure()
+    assert breaker.state == "closed"
+
+    breaker.before_call()
+    breaker.record_failure()
+    assert breaker.state == "open"
+    with pytest.raises(CircuitOpen) as exc:
+        breaker.before_call()
+    assert exc.value.retry_in == pytest.approx(30)
+
+
+def test_success_resets_the_failure_count(clock):
+    breaker = CircuitBreaker("test", failure_threshold=3, reset_timeout=30)
+    for outcome in ("fail", "fail", "ok", "fail", "fail"):
+        breaker.before_call()
+        breaker.record_failure() if outcome == "fail" else breaker.record_success()
+    assert breaker.state == "closed"
+
+
+def test_half_open_lets_one_trial_through_and_closes_on_success(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+
+    clock.advance(29.9)
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    clock.advance(0.1)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+    # Only one trial at a time
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+
+    breaker.record_success()
+    assert breaker.state == "closed"
+    breaker.before_call()
+
+
+def test_failed_trial_reopens_for_a_full_reset_timeout(clock):
+    breaker = CircuitBreaker("test", failure_threshold=2, reset_timeout=30)
+    _open(breaker)
+
+    clock.advance(30)
+    breaker.before_call()
+    clock.advance(5)
+    breaker.record_failure()
+    assert breaker.state == "open"
+    assert breaker.opened == 2
+
+    clock.advance(29)
+    with pytest.raises(CircuitOpen):
+        breaker.before_call()
+    clock.advance(1)
+    breaker.before_call()
+    assert breaker.state == "half_open"
+
+
+def test_released_trial_lets_the_next_one_through(clock):
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=30)
+    _open(breaker)
+    clock.advance(30)
+
+    breaker.before_call()
+    breaker.release()
+    assert breaker.state == "half_open"
+    breaker.before_call()
+
+
+def _stuck_call(clock: FakeClock, runs_for: float):
+    """A call that hangs until the deadline cuts it off, having used `runs_for` seconds of the clock."""
+    async def func():
+        clock.advance(runs_for)
+        await asyncio.sleep(10)
+    return func
+
+
+def _call_with_deadline(service: Resilience, func, timeout: float):
+    async def run():
+        deadline = Deadline(0.05)
+        await service.call("test", func, deadline=deadline, timeout=timeout)
+    with pytest.raises(DeadlineExceeded):
+        asyncio.run(run())
+
+
+def test_deadline_cutting_a_call_short_is_not_a_failure(clock):
+    service = Resilience()
+    service.failure_threshold = 1
+
+    _call_with_deadline(service, _stuck_call(clock, runs_for=0.05), timeout=60)
+
+    breaker = service.breaker("test")
+    assert breaker.state == "closed"
+    assert breaker.failures == 0
+    assert not breaker.trial_running
+
+
+def test_deadline_after_the_full_call_timeout_is_a_failure(clock):
+    service = Resilience()
+    service.failure_threshold = 1
+
+    _call_with_deadline(service, _stuck_call(clock, runs_for=60), timeout=60)
+
+    breaker = service.breaker("test")
+    assert breaker.state == "open"
+    assert breaker.failures == 1
+
+
+def test_transient_errors_are_retried_and_counted(clock, monkeypatch):
+    service = Resilience()
+    service.max_attempts = 3
+    service.failure_threshold = 5
+    monkeypatch.setattr(service, "backoff", lambda attempt: 0)
+    attempts = []
+
+    async def flaky():
+        attempts.append(clock.now)
+        if len(attempts) < 3:
+            raise httpx.ConnectError("down")
+        return "ok"
+
+    assert asyncio.run(service.call("test", flaky)) == "ok"
+    assert len(attempts) == 3
+    assert service.retries == 2
+    assert service.breaker("test").failures == 0
@@ -0,0 +1,20 @@
+from app.services.step_verifier import step_verifier
+
+QUESTION = "What is 2/3 + 3/4?"
+
+
+def _labels(work: str) -> list[str]:
+    return [step.evaluation for step in step_verifier.verify(QUESTION, work)]
+
+
+def test_mixed_number_step_is_correct():
+    assert _labels("2/3 + 3/4 = 8/12 + 9/12\n= 17/12\n17/12 = 1 5/12") == ["correct", "correct", "correct"]
+
+
+def test_unicode_mixed_number_is_not_joined():
+    assert _labels("= 17/12\n= 1⅚") == ["correct", "incorrect"]
+    assert _labels("1/2 + 1 = 1½") == ["correct"]
+
+
+def test_joined_digit_runs_are_unclear():
+    assert _labels("= 17/12\n= 1 000\n= 12 3") == ["correct", "unclear", "unclear"]
@@ -0,0 +1,105 @@
+import json
+import base64
+
+import pytest
+from fastapi.testclient import TestClient
+
+from app.database import get_db
+from app.routers.submissions import _decode_cursor, _encode_cursor
+
+# Five rows share a timestamp, so only the id orders them
+CREATED_AT = [
+    "2026-01-01 09:00:00",
+    "2026-01-01 10:00:00",
+    "2026-01-01 10:00:00",
+    "2026-01-01 10:00:00",
+    "2026-01-01 10:00:00",
+    "2026-01-01 10:00:00",
+    "2026-01-01 11:00:00",
+]
+
+
+@pytest.fixture
+def client(db):
+    from app.main import app
+    with get_db() as conn:
+        for i, created_at in enumerate(CREATED_AT):
+            conn.execute(
+                """
+                INSERT INTO submissions (
+                    problem_id, is_correct, feedback, feedback_summary, step_count, error_step_count, created_at
+                )
+                VALUES (?, ?, '{}', 'Checked.', 0, 0, ?)
+                """,
+                ("lin-eq-001" if i % 2 else "lin-eq-002", i % 2, created_at),
+            )
+        conn.commit()
+    # No startup/shutdown: shutdown would stop the DB pool the other tests share
+    return TestClient(app)
+
+
+def _expected(problem_id=None) -> list[int]:
+    with get_db() as conn:
+        where = "WHERE problem_id = ?" if problem_id else ""
+        rows = conn.execute(
+            f"SELECT id FROM submissions {where} ORDER BY created_at DESC, id DESC",
+            (problem_id,) if problem_id else (),
+        ).fetchall()
+    return [row["id"] for row in rows]
+
+
+def _walk(client, limit: int, **params) -> list[list[int]]:
+    pages, cursor = [], None
+    while True:
+        query = {"limit": limit, **params, **({"cursor": cursor} if cursor else {})}
+        response = client.get("/api/submissions", params=query)
+        assert response.status_code == 200
+        body = response.json()
+        pages.append([item["id"] for item in body["submissions"]])
+        cursor = body["next_cursor"]
+        if cursor is None:
+            return pages
+
+
+def test_cursor_round_trip():
+    cursor = _encode_cursor("2026-01-01 10:00:00", 42)
+    assert "=" not in cursor
+    assert _decode_cursor(cursor) == ("2026-01-01 10:00:00", 42)
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor!",
+    base64.urlsafe_b64encode(b"\xff\xfe").decode(),
+    base64.urlsafe_b64encode(b"{}").decode(),
+    base64.urlsafe_b64encode(json.dumps(["2026-01-01", "42"]).encode()).decode(),
+    base64.urlsafe_b64encode(json.dumps([1, 2, 3]).encode()).decode(),
+])
+def test_malformed_cursor_is_rejected(client, cursor):
+    with pytest.raises(ValueError):
+        _decode_cursor(cursor)
+    response = client.get("/api/submissions", params={"cursor": cursor})
+    assert response.status_code == 400
+    assert response.json()["detail"] == "Invalid cursor"
+
+
+@pytest.mark.parametrize("limit", [1, 2, 3, 7, 10])
+def test_pages_split_rows_with_the_same_timestamp(client, limit):
+    pages = _walk(client, limit)
+    ids = [submission_id for page in pages for submission_id in page]
+
+    # Every row exactly once, newest first, ties broken by id
+    assert ids == _expected()
+    assert all(len(page) == limit for page in pages[:-1])
+    assert 0 < len(pages[-1]) <= limit
+
+
+def test_cursor_pages_within_one_problem(client):
+    pages = _walk(client, 2, problem_id="lin-eq-002")
+    assert [submission_id for page in pages for submission_id in page] == _expected("lin-eq-002")
+
+
+def test_last_full_page_has_no_next_cursor(client):
+    body = client.get("/api/submissions", params={"limit": len(CREATED_AT)}).json()
+    assert len(body["submissions"]) == len(CREATED_AT)
+    assert body["total"] == len(CREATED_AT)
+    assert body["next_cursor"] is None
@@ -5,7 +5,9 @@ const API_BASE = "http://localhost:8000";
 let currentTopicId = null;
 let selectedImageData = null;
 let currentProblemId = null;
-let historyOffset = 0;
+// Cursors of the history pages visited so far (null = first page)
+let historyCursors = [null];
+let historyNextCursor = null;
 const HISTORY_LIMIT = 10;
 
 // ============================================================
@@ -26,7 +28,7 @@ function showView(viewName) {
     loadTopics();
   } else if (viewName === "history") {
     document.getElementById("nav-history").classList.add("active");
-    historyOffset = 0;
+    historyCursors = [null];
     loadHistory();
   }
 }
@@ -371,8 +373,10 @@ async function loadHistory() {
   pagination.innerHTML = "";
 
   try {
+    const cursor = historyCursors[historyCursors.length - 1];
     const res = await fetch(
-      `${API_BASE}/api/submissions?limit=${HISTORY_LIMIT}&offset=${historyOffset}`
+      `${API_BASE}/api/submissions?limit=${HISTORY_LIMIT}` +
+        (cursor ? `&cursor=${encodeURIComponent(cursor)}` : "")
     );
     if (!res.ok) throw new Error("Failed to load history");
     const data = await res.json();
@@ -383,6 +387,8 @@ async function loadHistory() {
       return;
     }
 
+    historyNextCursor = data.next_cursor;
+
     list.innerHTML = data.submissions
       .map(
         (s) => `
@@ -405,7 +411,7 @@ async function loadHistory() {
     // Pagination
     if (data.total > HISTORY_LIMIT) {
       const totalPages = Math.ceil(data.total / HISTORY_LIMIT);
-      const currentPage = Math.floor(historyOffset / HISTORY_LIMIT) + 1;
+      const currentPage = historyCursors.length;
 
       pagination.innerHTML = `
         <button class="page-btn" onclick="changePage(-1)" ${currentPage <= 1 ? "disabled" : ""}>
@@ -414,7 +420,7 @@ async function loadHistory() {
         <span style="padding: 0.4rem; color: #64748b; font-size: 0.85rem;">
           Page ${currentPage} of ${totalPages}
         </span>
-        <button class="page-btn" onclick="changePage(1)" ${currentPage >= totalPages ? "disabled" : ""}>
+        <button class="page-btn" onclick="changePage(1)" ${historyNextCursor ? "" : "disabled"}>
           Next &rarr;
         </button>
       `;
@@ -425,8 +431,11 @@ async function loadHistory() {
 }
 
 function changePage(direction) {
-  historyOffset += direction * HISTORY_LIMIT;
-  if (historyOffset < 0) historyOffset = 0;
+  if (direction > 0 && historyNextCursor) {
+    historyCursors.push(historyNextCursor);
+  } else if (direction < 0 && historyCursors.length > 1) {
+    historyCursors.pop();
+  }
   loadHistory();
 }
 